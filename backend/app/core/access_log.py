@@ -0,0 +1,189 @@
+# app/core/access_log.py - One structured JSON line per request, written off the request path
+#
+# AccessLogMiddleware is plain ASGI (no BaseHTTPMiddleware), so it never
+# buffers or breaks streaming responses. The request path only builds a dict
+# and does a put_nowait() onto a bounded queue. A QueueListener thread then
+# timestamps, redacts, serialises and writes it. If that thread falls behind,
+# lines are dropped and counted instead of adding latency.
+#
+#   ACCESS_LOG_ENABLED        default true
+#   ACCESS_LOG_SAMPLE_RATE    share of ordinary requests logged (default 1.0); errors
+#                             and requests slower than ACCESS_LOG_SLOW_MS are always logged
+#   ACCESS_LOG_SKIP_PATHS     never logged (health checks, scrapes)
+#   ACCESS_LOG_REDACT_PARAMS  query params whose values are replaced with [REDACTED]
+#
+# With QUERY_STATS_HEADERS=true the response also carries X-Query-Count and
+# Server-Timing (see request_context), and any request that repeats a
+# statement N_PLUS_ONE_THRESHOLD+ times is always logged with an "n_plus_one" field.
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode
+
+from . import metrics, rate_limit, request_context
+
+ACCESS_LOG_ENABLED = os.getenv("ACCESS_LOG_ENABLED", "true").lower() == "true"
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+ACCESS_LOG_QUEUE_SIZE = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", "10000"))
+ACCESS_LOG_SKIP_PATHS = frozenset(filter(None, os.getenv("ACCESS_LOG_SKIP_PATHS", "/,/health,/metrics").split(",")))
+ACCESS_LOG_REDACT_PARAMS = frozenset(filter(None, os.getenv(
+    "ACCESS_LOG_REDACT_PARAMS", "token,refresh_token,password,code,key,signature,secret"
+).lower().split(",")))
+
+# The old debug middleware set this on every response; keep doing it
+SECURITY_HEADERS = [(b"strict-transport-security", b"max-age=31536000; includeSubDomains")]
+
+logger = logging.getLogger("campusstay.access")
+logger.propagate = False
+logger.setLevel(logging.INFO)
+
+_dropped = 0
+
+
+class _JsonLineFormatter(logging.Formatter):
+    """Runs on the listener thread, so the expensive parts of a line live here"""
+
+    def format(self, record):
+        entry = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")}
+        entry.update(record.msg)
+        entry["query"] = redact_query(entry["query"])
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Formatting happens on the listener thread, not the request path
+        return record
+
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+_queue = queue.Queue(maxsize=ACCESS_LOG_QUEUE_SIZE)
+_stream = logging.StreamHandler(sys.stdout)
+_stream.setFormatter(_JsonLineFormatter())
+_listener = logging.handlers.QueueListener(_queue, _stream)
+logger.addHandler(_DroppingQueueHandler(_queue))
+
+
+def start():
+    if ACCESS_LOG_ENABLED and _listener._thread is None:
+        _listener.start()
+
+
+def stop():
+    """Flush queued lines; call from shutdown"""
+    if _listener._thread is not None:
+        _listener.stop()
+
+
+def stats() -> dict:
+    return {"queued": _queue.qsize(), "dropped": _dropped, "sample_rate": ACCESS_LOG_SAMPLE_RATE}
+
+
+def redact_query(query_string: bytes) -> str:
+    if not query_string:
+        return ""
+    pairs = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    return urlencode([
+        (key, "[REDACTED]" if key.lower() in ACCESS_LOG_REDACT_PARAMS else value)
+        for key, value in pairs
+    ], safe="[]")
+
+
+def _client_ip(scope) -> str:
+    """Same address the rate limiter keys on (RATE_LIMIT_PROXY_HOPS aware)"""
+    forwarded = next((value.decode("latin-1") for name, value in scope.get("headers", ())
+                      if name == b"x-forwarded-for"), None)
+    client = scope.get("client")
+    return rate_limit.client_ip_from(forwarded, client[0] if client else None)
+
+
+def _query_stats_headers(stats, elapsed: float) -> list:
+    db_ms = stats.db_seconds * 1000
+    timing = f'db;dur={db_ms:.1f};desc="{stats.db_queries} queries", app;dur={elapsed * 1000 - db_ms:.1f}'
+    return [
+        (b"x-query-count", str(stats.db_queries).encode()),
+        (b"server-timing", timing.encode()),
+    ]
+
+
+class AccessLogMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats, token = request_context.begin(scope)
+        response = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                message["headers"] = list(message.get("headers", ())) + SECURITY_HEADERS
+                if request_context.QUERY_STATS_HEADERS:
+                    message["headers"] += _query_stats_headers(stats, time.perf_counter() - started)
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_context.end(token)
+            route = getattr(scope.get("route"), "path", "unmatched")  # never the raw path: unbounded labels
+            metrics.observe_request(scope["method"], route, response["status"], elapsed, stats.db_seconds)
+            repeated = stats.repeated_statements()
+            if repeated:
+                metrics.N_PLUS_ONE.labels(scope["method"], route).inc()
+            if ACCESS_LOG_ENABLED:
+                self._log(scope, response, stats, elapsed, repeated)
+
+    def _log(self, scope, response, stats, elapsed, repeated):
+        path = scope["path"]
+        if path in ACCESS_LOG_SKIP_PATHS:
+            return
+        duration_ms = elapsed * 1000
+        status = response["status"]
+        if (
+            ACCESS_LOG_SAMPLE_RATE < 1.0
+            and not repeated
+            and status < 400
+            and duration_ms < ACCESS_LOG_SLOW_MS
+            and random.random() >= ACCESS_LOG_SAMPLE_RATE
+        ):
+            return
+
+        route = scope.get("route")
+        entry = {
+            "method": scope["method"],
+            "route": getattr(route, "path", None),
+            "path": path,
+            "query": scope.get("query_string"),
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            "db_ms": round(stats.db_seconds * 1000, 2),
+            "db_queries": stats.db_queries,
+            "bytes": response["bytes"],
+            "client": _client_ip(scope),
+        }
+        if repeated:
+            entry["n_plus_one"] = [{"count": count, "statement": statement[:300]} for count, statement in repeated]
+        # makeRecord + handle skips logger.info()'s stack walk for caller info
+        logger.handle(logger.makeRecord(logger.name, logging.INFO, __name__, 0, entry, None, None))
@@ -0,0 +1,184 @@
+# app/core/db_pool.py - Connection pool sizing, checkout timing and health checks
+#
+# Sizing: a sync route holds at most one connection, and sync routes run in
+# AnyIO's threadpool, so THREADPOOL_SIZE threads (plus a couple for the
+# scheduler's lock and the slow-query EXPLAIN thread) is all the connections a
+# worker can use at once. Anything above that is never checked out. Across
+# WEB_CONCURRENCY workers that can be more than Postgres allows, so
+# DB_MAX_CONNECTIONS (0 = no cap) is split evenly between workers and the async
+# pool's share comes off the top. When the cap binds, threads wait for a
+# connection instead of Postgres refusing one; that wait is what
+# campusstay_db_pool_wait_seconds shows. DB_POOL_SIZE / DB_MAX_OVERFLOW still
+# override the derived numbers.
+#
+# Health: no pool_pre_ping (a round trip on every checkout). Connections are
+# replaced after DB_POOL_RECYCLE_SECONDS, which should stay under any idle
+# timeout between here and Postgres, and every DB_HEALTH_CHECK_SECONDS each
+# worker runs SELECT 1 per engine. A failure there is a disconnect error, which
+# makes SQLAlchemy invalidate every connection the pool handed out before it,
+# so after a failover the stale connections go before a request trips on them.
+#
+# PgBouncer: with DB_PGBOUNCER=true DATABASE_URL may point at PgBouncer in
+# transaction pooling mode. psycopg's automatic server-side prepared statements
+# are turned off (they live on a server connection the next transaction may not
+# get); DB_MAX_CONNECTIONS then counts client connections to PgBouncer.
+#
+#   WEB_CONCURRENCY            gunicorn workers (gunicorn.conf.py exports it), default 1
+#   THREADPOOL_SIZE            AnyIO threads for sync routes, default 40
+#   DB_MAX_CONNECTIONS         primary connections for all workers together, default 0 (no cap)
+#   DB_POOL_TIMEOUT_SECONDS    wait for a free connection before failing, default 10
+#   DB_POOL_RECYCLE_SECONDS    default 1800
+#   DB_HEALTH_CHECK_SECONDS    default 30, 0 disables
+#   DB_PGBOUNCER               default false
+import asyncio
+import os
+import time
+
+import anyio.to_thread
+from sqlalchemy import exc, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics, request_context
+
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+BACKGROUND_CONNECTIONS = 2  # scheduler advisory lock + slow-query EXPLAIN, outside the request threads
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_HEALTH_CHECK_SECONDS = float(os.getenv("DB_HEALTH_CHECK_SECONDS", "30"))
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+# ── Sizing ─────
+def pool_sizes(reserved: int = 0) -> tuple:
+    """(pool_size, max_overflow) for a sync engine, given `reserved` connections of this worker's budget used elsewhere"""
+    wanted = THREADPOOL_SIZE + BACKGROUND_CONNECTIONS
+    if DB_MAX_CONNECTIONS:
+        budget = DB_MAX_CONNECTIONS // WEB_CONCURRENCY - reserved
+        if budget < 1:
+            print(f"⚠️ DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS} leaves no connections for {WEB_CONCURRENCY} workers; using 1")
+        wanted = min(wanted, max(1, budget))
+    # Keep a quarter open between bursts; the rest is overflow, closed again on checkin
+    pool_size = int(os.getenv("DB_POOL_SIZE", "0")) or max(1, wanted // 4)
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "-1"))
+    if max_overflow < 0:
+        max_overflow = max(0, wanted - pool_size)
+    return pool_size, max_overflow
+
+
+def configure_threadpool():
+    """Apply THREADPOOL_SIZE to AnyIO's default limiter; call from the running loop"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+
+def connect_args(base: dict) -> dict:
+    args = dict(base)
+    if DB_PGBOUNCER:
+        args["prepare_threshold"] = None
+    return args
+
+
+# ── Checkout timing ─────
+class _TimedPool:
+    """Times every checkout, counts the ones that had to queue and the ones that gave up"""
+    label = "primary"
+
+    def _do_get(self):
+        exhausted = self.checkedout() >= self.size() + self._max_overflow
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.DB_POOL_TIMEOUTS.labels(self.label).inc()
+            routes = ", ".join(request_context.in_flight_routes()) or "no requests"
+            print(f"❌ DB pool {self.label} exhausted: no connection within {self._timeout:g}s "
+                  f"({self.checkedout()} checked out); in flight: {routes}")
+            raise
+        finally:
+            metrics.DB_POOL_WAIT.labels(self.label).observe(time.perf_counter() - started)
+            if exhausted:
+                metrics.DB_POOL_EXHAUSTED.labels(self.label).inc()
+
+
+_pool_classes = {}
+
+
+def timed_pool(label: str, asynchronous: bool = False):
+    """QueuePool subclass reporting as `label`; a class attribute, so it survives engine.dispose()"""
+    base = AsyncAdaptedQueuePool if asynchronous else QueuePool
+    if (label, base) not in _pool_classes:
+        _pool_classes[label, base] = type(f"Timed{base.__name__}", (_TimedPool, base), {"label": label})
+    return _pool_classes[label, base]
+
+
+def engine_options(label: str, pool_size: int, max_overflow: int, base_connect_args: dict,
+                   asynchronous: bool = False) -> dict:
+    """create_engine / create_async_engine keyword arguments for one pool"""
+    return {
+        "poolclass": timed_pool(label, asynchronous),
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": False,
+        "pool_use_lifo": True,  # reuse the warmest connection; rarely reached ones are the ones recycled
+        "connect_args": connect_args(base_connect_args),
+    }
+
+
+def describe(engine) -> str:
+    pool = engine.pool
+    return f"{pool.size()}+{pool._max_overflow}"
+
+
+# ── Health checks ─────
+_task = None
+
+
+def check(engine) -> bool:
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        print(f"❌ DB health check on {engine.url.host}:{engine.url.port} failed: {e}")
+        return False
+
+
+async def check_async(async_engine) -> bool:
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        print(f"❌ DB health check (async) on {async_engine.url.host}:{async_engine.url.port} failed: {e}")
+        return False
+
+
+async def _health_loop(engines: list, async_engines: list):
+    while True:
+        await asyncio.sleep(DB_HEALTH_CHECK_SECONDS)
+        for engine in engines:
+            await run_in_threadpool(check, engine)
+        for async_engine in async_engines:
+            await check_async(async_engine)
+
+
+def start(engines: list, async_engines: list = ()):
+    """Per-worker health checks (not a scheduler job: every worker has its own pool)"""
+    global _task
+    if DB_HEALTH_CHECK_SECONDS > 0 and _task is None:
+        _task = asyncio.get_running_loop().create_task(_health_loop(list(engines), list(async_engines)))
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,121 @@
+# app/core/email_templates.py - Precompiled Jinja2 email templates
+#
+# Every template under app/templates/email is compiled once at import (so a
+# broken template fails startup, not the first send) with HTML autoescaping.
+# Each email is a body fragment plus the shared _layout.html. Body fragments
+# only see recipient-independent params (property, announcement text), so for
+# kinds marked cache_body the rendered fragment is cached and reused across
+# recipients - a 5,000-student announcement renders its body once.
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+from markupsafe import Markup, escape
+
+FRONTEND_URL = os.getenv("FRONTEND_URL", "https://campusstay.co.za").rstrip('/')  # Remove trailing slash
+EMAIL_FRAGMENT_CACHE_SIZE = int(os.getenv("EMAIL_FRAGMENT_CACHE_SIZE", "1024"))
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+THEMES = {
+    "brand": {"header_from": "#ea580c", "header_to": "#dc2626", "button": "#ea580c"},
+    "success": {"header_from": "#10b981", "header_to": "#059669", "button": "#10b981"},
+    "neutral": {"header_from": "#6b7280", "header_to": "#4b5563", "button": "#ea580c"},
+    "reminder": {"header_from": "#f59e0b", "header_to": "#ea580c", "button": "#ea580c"},
+}
+
+# kind -> subject/heading (str.format over the params), theme, and whether the
+# body is recipient-independent and therefore cacheable
+KINDS = {
+    "verification": dict(
+        subject="Verify Your CampusStay Account", heading="✉️ Welcome to CampusStay!",
+        footer_notes=["If you didn't create this account, please ignore this email."],
+    ),
+    "password_reset": dict(
+        subject="Reset Your CampusStay Password", heading="🔐 Password Reset Request",
+    ),
+    "application_confirmation": dict(
+        subject="Application Submitted - {property_title}", heading="🏠 Application Received!",
+        cache_body=True,
+    ),
+    "application_approved": dict(
+        subject="🎉 Application Approved - {property_title}", heading="🎉 Congratulations!",
+        subheading="Your Application Has Been Approved", theme="success", cache_body=True,
+    ),
+    "application_rejected": dict(
+        subject="Application Update - {property_title}", heading="Application Status Update",
+        theme="neutral", cache_body=True,
+    ),
+    "document_reminder": dict(
+        subject="⏰ Reminder: Upload Documents for {property_title}", heading="⏰ Document Upload Reminder",
+        theme="reminder", cache_body=True,
+    ),
+    "announcement": dict(
+        subject="{subject}", heading="{subject}", cache_body=True,
+    ),
+}
+
+
+def _nl2br(value) -> Markup:
+    return Markup("<br>").join(escape(value).split("\n"))
+
+
+env = Environment(
+    loader=FileSystemLoader(str(TEMPLATE_DIR)),
+    autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False),
+    undefined=StrictUndefined,  # a missing param is a render error, not an empty string
+    auto_reload=False,          # templates never change under a running process
+    keep_trailing_newline=True,
+)
+env.filters["nl2br"] = _nl2br
+env.globals["frontend_url"] = FRONTEND_URL
+
+
+def _compile():
+    layout = env.get_template("_layout.html")
+    bodies, texts = {}, {}
+    for kind in KINDS:
+        bodies[kind] = env.get_template(f"{kind}.html")
+        if (TEMPLATE_DIR / f"{kind}.txt").exists():
+            texts[kind] = env.get_template(f"{kind}.txt")
+    return layout, bodies, texts
+
+
+_layout, _bodies, _texts = _compile()
+
+
+@lru_cache(maxsize=EMAIL_FRAGMENT_CACHE_SIZE)
+def _cached_body(kind: str, params: tuple) -> Markup:
+    return Markup(_bodies[kind].render(dict(params)))
+
+
+def render(kind: str, student_name: str, **params) -> tuple:
+    """(subject, html_body, text_body or None) for one recipient"""
+    spec = KINDS[kind]
+    if spec.get("cache_body"):
+        body = _cached_body(kind, tuple(sorted(params.items())))
+    else:
+        body = Markup(_bodies[kind].render(params))
+
+    subject = spec["subject"].format(**params)
+    html_body = _layout.render(
+        theme=THEMES[spec.get("theme", "brand")],
+        heading=spec["heading"].format(**params),
+        subheading=spec.get("subheading"),
+        footer_notes=spec.get("footer_notes", ()),
+        student_name=student_name,
+        body=body,
+    )
+    text_body = _texts[kind].render(student_name=student_name, **params) if kind in _texts else None
+    return subject, html_body, text_body
+
+
+def stats() -> dict:
+    info = _cached_body.cache_info()
+    return {
+        "templates": len(_bodies) + len(_texts) + 1,
+        "fragment_cache_hits": info.hits,
+        "fragment_cache_misses": info.misses,
+        "fragment_cache_size": info.currsize,
+    }
@@ -0,0 +1,239 @@
+# app/core/email_transport.py - Pluggable async email transports
+#
+#   EMAIL_TRANSPORT=resend   Resend REST API over a keep-alive HTTP client (default)
+#   EMAIL_TRANSPORT=file     write each message as an .eml file under EMAIL_SINK_DIR
+#   EMAIL_TRANSPORT=smtp     hand messages to SMTP_HOST:SMTP_PORT (e.g. a local Mailpit)
+#
+# The file and SMTP sinks let registration/application flows and load tests run
+# end to end offline. All transports share send()/send_batch()/aclose().
+import asyncio
+import os
+import smtplib
+import time
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+
+from . import metrics
+
+from .email_utils import RESEND_API_KEY, RESEND_FROM_EMAIL, FROM_NAME
+
+RESEND_API_URL = os.getenv("RESEND_API_URL", "https://api.resend.com").rstrip("/")
+EMAIL_HTTP_TIMEOUT_SECONDS = float(os.getenv("EMAIL_HTTP_TIMEOUT_SECONDS", "10"))
+# Resend's default team limit is 2 requests/second across all API keys, so each
+# process that delivers email paces itself to an equal share of it. By default
+# that is every gunicorn worker (in-app outbox workers); with
+# OUTBOX_WORKERS_IN_APP=false set EMAIL_SENDER_PROCESSES to the number of
+# dedicated outbox worker instances.
+RESEND_RATE_PER_SECOND = float(os.getenv("RESEND_RATE_PER_SECOND", "2"))
+EMAIL_SENDER_PROCESSES = max(1, int(os.getenv("EMAIL_SENDER_PROCESSES", os.getenv("WEB_CONCURRENCY", "1"))))
+RESEND_RATE_PER_PROCESS = RESEND_RATE_PER_SECOND / EMAIL_SENDER_PROCESSES
+RESEND_BATCH_MAX = 100  # hard limit of POST /emails/batch
+
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "resend").lower()
+EMAIL_SINK_DIR = os.getenv("EMAIL_SINK_DIR", "email_sink")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"
+
+
+class TransientEmailError(Exception):
+    """Worth retrying later (network error, 429, 5xx, not configured yet)"""
+
+
+class PermanentEmailError(Exception):
+    """Retrying won't help (rejected address or payload)"""
+
+
+def build_message(to_email: str, subject: str, html_body: str, text_body: str = None) -> dict:
+    message = {
+        "from": f"{FROM_NAME} <{RESEND_FROM_EMAIL}>",
+        "to": [to_email],
+        "subject": subject,
+        "html": html_body,
+    }
+    if text_body:
+        message["text"] = text_body
+    return message
+
+
+def _raise_for_status(response: httpx.Response):
+    if response.status_code < 400:
+        return
+    detail = f"HTTP {response.status_code}: {response.text[:500]}"
+    if response.status_code == 429 or response.status_code >= 500:
+        raise TransientEmailError(detail)
+    raise PermanentEmailError(detail)
+
+
+class AsyncTokenBucket:
+    """Paces API calls to `rate` per second with bursts of up to `burst`.
+
+    The default burst of 1 spaces calls evenly, which also stays inside a
+    sliding one-second window limit like Resend's."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ResendTransport:
+    """One pooled AsyncClient per process so connections (and TLS) are reused.
+
+    base_url/api_key/http_transport exist so the same code can be pointed at the
+    local fake provider in benchmarks/fake_resend.py."""
+
+    def __init__(self, base_url: str = None, api_key: str = None, rate_per_second: float = None,
+                 http_transport: httpx.AsyncBaseTransport = None):
+        self.base_url = base_url or RESEND_API_URL
+        self.api_key = api_key if api_key is not None else RESEND_API_KEY
+        self.bucket = AsyncTokenBucket(RESEND_RATE_PER_PROCESS if rate_per_second is None else rate_per_second)
+        self._http_transport = http_transport
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=EMAIL_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+                transport=self._http_transport,
+            )
+        return self._client
+
+    async def _post(self, path: str, payload) -> httpx.Response:
+        if not self.api_key:
+            raise TransientEmailError("RESEND_API_KEY not configured")
+        await self.bucket.acquire()
+        with metrics.time_dependency("resend", "send_batch" if path.endswith("/batch") else "send"):
+            try:
+                response = await self._get_client().post(path, json=payload)
+            except httpx.HTTPError as e:
+                raise TransientEmailError(f"{type(e).__name__}: {e}")
+            _raise_for_status(response)
+        return response
+
+    async def send(self, message: dict) -> str:
+        """Deliver one message, returning the provider's message id"""
+        response = await self._post("/emails", message)
+        return response.json().get("id")
+
+    async def send_batch(self, messages: list) -> list:
+        """Deliver up to RESEND_BATCH_MAX messages in one call, returning their ids in order.
+
+        The batch endpoint is all-or-nothing: one invalid message rejects the whole call."""
+        if len(messages) > RESEND_BATCH_MAX:
+            raise ValueError(f"At most {RESEND_BATCH_MAX} messages per batch")
+        response = await self._post("/emails/batch", messages)
+        return [item.get("id") for item in response.json().get("data", [])]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def to_mime(message: dict) -> EmailMessage:
+    """Resend-style message dict -> RFC 5322 message"""
+    mime = EmailMessage()
+    mime["From"] = message["from"]
+    mime["To"] = ", ".join(message["to"])
+    mime["Subject"] = message["subject"]
+    mime["Date"] = formatdate(localtime=True)
+    mime["Message-ID"] = make_msgid(domain="campusstay.local")
+    mime.set_content(message.get("text") or "This email requires an HTML-capable client.")
+    mime.add_alternative(message["html"], subtype="html")
+    return mime
+
+
+class FileTransport:
+    """Writes every message to EMAIL_SINK_DIR as an .eml file - nothing leaves the machine"""
+
+    def __init__(self, directory: str = None):
+        self.directory = Path(directory or EMAIL_SINK_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, messages: list) -> list:
+        ids = []
+        for message in messages:
+            email_id = uuid4().hex
+            (self.directory / f"{time.time_ns()}-{email_id}.eml").write_bytes(bytes(to_mime(message)))
+            ids.append(email_id)
+        return ids
+
+    async def send(self, message: dict) -> str:
+        return (await asyncio.to_thread(self._write, [message]))[0]
+
+    async def send_batch(self, messages: list) -> list:
+        return await asyncio.to_thread(self._write, messages)
+
+    async def aclose(self):
+        pass
+
+
+class SmtpTransport:
+    """Delivers through an SMTP server; a batch shares one connection"""
+
+    def _deliver(self, messages: list) -> list:
+        try:
+            with metrics.time_dependency("smtp", "send_batch"), smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=EMAIL_HTTP_TIMEOUT_SECONDS) as smtp:
+                if SMTP_STARTTLS:
+                    smtp.starttls()
+                if SMTP_USERNAME:
+                    smtp.login(SMTP_USERNAME, SMTP_PASSWORD or "")
+                ids = []
+                for message in messages:
+                    mime = to_mime(message)
+                    smtp.send_message(mime)
+                    ids.append(mime["Message-ID"])
+                return ids
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentEmailError(f"Recipient refused: {e.recipients}")
+        except (smtplib.SMTPException, OSError) as e:
+            raise TransientEmailError(f"{type(e).__name__}: {e}")
+
+    async def send(self, message: dict) -> str:
+        return (await asyncio.to_thread(self._deliver, [message]))[0]
+
+    async def send_batch(self, messages: list) -> list:
+        return await asyncio.to_thread(self._deliver, messages)
+
+    async def aclose(self):
+        pass
+
+
+TRANSPORTS = {
+    "resend": ResendTransport,
+    "file": FileTransport,
+    "smtp": SmtpTransport,
+}
+
+
+def get_transport(name: str = None):
+    """Build the transport selected by EMAIL_TRANSPORT"""
+    name = (name or EMAIL_TRANSPORT).lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown EMAIL_TRANSPORT {name!r}; expected one of {', '.join(TRANSPORTS)}")
+    return TRANSPORTS[name]()
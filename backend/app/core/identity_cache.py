@@ -0,0 +1,111 @@
+# app/core/identity_cache.py - Short-lived per-process cache for get_current_user
+#
+# Two layers, both keyed by the raw bearer token:
+#   * decoded JWT claims, kept until the token's own "exp"
+#   * a column snapshot of the Admin/Student row, kept for IDENTITY_CACHE_TTL_SECONDS
+#
+# On a hit the snapshot is re-attached to the request's Session without a query,
+# so routes can keep mutating current_user and committing as before.
+# Each gunicorn worker has its own cache; writes on another worker are picked up
+# once the short TTL runs out.
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "30"))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "2048"))
+CLAIMS_CACHE_MAX_ENTRIES = int(os.getenv("CLAIMS_CACHE_MAX_ENTRIES", "8192"))
+
+
+class TTLCache:
+    """Thread-safe LRU where every entry carries its own expiry"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float):
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_where(self, predicate) -> int:
+        with self._lock:
+            stale = [k for k, (_, v) in self._data.items() if predicate(v)]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_claims = TTLCache(CLAIMS_CACHE_MAX_ENTRIES)
+_identities = TTLCache(IDENTITY_CACHE_MAX_ENTRIES)
+
+
+# ── Decoded claims ─────
+def get_claims(token: str):
+    return _claims.get(token)
+
+
+def cache_claims(token: str, payload: dict):
+    exp = payload.get("exp")
+    if exp is None:
+        return
+    _claims.set(token, payload, exp - datetime.now(timezone.utc).timestamp())
+
+
+# ── Identities ─────
+def get_identity(token: str, db: Session):
+    """Return the cached user attached to db, or None on a miss"""
+    entry = _identities.get(token)
+    if entry is None:
+        return None
+    model, values = entry
+    user = model(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def cache_identity(token: str, user):
+    mapper = inspect(type(user))
+    values = {attr.key: getattr(user, attr.key) for attr in mapper.column_attrs}
+    _identities.set(token, (type(user), values), IDENTITY_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(email: str) -> int:
+    """Drop every cached identity for this email - call after committing a change to the user row"""
+    return _identities.discard_where(lambda entry: entry[1].get("email") == email)
+
+
+def clear():
+    _claims.clear()
+    _identities.clear()
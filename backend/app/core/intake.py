@@ -0,0 +1,34 @@
+# app/core/intake.py - Which academic intake an application belongs to
+#
+# Applications open in the second half of the year for the next year's intake,
+# so from INTAKE_ROLLOVER_MONTH onwards new applications count towards next
+# year. Admin views, the demand counters and the document reminders look at
+# the current intake, except that applications still pending from any kept
+# intake stay in the admin queue and pending counts until they are decided;
+# app.jobs.application_archiver moves intakes older than the last
+# APPLICATION_KEEP_INTAKES into applications_archive.
+#
+#   INTAKE_ROLLOVER_MONTH      default 8 (August)
+#   CURRENT_INTAKE_YEAR        pin the intake instead of deriving it from the date
+#   APPLICATION_KEEP_INTAKES   intakes kept in applications, default 2 (current + previous)
+import os
+from datetime import date
+
+INTAKE_ROLLOVER_MONTH = int(os.getenv("INTAKE_ROLLOVER_MONTH", "8"))
+CURRENT_INTAKE_YEAR = os.getenv("CURRENT_INTAKE_YEAR")
+APPLICATION_KEEP_INTAKES = max(1, int(os.getenv("APPLICATION_KEEP_INTAKES", "2")))
+
+
+def intake_year_for(day: date) -> int:
+    return day.year + (1 if day.month >= INTAKE_ROLLOVER_MONTH else 0)
+
+
+def current_intake_year() -> int:
+    if CURRENT_INTAKE_YEAR:
+        return int(CURRENT_INTAKE_YEAR)
+    return intake_year_for(date.today())
+
+
+def oldest_kept_intake() -> int:
+    """Intakes before this one belong in applications_archive"""
+    return current_intake_year() - APPLICATION_KEEP_INTAKES + 1
@@ -0,0 +1,77 @@
+# app/core/loop_monitor.py - Detect code that blocks the event loop
+#
+# A task sleeps LOOP_MONITOR_INTERVAL_MS at a time and measures how late it
+# wakes up. Any lag means something ran on the loop thread without awaiting:
+# a sync DB call or boto3 inside an `async def` route, a big json.dumps, a
+# CPU-heavy loop. Every measurement feeds campusstay_event_loop_lag_seconds.
+# Lag over LOOP_LAG_WARN_MS is printed with the routes that were running during
+# the stall (in flight, or finished while the timer was overdue); one of them is
+# the culprit.
+#
+#   LOOP_MONITOR_ENABLED       default true
+#   LOOP_MONITOR_INTERVAL_MS   default 100
+#   LOOP_LAG_WARN_MS           default 100
+import asyncio
+import os
+import time
+
+from . import metrics, request_context
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+
+
+class LoopLagStats:
+    def __init__(self):
+        self.samples = 0
+        self.max_lag = 0.0
+        self.over_threshold = 0
+        self.worst_routes = []
+
+    def as_dict(self) -> dict:
+        return {
+            "samples": self.samples,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "over_threshold": self.over_threshold,
+            "worst_routes": self.worst_routes,
+        }
+
+
+_task = None
+stats = LoopLagStats()
+
+
+async def monitor(interval: float, warn_after: float, lag_stats: LoopLagStats):
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - expected)
+        routes = request_context.in_flight_routes(since=expected) if lag >= warn_after else None
+        lag_stats.samples += 1
+        metrics.EVENT_LOOP_LAG.observe(lag)
+        if lag > lag_stats.max_lag:
+            lag_stats.max_lag = lag
+            lag_stats.worst_routes = routes or []
+        if routes is not None:
+            lag_stats.over_threshold += 1
+            print(f"⚠️ Event loop blocked for {lag * 1000:.0f}ms; in flight: {', '.join(routes) or 'no requests'}")
+
+
+def start():
+    global _task
+    if LOOP_MONITOR_ENABLED and _task is None:
+        _task = asyncio.get_running_loop().create_task(
+            monitor(LOOP_MONITOR_INTERVAL_MS / 1000, LOOP_LAG_WARN_MS / 1000, stats)
+        )
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
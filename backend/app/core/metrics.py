@@ -0,0 +1,153 @@
+# app/core/metrics.py - Prometheus metrics for /metrics
+#
+# Under gunicorn every worker is its own process, so counters use
+# prometheus_client's multiprocess mode: each process writes its values to
+# mmapped files in PROMETHEUS_MULTIPROC_DIR and a scrape of /metrics (served by
+# whichever worker gets it) sums all of them. Updates are a dict lookup and an
+# mmap write, with no cross-process locking. backend/gunicorn.conf.py prepares
+# the directory and cleans up after dead workers. Without PROMETHEUS_MULTIPROC_DIR
+# (uvicorn --reload, scripts) the normal in-process registry is used.
+#
+#   campusstay_http_requests_total / _request_duration_seconds   per route template
+#   campusstay_http_request_db_seconds                           DB time per request
+#   campusstay_n_plus_one_requests_total                         requests with a repeated statement
+#   campusstay_db_pool_*                                         SQLAlchemy pool gauges
+#   campusstay_db_pool_wait_seconds{pool} / _exhausted / _timeouts  checkout waits (app.core.db_pool)
+#   campusstay_dependency_duration_seconds{service,operation}    R2 and Resend calls
+#   campusstay_event_loop_lag_seconds                            how late the loop runs a timer
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # if set, /metrics requires "Authorization: Bearer <token>"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUESTS = Counter(
+    "campusstay_http_requests_total", "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "campusstay_http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+HTTP_DB_TIME = Histogram(
+    "campusstay_http_request_db_seconds", "Time spent in SQL per HTTP request",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+N_PLUS_ONE = Counter(
+    "campusstay_n_plus_one_requests_total", "Requests that repeated one SQL statement N_PLUS_ONE_THRESHOLD+ times",
+    ["method", "route"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "campusstay_db_pool_checked_out", "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "campusstay_db_pool_overflow", "Connections open beyond pool_size",
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "campusstay_db_pool_size", "Configured pool_size",
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "campusstay_db_pool_wait_seconds", "Time to get a connection from the pool, including opening one",
+    ["pool"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+DB_POOL_EXHAUSTED = Counter(
+    "campusstay_db_pool_exhausted_total", "Checkouts that found every connection in use and had to queue",
+    ["pool"],
+)
+DB_POOL_TIMEOUTS = Counter(
+    "campusstay_db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT_SECONDS",
+    ["pool"],
+)
+DEPENDENCY_LATENCY = Histogram(
+    "campusstay_dependency_duration_seconds", "Latency of calls to external services",
+    ["service", "operation", "outcome"], buckets=LATENCY_BUCKETS,
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "campusstay_event_loop_lag_seconds", "Delay between a timer being due and the event loop running it",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+# ── HTTP ─────
+def observe_request(method: str, route: str, status: int, seconds: float, db_seconds: float):
+    HTTP_REQUESTS.labels(method, route, str(status)).inc()
+    HTTP_LATENCY.labels(method, route).observe(seconds)
+    HTTP_DB_TIME.labels(method, route).observe(db_seconds)
+
+
+# ── External services ─────
+def observe_dependency(service: str, operation: str, outcome: str, seconds: float):
+    DEPENDENCY_LATENCY.labels(service, operation, outcome).observe(seconds)
+
+
+@contextmanager
+def time_dependency(service: str, operation: str):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        observe_dependency(service, operation, outcome, time.perf_counter() - started)
+
+
+def instrument_boto3(client, service: str):
+    """Time every API call made through a boto3 client via botocore's event hooks"""
+    def before_call(model=None, context=None, **kwargs):
+        context["metrics_operation"] = model.name
+        context["metrics_started"] = time.perf_counter()
+
+    def after_call(http_response=None, context=None, **kwargs):
+        outcome = "ok" if http_response is not None and http_response.status_code < 400 else "error"
+        _finish(context, outcome)
+
+    def after_call_error(context=None, **kwargs):
+        _finish(context, "error")
+
+    def _finish(context, outcome):
+        started = context.pop("metrics_started", None)
+        if started is not None:
+            observe_dependency(service, context["metrics_operation"], outcome, time.perf_counter() - started)
+
+    events = client.meta.events
+    events.register("before-call.s3", before_call)
+    events.register("after-call.s3", after_call)
+    events.register("after-call-error.s3", after_call_error)
+
+
+# ── DB pool ─────
+def instrument_pool(engine):
+    """Keep the pool gauges current from checkout/checkin events"""
+    pool = engine.pool
+
+    def update(*args):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+        DB_POOL_OVERFLOW.set(max(0, pool.overflow()))
+
+    DB_POOL_SIZE.set(pool.size())
+    event.listen(engine, "checkout", update)
+    event.listen(engine, "checkin", update)
+
+
+# ── Exposition ─────
+def render() -> tuple:
+    """(body, content type) for the /metrics endpoint"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
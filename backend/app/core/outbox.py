@@ -0,0 +1,448 @@
+# app/core/outbox.py - Transactional email outbox
+#
+# Routers call enqueue() before db.commit(), so an email exists if and only if
+# the change that triggered it was committed. Background workers claim due rows
+# with FOR UPDATE SKIP LOCKED (safe with many gunicorn workers / instances),
+# deliver them through the configured transport, and retry with exponential
+# backoff until OUTBOX_MAX_ATTEMPTS, after which the row is dead-lettered.
+#
+# Bulk notifications (enqueue_bulk) share the table but are tagged with a
+# bulk_id; they are claimed and delivered by a separate loop, so a 5,000-student
+# announcement never delays a password reset, and go out through Resend's batch
+# endpoint. A worker renews the lease on rows it is still delivering, so a slow
+# batch is never reclaimed (and sent twice) by another worker.
+#
+# Link tokens (verification, password reset) are passed as `secret` and stored
+# encrypted (security.seal) with the link's expires_at. The payload is cleared
+# once the row is sent, dead-lettered or past expires_at (token_sweeper), and
+# a row that is claimed after expiry is dead-lettered instead of sent.
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import and_, bindparam, func, insert, null, or_, select, update
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from ..database import SessionLocal
+from . import security
+from .email_utils import EMAIL_BUILDERS
+from .email_transport import (
+    RESEND_BATCH_MAX, PermanentEmailError, TransientEmailError, build_message, get_transport,
+)
+
+OUTBOX_WORKERS_IN_APP = os.getenv("OUTBOX_WORKERS_IN_APP", "true").lower() == "true"
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "10"))  # also the max concurrent sends
+OUTBOX_BULK_BATCH_SIZE = int(os.getenv("OUTBOX_BULK_BATCH_SIZE", "500"))  # bulk rows per tick, sent 100 per call
+BULK_INSERT_CHUNK = 1000
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+LEASE_RENEW_SECONDS = OUTBOX_LEASE_SECONDS / 3
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BASE_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BASE_BACKOFF_SECONDS", "30"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+
+_tasks = []
+_transport = get_transport()
+_stats_lock = threading.Lock()
+_stats = {
+    "claimed": 0,
+    "sent": 0,
+    "send_calls": 0,
+    "batch_calls": 0,
+    "retried": 0,
+    "dead": 0,
+    "send_seconds_total": 0.0,
+    "send_seconds_max": 0.0,
+    "queue_lag_seconds_total": 0.0,
+}
+
+
+def _bump(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            if key.endswith("_max"):
+                _stats[key] = max(_stats[key], value)
+            else:
+                _stats[key] += value
+
+
+# ── Producer side ─────
+SEALED_KEY = "_sealed"
+
+
+def enqueue(db, kind: str, to_email: str, secret: dict = None, expires_at: datetime = None, **params):
+    """Queue an email in the caller's transaction - it is only sent if the caller commits.
+
+    `secret` holds builder kwargs that must not sit in the table readable
+    (link tokens); pass the link's `expires_at` with them."""
+    if kind not in EMAIL_BUILDERS:
+        raise ValueError(f"Unknown email kind: {kind}")
+    payload = dict(params)
+    if secret:
+        payload[SEALED_KEY] = {key: security.seal(value) for key, value in secret.items()}
+    db.add(models.EmailOutbox(
+        kind=kind,
+        to_email=to_email,
+        payload=payload,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.now(timezone.utc),
+        expires_at=expires_at,
+    ))
+
+
+def enqueue_bulk(db, kind: str, recipients, bulk_id: str = None, admin_id: int = None) -> tuple:
+    """Queue one email per (to_email, params) pair under a shared bulk_id.
+
+    Rows are inserted with multi-row INSERTs; like enqueue(), nothing is sent
+    unless the caller commits. Pass bulk_id to add to an existing bulk send,
+    and admin_id to tie it to the admin sending it (see bulk_status).
+    Returns (bulk_id, recipient_count)."""
+    if kind not in EMAIL_BUILDERS:
+        raise ValueError(f"Unknown email kind: {kind}")
+    bulk_id = bulk_id or uuid4().hex
+    now = datetime.now(timezone.utc)
+    rows = [
+        dict(kind=kind, to_email=to_email, payload=params, status="pending",
+             attempts=0, next_attempt_at=now, bulk_id=bulk_id, admin_id=admin_id)
+        for to_email, params in recipients
+    ]
+    for start in range(0, len(rows), BULK_INSERT_CHUNK):
+        db.execute(insert(models.EmailOutbox), rows[start:start + BULK_INSERT_CHUNK])
+    return bulk_id, len(rows)
+
+
+# ── Consumer side ─────
+def backoff_seconds(attempts: int) -> float:
+    delay = min(OUTBOX_MAX_BACKOFF_SECONDS, OUTBOX_BASE_BACKOFF_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def builder_params(payload: dict) -> dict:
+    """A row's payload as builder kwargs, with sealed values decrypted"""
+    params = dict(payload or {})
+    sealed = params.pop(SEALED_KEY, None) or {}
+    params.update({key: security.unseal(value) for key, value in sealed.items()})
+    return params
+
+
+def render(row: dict) -> tuple:
+    if row.get("expires_at") is not None and row["expires_at"] <= datetime.now(timezone.utc):
+        raise ValueError("link expired before it could be sent")
+    return EMAIL_BUILDERS[row["kind"]](**builder_params(row["payload"]))
+
+
+def claim_batch(limit: int = OUTBOX_BATCH_SIZE, bulk: bool = False) -> list:
+    """Lease up to `limit` due rows (transactional, or bulk if `bulk`) to this worker"""
+    Outbox = models.EmailOutbox
+    now = datetime.now(timezone.utc)
+    due = (
+        select(Outbox.id)
+        .where(or_(
+            and_(Outbox.status == "pending", Outbox.next_attempt_at <= now),
+            # a worker died mid-send; its lease has run out
+            and_(Outbox.status == "sending", Outbox.locked_until < now),
+        ))
+        .where(Outbox.bulk_id.is_not(None) if bulk else Outbox.bulk_id.is_(None))
+        .order_by(Outbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            update(Outbox)
+            .where(Outbox.id.in_(due))
+            .values(
+                status="sending",
+                locked_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                attempts=Outbox.attempts + 1,
+            )
+            .returning(Outbox.id, Outbox.kind, Outbox.to_email, Outbox.payload, Outbox.attempts, Outbox.created_at,
+                       Outbox.expires_at)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+    finally:
+        db.close()
+    if rows:
+        _bump(claimed=len(rows))
+    return [row._asdict() for row in rows]
+
+
+def extend_lease(ids: list) -> int:
+    """Push locked_until out again for rows this worker still holds"""
+    Outbox = models.EmailOutbox
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        count = db.execute(
+            update(Outbox)
+            # An expired lease may already belong to another worker
+            .where(Outbox.id.in_(ids), Outbox.status == "sending", Outbox.locked_until >= now)
+            .values(locked_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def holding_lease(rows: list):
+    """Renew the lease on `rows` every LEASE_RENEW_SECONDS until the block exits"""
+    ids = [row["id"] for row in rows]
+
+    async def renew():
+        while True:
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+            try:
+                await run_in_threadpool(extend_lease, ids)
+            except Exception as e:
+                print(f"⚠️ Outbox lease renewal failed: {e}")
+
+    task = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def record_results(results: list):
+    """Persist the outcome of one delivered batch in a single transaction"""
+    Outbox = models.EmailOutbox
+    now = datetime.now(timezone.utc)
+    sent = [
+        {"row_id": row["id"], "provider_id": provider_id}
+        for row, provider_id, error, _ in results if error is None
+    ]
+    for row, _, error, _ in results:
+        if error is None:
+            _bump(sent=1, queue_lag_seconds_total=(now - row["created_at"]).total_seconds())
+
+    db = SessionLocal()
+    try:
+        if sent:
+            # One executemany for the common case instead of an UPDATE per email
+            table = Outbox.__table__
+            db.connection().execute(
+                update(table).where(table.c.id == bindparam("row_id")).values(
+                    status="sent", sent_at=now, provider_id=bindparam("provider_id"),
+                    payload=null(), locked_until=None, last_error=None,
+                ),
+                sent,
+            )
+        for row, provider_id, error, permanent in results:
+            if error is None:
+                continue
+            elif permanent or row["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                values = dict(status="dead", locked_until=None, last_error=error[:2000])
+                if row.get("expires_at") is not None:
+                    # Nothing to retry with once a link is involved; don't keep the token
+                    values["payload"] = null()
+                _bump(dead=1)
+                print(f"💀 Email {row['id']} ({row['kind']} → {row['to_email']}) dead-lettered: {error}")
+            else:
+                values = dict(
+                    status="pending",
+                    locked_until=None,
+                    last_error=error[:2000],
+                    next_attempt_at=now + timedelta(seconds=backoff_seconds(row["attempts"])),
+                )
+                _bump(retried=1)
+            db.execute(
+                update(Outbox).where(Outbox.id == row["id"]).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def deliver(row: dict, transport=None):
+    """Render and send one outbox row -> (row, provider_id, error, permanent)"""
+    transport = transport or _transport
+    try:
+        subject, html_body, text_body = render(row)
+    except Exception as e:
+        return row, None, f"Render failed: {type(e).__name__}: {e}", True
+
+    started = time.perf_counter()
+    try:
+        provider_id = await transport.send(build_message(row["to_email"], subject, html_body, text_body))
+        return row, provider_id, None, False
+    except PermanentEmailError as e:
+        return row, None, str(e), True
+    except TransientEmailError as e:
+        return row, None, str(e), False
+    except Exception as e:
+        return row, None, f"{type(e).__name__}: {e}", False
+    finally:
+        elapsed = time.perf_counter() - started
+        _bump(send_calls=1, send_seconds_total=elapsed, send_seconds_max=elapsed)
+
+
+async def deliver_bulk(rows: list, transport=None) -> list:
+    """Render claimed bulk rows and send them RESEND_BATCH_MAX per API call"""
+    transport = transport or _transport
+    results, ready = [], []
+    for row in rows:
+        try:
+            subject, html_body, text_body = render(row)
+        except Exception as e:
+            results.append((row, None, f"Render failed: {type(e).__name__}: {e}", True))
+            continue
+        ready.append((row, build_message(row["to_email"], subject, html_body, text_body)))
+
+    for start in range(0, len(ready), RESEND_BATCH_MAX):
+        chunk = ready[start:start + RESEND_BATCH_MAX]
+        started = time.perf_counter()
+        try:
+            ids = await transport.send_batch([message for _, message in chunk])
+            ids += [None] * (len(chunk) - len(ids))
+            results.extend((row, provider_id, None, False) for (row, _), provider_id in zip(chunk, ids))
+        except PermanentEmailError:
+            # The batch endpoint rejects the whole call for one bad message;
+            # fall back to single sends so only that recipient is dead-lettered.
+            # One at a time: the rate limiter is shared with transactional mail,
+            # which should not queue behind a whole chunk of these.
+            for row, _ in chunk:
+                results.append(await deliver(row, transport))
+        except Exception as e:
+            error = str(e) if isinstance(e, TransientEmailError) else f"{type(e).__name__}: {e}"
+            results.extend((row, None, error, False) for row, _ in chunk)
+        finally:
+            elapsed = time.perf_counter() - started
+            _bump(batch_calls=1, send_seconds_total=elapsed, send_seconds_max=elapsed)
+    return results
+
+
+async def process_transactional(transport=None) -> int:
+    rows = await run_in_threadpool(claim_batch, OUTBOX_BATCH_SIZE)
+    if not rows:
+        return 0
+    async with holding_lease(rows):
+        results = await asyncio.gather(*(deliver(row, transport) for row in rows))
+    await run_in_threadpool(record_results, list(results))
+    return len(rows)
+
+
+async def process_bulk(transport=None) -> int:
+    rows = await run_in_threadpool(claim_batch, OUTBOX_BULK_BATCH_SIZE, True)
+    if not rows:
+        return 0
+    async with holding_lease(rows):
+        results = await deliver_bulk(rows, transport)
+    await run_in_threadpool(record_results, results)
+    return len(rows)
+
+
+async def _loop(name: str, process, transport=None):
+    while True:
+        try:
+            if await process(transport) == 0:
+                await asyncio.sleep(OUTBOX_POLL_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Outbox {name} worker error: {e}")
+            await asyncio.sleep(OUTBOX_POLL_SECONDS * 5)
+
+
+async def run_forever(transport=None):
+    """Transactional and bulk delivery, each in its own loop"""
+    print("📬 Email outbox worker running")
+    await asyncio.gather(
+        _loop("transactional", process_transactional, transport),
+        _loop("bulk", process_bulk, transport),
+    )
+
+
+def requeue_dead() -> int:
+    """Give every dead-lettered email another full set of attempts.
+
+    Rows whose payload was cleared (a link that expired or was dead-lettered)
+    stay dead: the user has to ask for a new link."""
+    Outbox = models.EmailOutbox
+    db = SessionLocal()
+    try:
+        count = db.execute(
+            update(Outbox).where(Outbox.status == "dead", Outbox.payload.is_not(None))
+            .values(status="pending", attempts=0, next_attempt_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+# ── App lifecycle ─────
+def start():
+    if OUTBOX_WORKERS_IN_APP and not _tasks:
+        print("📬 Email outbox worker running")
+        _tasks.append(asyncio.create_task(_loop("transactional", process_transactional), name="email-outbox"))
+        _tasks.append(asyncio.create_task(_loop("bulk", process_bulk), name="email-outbox-bulk"))
+
+
+async def stop():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    await _transport.aclose()
+
+
+def stats() -> dict:
+    """Delivery counters for this process plus queue depth by status from the DB"""
+    with _stats_lock:
+        result = dict(_stats)
+    calls = (result["send_calls"] + result["batch_calls"]) or 1
+    result["avg_send_ms"] = round(result["send_seconds_total"] / calls * 1000, 1)
+    result["avg_queue_lag_s"] = round(result["queue_lag_seconds_total"] / (result["sent"] or 1), 2)
+
+    db = SessionLocal()
+    try:
+        result["by_status"] = dict(
+            db.query(models.EmailOutbox.status, func.count(models.EmailOutbox.id))
+            .group_by(models.EmailOutbox.status).all()
+        )
+    finally:
+        db.close()
+    return result
+
+
+def bulk_status(db, bulk_id: str, admin_id: int, failed_limit: int = 100) -> dict:
+    """Per-recipient progress of one bulk notification sent by admin_id
+    (nothing, total 0, for anyone else's)"""
+    Outbox = models.EmailOutbox
+    ours = (Outbox.bulk_id == bulk_id, Outbox.admin_id == admin_id)
+    by_status = dict(
+        db.query(Outbox.status, func.count(Outbox.id))
+        .filter(*ours)
+        .group_by(Outbox.status).all()
+    )
+    failed = (
+        db.query(Outbox.to_email, Outbox.attempts, Outbox.last_error)
+        .filter(*ours, Outbox.status == "dead")
+        .order_by(Outbox.id)
+        .limit(failed_limit)
+        .all()
+    )
+    return {
+        "bulk_id": bulk_id,
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "failed": [
+            {"email": email, "attempts": attempts, "error": error}
+            for email, attempts, error in failed
+        ],
+    }
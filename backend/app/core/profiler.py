@@ -0,0 +1,264 @@
+# app/core/profiler.py - On-demand request profiling and memory snapshots for admins
+#
+# Off unless PROFILING_ENABLED=true. When off, ProfilerMiddleware isn't added
+# and the admin endpoints return 404, so there is nothing on the request path.
+#
+# When on, an admin adds "X-Profile: 1" to any request. That one request runs
+# with a sampling profiler: a thread reads sys._current_frames() every
+# PROFILE_INTERVAL_MS and counts the stacks of threads that are running app
+# code. That covers async endpoints on the event loop and sync endpoints in
+# the threadpool alike. Other requests running on the same worker at that
+# moment can add samples, so profile on a quiet worker where you can.
+# The stacks are written in collapsed format (flamegraph.pl, speedscope)
+# to PROFILE_DIR, and the response carries X-Profile-Id for
+# GET /admin/profiles/{id}. One profile runs per worker at a time.
+#
+# tracemalloc is never started implicitly: POST /admin/memory/start, take
+# snapshots with GET /admin/memory (top allocation sites, plus growth since
+# the previous snapshot), then POST /admin/memory/stop.
+#
+#   PROFILING_ENABLED        default false
+#   PROFILE_INTERVAL_MS      sampling interval (default 2)
+#   PROFILE_DIR              where profiles are written (shared by workers on a host)
+#   PROFILE_KEEP             newest profiles kept on disk (default 50)
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from jose import JWTError, jwt
+
+from . import identity_cache
+from .security import ALGORITHM, SECRET_KEY
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "campusstay-profiles")))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "15"))
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+_busy = threading.Lock()
+
+
+# ── Admin check (before routing, so straight from the JWT) ─────
+def is_admin_token(authorization: bytes) -> bool:
+    scheme, _, token = authorization.decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    payload = identity_cache.get_claims(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return False
+    return payload.get("role") == "admin"
+
+
+# ── Sampling ─────
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(APP_DIR):
+        filename = os.path.relpath(filename, os.path.dirname(APP_DIR))
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """Counts collapsed stacks of every thread that is inside app code"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                codes, in_app = [], False
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    in_app = in_app or frame.f_code.co_filename.startswith(APP_DIR)
+                    frame = frame.f_back
+                if in_app:
+                    self.stacks[tuple(reversed(codes))] += 1
+
+    def collapsed(self) -> str:
+        labels = {}
+        lines = []
+        for codes, count in self.stacks.most_common():
+            names = [labels.get(code) or labels.setdefault(code, _frame_label(code)) for code in codes]
+            lines.append(f"{';'.join(names)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _save(sampler: Sampler, meta: dict, profile_id: str):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{profile_id}.collapsed").write_text(sampler.collapsed())
+    (PROFILE_DIR / f"{profile_id}.json").write_text(json.dumps(meta))
+    old = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)[:-PROFILE_KEEP]
+    for path in old:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".collapsed").unlink(missing_ok=True)
+
+
+class ProfilerMiddleware:
+    """Added by main.py only when PROFILING_ENABLED"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope) or not _busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        result = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                result["status"] = message["status"]
+                message["headers"] = list(message.get("headers", ())) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profile_id = uuid.uuid4().hex
+        started = time.perf_counter()
+        try:
+            with Sampler(PROFILE_INTERVAL_MS / 1000) as sampler:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            _busy.release()
+        meta = {
+            "id": profile_id,
+            "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "method": scope["method"],
+            "route": getattr(scope.get("route"), "path", None),
+            "path": scope["path"],
+            "status": result["status"],
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "samples": sampler.samples,
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "pid": os.getpid(),
+        }
+        try:
+            _save(sampler, meta, profile_id)
+        except OSError as e:
+            print(f"❌ Could not save profile {profile_id}: {e}")
+
+    @staticmethod
+    def _wants_profile(scope) -> bool:
+        wants, authorization = False, None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-profile":
+                wants = value not in (b"", b"0", b"false")
+            elif name == b"authorization":
+                authorization = value
+        # Non-admins asking for a profile just get a normal request
+        return wants and authorization is not None and is_admin_token(authorization)
+
+
+# ── Stored profiles ─────
+def list_profiles() -> list:
+    if not PROFILE_DIR.exists():
+        return []
+    metas = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            metas.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return metas
+
+
+def load_profile(profile_id: str):
+    """Collapsed stacks for a profile, or None"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.collapsed"
+    return path.read_text() if path.exists() else None
+
+
+# ── tracemalloc ─────
+_last_snapshot = None
+
+
+def start_tracemalloc(frames: int = TRACEMALLOC_FRAMES) -> dict:
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        _last_snapshot = None
+    return memory_status()
+
+
+def stop_tracemalloc() -> dict:
+    global _last_snapshot
+    tracemalloc.stop()
+    _last_snapshot = None
+    return memory_status()
+
+
+def memory_status() -> dict:
+    status = {"tracing": tracemalloc.is_tracing(), "pid": os.getpid()}
+    if status["tracing"]:
+        current, peak = tracemalloc.get_traced_memory()
+        status.update(
+            traced_mb=round(current / 1e6, 2),
+            peak_mb=round(peak / 1e6, 2),
+            overhead_mb=round(tracemalloc.get_tracemalloc_memory() / 1e6, 2),
+        )
+    return status
+
+
+def _stat_entry(stat) -> dict:
+    entry = {
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count,
+        "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+def memory_snapshot(limit: int = 25, group_by: str = "lineno") -> dict:
+    """Top allocation sites now, and the biggest growth since the previous call"""
+    global _last_snapshot
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    result = memory_status()
+    result["top"] = [_stat_entry(stat) for stat in snapshot.statistics(group_by)[:limit]]
+    if _last_snapshot is not None:
+        result["growth"] = [
+            _stat_entry(stat) for stat in snapshot.compare_to(_last_snapshot, group_by)[:limit]
+            if stat.size_diff > 0
+        ]
+    _last_snapshot = snapshot
+    return result
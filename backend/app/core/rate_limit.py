@@ -0,0 +1,216 @@
+# app/core/rate_limit.py - Token-bucket rate limiting for expensive endpoints
+#
+# Buckets are keyed by "<policy>:<ip or account>". By default they live in a
+# dict of at most RATE_LIMIT_MAX_KEYS per worker. Only a bucket that has
+# refilled completely carries no state, so only those are evicted to make
+# room; when none of the least recently used ones has, a new key is refused
+# (429) rather than given a fresh bucket - otherwise spraying new keys would
+# push a drained bucket out and reset it. Set RATE_LIMIT_REDIS_URL to share
+# buckets across gunicorn workers and instances (needs the optional `redis` package).
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# Number of proxies in front of us that append to X-Forwarded-For (Render = 1, 0 = use socket peer)
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "1"))
+
+
+class Limit(NamedTuple):
+    capacity: int      # burst size
+    per_seconds: float  # time to refill a full bucket
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+def _limit_from_env(policy: str, default: Limit) -> Limit:
+    """RATE_LIMIT_LOGIN_IP=20/60 overrides the "login:ip" policy"""
+    raw = os.getenv("RATE_LIMIT_" + policy.upper().replace(":", "_").replace("-", "_"))
+    if not raw:
+        return default
+    capacity, seconds = raw.split("/")
+    return Limit(int(capacity), float(seconds))
+
+
+POLICIES = {
+    name: _limit_from_env(name, default)
+    for name, default in {
+        "login:ip": Limit(20, 60),
+        "login:account": Limit(5, 300),
+        "register:ip": Limit(5, 3600),
+        "forgot-password:ip": Limit(5, 900),
+        "forgot-password:account": Limit(3, 3600),
+        "reminder:ip": Limit(10, 3600),
+        "reminder:account": Limit(3, 3600),
+        # Each tab refreshes about once an hour, but a campus NAT puts many students on one IP
+        "refresh:ip": Limit(60, 60),
+    }.items()
+}
+
+
+# ── Backends ─────
+class MemoryBuckets:
+    """key -> (tokens, last_seen, full_at) in a size-capped LRU dict; O(1) per check,
+    plus a scan of at most EVICTION_SCAN entries when a new key needs room"""
+
+    EVICTION_SCAN = 64
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        """Consume cost tokens; returns 0 if allowed, else seconds until it would be"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                if len(self._buckets) >= self.max_keys:
+                    wait = self._evict_refilled(now)
+                    if wait:
+                        return wait
+                tokens = float(limit.capacity)
+            else:
+                tokens = min(limit.capacity, state[0] + (now - state[1]) * limit.rate)
+
+            retry_after = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / limit.rate
+
+            self._buckets[key] = (tokens, now, now + (limit.capacity - tokens) / limit.rate)
+            self._buckets.move_to_end(key)
+        return retry_after
+
+    def _evict_refilled(self, now: float) -> float:
+        """Drop one full bucket from the least recently used end -> 0, or
+        the seconds until the soonest of them is full if none is yet"""
+        soonest = None
+        for index, (key, (_, _, full_at)) in enumerate(self._buckets.items()):
+            if full_at <= now:
+                del self._buckets[key]
+                return 0.0
+            soonest = full_at if soonest is None else min(soonest, full_at)
+            if index + 1 >= self.EVICTION_SCAN:
+                break
+        return 0.0 if soonest is None else max(1.0, soonest - now)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(retry)
+"""
+
+
+class RedisBuckets:
+    """Same algorithm as MemoryBuckets, run atomically inside Redis"""
+
+    def __init__(self, url: str):
+        import redis  # optional dependency
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25)
+        self._script = self._client.register_script(_TOKEN_BUCKET_LUA)
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        try:
+            return float(self._script(
+                keys=[f"rl:{key}"],
+                args=[limit.capacity, limit.rate, time.time(), cost],
+            ))
+        except Exception as e:
+            # Fail open - a Redis hiccup must not lock everyone out of login
+            print(f"⚠️ Rate limit backend error: {e}")
+            return 0.0
+
+    def clear(self):
+        pass
+
+
+def _make_backend():
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            backend = RedisBuckets(RATE_LIMIT_REDIS_URL)
+            print("✅ Rate limiting: shared Redis buckets")
+            return backend
+        except ImportError:
+            print("⚠️ RATE_LIMIT_REDIS_URL set but `redis` is not installed - using per-worker buckets")
+    return MemoryBuckets(RATE_LIMIT_MAX_KEYS)
+
+
+backend = _make_backend()
+
+
+# ── Public API ─────
+def client_ip_from(forwarded: str, peer: str) -> str:
+    """The client address given an X-Forwarded-For value (or None) and the socket peer"""
+    if RATE_LIMIT_PROXY_HOPS > 0 and forwarded:
+        # Take the address our own proxy appended - earlier entries are client-controlled
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if hops:
+            return hops[-min(RATE_LIMIT_PROXY_HOPS, len(hops))]
+    return peer
+
+
+def client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else "unknown"
+    return client_ip_from(request.headers.get("x-forwarded-for"), peer)
+
+
+def check(policy: str, key) -> None:
+    """Take one token from policy's bucket for key, raising 429 when it is empty"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    retry_after = backend.take(f"{policy}:{key}", POLICIES[policy])
+    if retry_after > 0:
+        seconds = max(1, math.ceil(retry_after))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many requests. Please try again in {seconds} seconds.",
+            headers={"Retry-After": str(seconds)},
+        )
+
+
+def limit_by_ip(policy: str):
+    """Route dependency: dependencies=[Depends(rate_limit.limit_by_ip("login:ip"))]"""
+    async def dependency(request: Request):
+        ip = client_ip(request)
+        if isinstance(backend, MemoryBuckets):
+            check(policy, ip)
+        else:
+            await run_in_threadpool(check, policy, ip)
+    return dependency
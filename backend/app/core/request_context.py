@@ -0,0 +1,171 @@
+# app/core/request_context.py - Per-request counters shared by middleware and the DB layer
+#
+# The access log middleware opens a RequestStats for each request in a
+# contextvar. Sync routes run in AnyIO's threadpool with a copy of the context,
+# which still points at the same RequestStats object, so SQLAlchemy cursor
+# events fired from the worker thread add their time to the right request.
+#
+# Each request also counts how often it runs each distinct SQL string. The
+# same SELECT issued N_PLUS_ONE_THRESHOLD+ times with different parameters is
+# the signature of an N+1 (a lazy load or a query inside a loop) and is
+# reported in the access log line.
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+# Imported before anything else loads .env, and QUERY_STATS_HEADERS usually lives there
+load_dotenv()
+
+# X-Query-Count / Server-Timing response headers. Off unless asked for: set
+# QUERY_STATS_HEADERS=true in a development .env (benchmarks.query_budgets sets
+# it for the in-process app)
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "false").lower() == "true"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+
+class RequestStats:
+    __slots__ = ("db_seconds", "db_queries", "statements", "scope")
+
+    def __init__(self, scope: dict = None):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.statements = {}  # SQL text -> times executed
+        self.scope = scope    # ASGI scope; the router adds "route" before the endpoint runs
+
+    @property
+    def route(self) -> Optional[str]:
+        return getattr((self.scope or {}).get("route"), "path", None)
+
+    def repeated_statements(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list:
+        """[(count, statement)] for statements run at least `threshold` times, worst first"""
+        return sorted(
+            ((count, statement) for statement, count in self.statements.items() if count >= threshold),
+            reverse=True,
+        )
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+_in_flight = set()  # RequestStats of HTTP requests being served by this process
+_finished = deque(maxlen=64)  # (perf_counter at end, RequestStats) of the latest ones
+
+
+def begin(scope: dict = None) -> tuple:
+    """Start collecting for the current request -> (stats, token for end())"""
+    stats = RequestStats(scope)
+    if scope is not None:
+        _in_flight.add(stats)
+    return stats, _current.set(stats)
+
+
+def end(token):
+    stats = _current.get()
+    if stats in _in_flight:
+        _in_flight.discard(stats)
+        _finished.append((time.perf_counter(), stats))
+    _current.reset(token)
+
+
+def in_flight_routes(since: float = None) -> list:
+    """Route templates of the requests in progress now, plus any that finished after `since` (perf_counter)"""
+    active = list(_in_flight)
+    if since is not None:
+        active += [stats for finished_at, stats in list(_finished) if finished_at >= since]
+    return sorted({stats.route or "unmatched" for stats in active})
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+# ── Query budgets ─────
+def _budget_error(label: str, used: int, budget: int, stats: RequestStats = None) -> QueryBudgetExceeded:
+    message = f"{label} ran {used} queries, budget is {budget}"
+    if stats is not None:
+        repeated = stats.repeated_statements(threshold=2)
+        if repeated:
+            message += "\nRepeated statements:\n" + "\n".join(
+                f"  {count}x {statement[:200]}" for count, statement in repeated
+            )
+    return QueryBudgetExceeded(message)
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "block"):
+    """Fail if the code inside runs more than `max_queries` SQL statements.
+
+    For code called directly in this context (jobs, scripts, route functions
+    called with a session). Over HTTP use check_response_budget()."""
+    stats, token = begin()
+    try:
+        yield stats
+    finally:
+        end(token)
+    if stats.db_queries > max_queries:
+        raise _budget_error(label, stats.db_queries, max_queries, stats)
+
+
+def check_response_budget(response, max_queries: int, label: str = None):
+    """Fail if a response's X-Query-Count is over budget (needs QUERY_STATS_HEADERS)"""
+    label = label or f"{response.request.method} {response.request.url.path}"
+    header = response.headers.get("x-query-count")
+    if header is None:
+        raise QueryBudgetExceeded(f"{label} has no X-Query-Count header; is QUERY_STATS_HEADERS on?")
+    if int(header) > max_queries:
+        raise _budget_error(label, int(header), max_queries)
+
+
+# ── SQLAlchemy hooks ─────
+_slow_threshold = None  # seconds
+_on_slow = None
+
+
+def on_slow_statement(threshold_seconds: float, callback):
+    """Call callback(statement, parameters, seconds, executemany, stats) for statements slower than the threshold"""
+    global _slow_threshold, _on_slow
+    _slow_threshold, _on_slow = threshold_seconds, callback
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _on_slow is not None or _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if _on_slow is not None and elapsed >= _slow_threshold:
+        _on_slow(statement, parameters, elapsed, executemany, stats)
+    if stats is None:
+        return
+    stats.db_seconds += elapsed
+    stats.db_queries += 1
+    # Compiled statements are cached, so this is usually the same str object with its hash cached
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument(engine):
+    """Attribute every statement run on `engine` to the request that issued it"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
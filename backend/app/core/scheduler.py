@@ -0,0 +1,94 @@
+# app/core/scheduler.py - Lightweight in-process periodic jobs
+#
+# Jobs register with @every(seconds, "name") and run in the threadpool on a
+# fixed interval once start() is called from the app's startup event.
+# Every gunicorn worker runs the loop. A tick takes the job's Postgres advisory
+# lock and then claims the job's scheduled_jobs row, which only succeeds if
+# nobody ran it in the last interval - so the job runs about once per interval
+# across all workers and instances, not once per worker. A run that dies with
+# its process rolls the claim back, and another worker picks the job up.
+import asyncio
+import hashlib
+import os
+import random
+import time
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from ..database import engine
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+# A run is due once this share of the interval has passed, so a worker whose
+# own tick lands a moment early doesn't push the job back a whole interval
+DUE_FRACTION = 0.9
+
+# Records this run and returns a row only if the last one is old enough
+CLAIM_SQL = text("""
+    INSERT INTO scheduled_jobs (name, last_run_at) VALUES (:name, now())
+    ON CONFLICT (name) DO UPDATE SET last_run_at = now()
+    WHERE scheduled_jobs.last_run_at <= now() - make_interval(secs => :due_after)
+    RETURNING name
+""")
+
+_jobs = []
+_tasks = []
+
+
+def every(seconds: float, name: str):
+    """Decorator: run fn() every `seconds` while the app is up"""
+    def register(fn):
+        _jobs.append((name, seconds, fn))
+        return fn
+    return register
+
+
+def _lock_key(name: str) -> int:
+    return int.from_bytes(hashlib.sha256(f"scheduler:{name}".encode()).digest()[:8], "big", signed=True)
+
+
+def run_exclusive(name: str, fn, seconds: float = 0):
+    """Run fn() unless another process holds this job's advisory lock or ran it
+    less than `seconds` ago"""
+    # Transaction-scoped lock, held by a transaction left open while fn() runs: it
+    # goes away with the transaction, so it can't leak onto a connection PgBouncer
+    # (transaction pooling) hands to someone else, and needs no unlock. The
+    # scheduled_jobs claim commits with it, once fn() has returned.
+    with engine.connect() as conn:
+        key = _lock_key(name)
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key}).scalar():
+            return None
+        if conn.execute(CLAIM_SQL, {"name": name, "due_after": seconds * DUE_FRACTION}).first() is None:
+            conn.rollback()
+            return None
+        try:
+            return fn()
+        finally:
+            conn.commit()
+
+
+async def _loop(name: str, seconds: float, fn):
+    # Spread workers out so they don't all hit the lock at the same instant
+    await asyncio.sleep(random.uniform(0, min(seconds, 30)))
+    while True:
+        started = time.perf_counter()
+        try:
+            await run_in_threadpool(run_exclusive, name, fn, seconds)
+        except Exception as e:
+            print(f"❌ Scheduled job {name} failed: {e}")
+        await asyncio.sleep(max(0.0, seconds - (time.perf_counter() - started)))
+
+
+def start():
+    if not SCHEDULER_ENABLED or _tasks:
+        return
+    for name, seconds, fn in _jobs:
+        _tasks.append(asyncio.create_task(_loop(name, seconds, fn), name=f"scheduler:{name}"))
+    print(f"⏱️ Scheduler started: {', '.join(name for name, _, _ in _jobs) or 'no jobs'}")
+
+
+async def stop():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
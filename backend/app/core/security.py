@@ -1,6 +1,16 @@
 # app/core/security.py
+import base64
+import hashlib
+import multiprocessing
 import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from cryptography.fernet import Fernet
 from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
 from jose import jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
@@ -13,8 +23,18 @@ if not SECRET_KEY:
 
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+# A token rotated this recently may be presented again (two tabs refreshing at once)
+REFRESH_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "30"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# ── Password hashing config ─────
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_POOL_ENABLED = os.getenv("HASH_POOL_ENABLED", "true").lower() == "true"
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+HASH_POOL_MAX_QUEUE = int(os.getenv("HASH_POOL_MAX_QUEUE", "16"))
+HASH_POOL_TIMEOUT_SECONDS = float(os.getenv("HASH_POOL_TIMEOUT_SECONDS", "5"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
@@ -23,6 +43,26 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def generate_opaque_token() -> str:
+    """Random URL-safe token for links and refresh tokens (not a JWT)"""
+    return secrets.token_urlsafe(32)
+
+def hash_token(token: str) -> str:
+    """Fixed-width sha256 hex digest - what we store and index instead of the raw token"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+# Raw link tokens waiting in the email outbox are kept encrypted, so a dump of
+# email_outbox is not a set of working reset links. The key is derived from
+# SECRET_KEY; rotating it makes queued links unreadable (they dead-letter).
+_outbox_fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(b"email-outbox:" + SECRET_KEY.encode()).digest()))
+
+def seal(value: str) -> str:
+    return _outbox_fernet.encrypt(value.encode("utf-8")).decode("ascii")
+
+def unseal(value: str) -> str:
+    """Raises cryptography.fernet.InvalidToken if it was sealed under another key"""
+    return _outbox_fernet.decrypt(value.encode("ascii")).decode("utf-8")
+
 # FIXED: Truncate passwords to 72 bytes so bcrypt never crashes
 def _safe_bcrypt_password(password: str) -> str:
     encoded = password.encode("utf-8")
@@ -30,8 +70,168 @@ def _safe_bcrypt_password(password: str) -> str:
         return encoded[:72].decode("utf-8", errors="ignore")
     return password
 
+
+# ── Worker-process entry points (must be top-level so they pickle) ─────
+def _verify_in_worker(plain_password: str, hashed_password: str):
+    started = time.perf_counter()
+    result = pwd_context.verify(plain_password, hashed_password)
+    return result, time.perf_counter() - started
+
+
+def _hash_in_worker(password: str):
+    started = time.perf_counter()
+    result = pwd_context.hash(password)
+    return result, time.perf_counter() - started
+
+
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class HashingPool:
+    """Size-limited process pool for bcrypt.
+
+    Callers block their own thread on the result, but at most
+    workers + max_queue hashes are ever outstanding; anything beyond
+    that is rejected immediately with a 503 instead of piling up
+    request threads behind a CPU-bound queue.
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "max_outstanding": 0,
+            "total_seconds": 0.0,
+            "compute_seconds": 0.0,
+            "max_seconds": 0.0,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # gunicorn forks workers after import, so each process builds its own pool.
+        # Not with fork: by now this process runs other threads (AnyIO pool, log
+        # listeners, loop monitor), and a forked child can inherit one of their
+        # locks held forever. forkserver children fork from a clean single-threaded
+        # server; spawn where forkserver doesn't exist (Windows).
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_MP_CONTEXT)
+                    self._pid = pid
+        return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        # Outside the lock: cancelling runs the _release callbacks
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future, started: float):
+        """Done callback: the slot is only freed once the job has really left
+        the pool (finished, failed or cancelled while still queued). Only
+        results a caller actually got count as completed."""
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._outstanding -= 1
+            if future.cancelled() or getattr(future, "abandoned", False):
+                return
+            if future.exception() is not None:
+                self._stats["errors"] += 1
+                return
+            self._stats["completed"] += 1
+            self._stats["total_seconds"] += elapsed
+            self._stats["compute_seconds"] += future.result()[1]
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], elapsed)
+
+    def run(self, fn, *args):
+        with self._lock:
+            if self._outstanding >= self.workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy, please try again in a moment",
+                    headers={"Retry-After": "1"},
+                )
+            self._outstanding += 1
+            self._stats["submitted"] += 1
+            self._stats["max_outstanding"] = max(self._stats["max_outstanding"], self._outstanding)
+
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # Never queued, so no callback will free the slot
+            self._reset_executor()
+            with self._lock:
+                self._outstanding -= 1
+                self._stats["errors"] += 1
+            raise HTTPException(status_code=503, detail="Password service restarting, please retry",
+                                headers={"Retry-After": "1"})
+        future.add_done_callback(lambda done: self._release(done, started))
+
+        try:
+            result, _ = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Still queued: drop it. Already running: it keeps its slot until done.
+            with self._lock:
+                future.abandoned = True
+                self._stats["timeouts"] += 1
+            future.cancel()
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again in a moment",
+                headers={"Retry-After": "2"},
+            )
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise HTTPException(status_code=503, detail="Password service restarting, please retry",
+                                headers={"Retry-After": "1"})
+
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            outstanding = self._outstanding
+        completed = stats["completed"] or 1
+        stats.update({
+            "enabled": HASH_POOL_ENABLED,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "in_flight": min(outstanding, self.workers),
+            "queued": max(0, outstanding - self.workers),
+            "avg_ms": round(stats["total_seconds"] / completed * 1000, 1),
+            "avg_queue_wait_ms": round((stats["total_seconds"] - stats["compute_seconds"]) / completed * 1000, 1),
+            "max_ms": round(stats["max_seconds"] * 1000, 1),
+        })
+        return stats
+
+
+hashing_pool = HashingPool(HASH_POOL_WORKERS, HASH_POOL_MAX_QUEUE, HASH_POOL_TIMEOUT_SECONDS)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(_safe_bcrypt_password(plain_password), hashed_password)
+    plain_password = _safe_bcrypt_password(plain_password)
+    if not HASH_POOL_ENABLED:
+        return pwd_context.verify(plain_password, hashed_password)
+    return hashing_pool.run(_verify_in_worker, plain_password, hashed_password)
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(_safe_bcrypt_password(password))
\ No newline at end of file
+    password = _safe_bcrypt_password(password)
+    if not HASH_POOL_ENABLED:
+        return pwd_context.hash(password)
+    return hashing_pool.run(_hash_in_worker, password)
@@ -0,0 +1,229 @@
+# app/core/slow_queries.py - Slow-query log with background EXPLAIN capture
+#
+# Any statement slower than SLOW_QUERY_MS (from a request or a job) is handed
+# to a daemon thread. The caller pays only for a put_nowait(). That thread:
+#   - aggregates by statement text (count, total/max time, routes seen)
+#   - logs one JSON line with the statement, redacted parameters and route
+#   - for SELECTs, re-runs the statement under EXPLAIN (ANALYZE, BUFFERS) on its
+#     own connection, at most once per SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS per
+#     statement, and keeps the plan with the aggregate. Read-only WITH queries
+#     get a plain EXPLAIN (never executed); anything that writes is not explained.
+# GET /admin/slow-queries serves the aggregates (per worker process), worst first.
+#
+#   SLOW_QUERY_MS                      threshold; 0 disables (default 200)
+#   SLOW_QUERY_EXPLAIN                 capture plans (default true)
+#   SLOW_QUERY_EXPLAIN_TIMEOUT_MS      statement_timeout for the EXPLAIN run (default 5000)
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from . import request_context
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = int(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "600"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "5000"))
+SLOW_QUERY_MAX_STATEMENTS = 500  # distinct statements kept in the aggregate
+
+logger = logging.getLogger("campusstay.slow_query")
+logger.propagate = False
+logger.setLevel(logging.INFO)
+_handler = logging.StreamHandler(sys.stdout)
+_handler.setFormatter(logging.Formatter("%(message)s"))
+logger.addHandler(_handler)
+
+_queue = queue.Queue(maxsize=1000)
+_lock = threading.Lock()
+_aggregates = {}  # statement -> dict
+_engine = None
+_thread = None
+_dropped = 0
+_explaining = threading.local()  # set while this module runs its own EXPLAIN
+
+
+# ── Capture (runs on the query's thread) ─────
+def _on_slow(statement, parameters, seconds, executemany, stats):
+    global _dropped
+    if getattr(_explaining, "active", False):
+        return
+    try:
+        _queue.put_nowait((statement, parameters, seconds, executemany, stats.route if stats else None))
+    except queue.Full:
+        _dropped += 1
+
+
+# ── Background thread ─────
+def redact(parameters):
+    """Keep numbers, booleans and dates (useful for plans); hide every string"""
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    if parameters is None or isinstance(parameters, (bool, int, float, date, datetime)):
+        return parameters
+    if isinstance(parameters, (str, bytes)):
+        return f"<{type(parameters).__name__} len={len(parameters)}>"
+    return f"<{type(parameters).__name__}>"
+
+
+# A WITH can hide a data-modifying CTE (the archiver's DELETE ... RETURNING)
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b")
+
+
+def _explainable(statement: str, executemany: bool) -> bool:
+    head = statement.lstrip().upper()
+    return (
+        not executemany
+        and (head.startswith("SELECT") or (head.startswith("WITH") and not _WRITES.search(head)))
+        and "FOR UPDATE" not in head  # would take row locks again
+        and "FOR SHARE" not in head
+    )
+
+
+def explain(statement: str, parameters) -> list:
+    """EXPLAIN a read-only statement in a rolled-back transaction with a timeout.
+
+    Only a bare SELECT is executed (ANALYZE, BUFFERS); anything else just gets its plan."""
+    analyze = statement.lstrip().upper().startswith("SELECT")
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    _explaining.active = True
+    try:
+        with _engine.connect() as conn:
+            conn.execute(text(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}"))
+            plan = conn.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters).scalar()
+            conn.rollback()
+        return plan if isinstance(plan, list) else json.loads(plan)
+    finally:
+        _explaining.active = False
+
+
+def _plan_summary(plan: list) -> dict:
+    root = plan[0]
+    top = root["Plan"]
+    nodes, stack = [], [top]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get("Plans", ()))
+    return {
+        "execution_ms": root.get("Execution Time"),
+        "planning_ms": root.get("Planning Time"),
+        "top_node": top.get("Node Type"),
+        "rows": top.get("Actual Rows"),
+        "seq_scans": sorted({n["Relation Name"] for n in nodes if n.get("Node Type") == "Seq Scan"}),
+        "shared_hit_blocks": top.get("Shared Hit Blocks"),
+        "shared_read_blocks": top.get("Shared Read Blocks"),
+    }
+
+
+def _process(statement, parameters, seconds, executemany, route):
+    now = time.time()
+    with _lock:
+        agg = _aggregates.get(statement)
+        if agg is None:
+            if len(_aggregates) >= SLOW_QUERY_MAX_STATEMENTS:
+                return
+            agg = _aggregates[statement] = {
+                "statement": statement, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "routes": [], "first_seen": now, "last_seen": now,
+                "plan": None, "plan_summary": None, "explained_at": 0.0,
+            }
+        agg["count"] += 1
+        agg["total_ms"] += seconds * 1000
+        agg["max_ms"] = max(agg["max_ms"], seconds * 1000)
+        agg["last_seen"] = now
+        if route and route not in agg["routes"] and len(agg["routes"]) < 10:
+            agg["routes"].append(route)
+        want_plan = (
+            SLOW_QUERY_EXPLAIN
+            and _explainable(statement, executemany)
+            and now - agg["explained_at"] >= SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+        )
+        if want_plan:
+            agg["explained_at"] = now
+
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "event": "slow_query",
+        "duration_ms": round(seconds * 1000, 2),
+        "route": route,
+        "statement": statement,
+        "parameters": redact(parameters),
+        "count": agg["count"],
+    }
+    if want_plan:
+        try:
+            plan = explain(statement, parameters)
+            summary = _plan_summary(plan)
+            with _lock:
+                agg["plan"], agg["plan_summary"] = plan, summary
+            entry["plan"] = summary
+        except Exception as e:
+            entry["explain_error"] = f"{type(e).__name__}: {e}"
+    logger.info(json.dumps(entry, default=str))
+
+
+def _run():
+    while True:
+        item = _queue.get()
+        if item is None:
+            return
+        try:
+            _process(*item)
+        except Exception as e:
+            print(f"❌ Slow query log error: {e}")
+
+
+# ── Lifecycle & reporting ─────
+def start(engine):
+    """Install the slow-statement hook for `engine` (after request_context.instrument)"""
+    global _engine, _thread
+    if SLOW_QUERY_MS <= 0 or _thread is not None:
+        return
+    _engine = engine
+    _thread = threading.Thread(target=_run, name="slow-query-log", daemon=True)
+    _thread.start()
+    request_context.on_slow_statement(SLOW_QUERY_MS / 1000, _on_slow)
+
+
+def stop():
+    global _thread
+    if _thread is not None:
+        request_context.on_slow_statement(None, None)
+        _queue.put(None)
+        _thread.join(timeout=5)
+        _thread = None
+
+
+def report(limit: int = 50, include_plans: bool = False) -> dict:
+    with _lock:
+        rows = sorted(_aggregates.values(), key=lambda a: a["total_ms"], reverse=True)[:limit]
+        statements = []
+        for agg in rows:
+            item = {k: v for k, v in agg.items() if k not in ("plan", "explained_at")}
+            item["avg_ms"] = round(agg["total_ms"] / agg["count"], 2)
+            item["total_ms"] = round(agg["total_ms"], 2)
+            item["max_ms"] = round(agg["max_ms"], 2)
+            if include_plans:
+                item["plan"] = agg["plan"]
+            statements.append(item)
+    return {
+        "threshold_ms": SLOW_QUERY_MS,
+        "pid": os.getpid(),
+        "distinct_statements": len(_aggregates),
+        "dropped": _dropped,
+        "statements": statements,
+    }
+
+
+def reset():
+    with _lock:
+        _aggregates.clear()
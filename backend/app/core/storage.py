@@ -0,0 +1,64 @@
+# app/core/storage.py - Cloudflare R2 client shared by routers and jobs
+import os
+import boto3
+from botocore.client import Config
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+
+# ── Cloudflare R2 Configuration ─────
+R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
+R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
+R2_ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
+R2_BUCKET = os.getenv("R2_BUCKET")
+R2_PUBLIC_URL = os.getenv("R2_PUBLIC_URL")
+
+if not all([R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_ACCOUNT_ID, R2_BUCKET, R2_PUBLIC_URL]):
+    raise RuntimeError("Missing R2 configuration. Please check environment variables.")
+
+# Override to point at a local S3-compatible server in development
+R2_ENDPOINT = os.getenv("R2_ENDPOINT") or f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
+
+s3_client = boto3.client(
+    "s3",
+    endpoint_url=R2_ENDPOINT,
+    aws_access_key_id=R2_ACCESS_KEY_ID,
+    aws_secret_access_key=R2_SECRET_ACCESS_KEY,
+    region_name="auto",
+    config=Config(signature_version='s3v4')
+)
+metrics.instrument_boto3(s3_client, "r2")
+
+# Every object we upload lives under one of these prefixes
+PROPERTY_PREFIX = "properties/"
+DOCUMENT_PREFIX = "documents/"
+
+
+def get_public_url(key: str) -> str:
+    """Generate public URL for R2 object"""
+    return f"{R2_PUBLIC_URL}/{key}"
+
+
+def key_from_url(url: str) -> str:
+    """Inverse of get_public_url - strip the public URL prefix to get the object key"""
+    return url.replace(f"{R2_PUBLIC_URL}/", "")
+
+
+# ── Non-blocking calls for async routes ─────
+# boto3 blocks, so async handlers hand each call to the threadpool
+async def upload(key: str, fileobj, content_type: str) -> str:
+    """Stream a file object (e.g. UploadFile.file) to R2 -> public URL"""
+    fileobj.seek(0)
+    await run_in_threadpool(
+        s3_client.put_object,
+        Bucket=R2_BUCKET, Key=key, Body=fileobj, ContentType=content_type, ACL="public-read",
+    )
+    return get_public_url(key)
+
+
+async def delete_url(url: str):
+    """Delete the object behind a public URL; failures are logged, not raised"""
+    try:
+        await run_in_threadpool(s3_client.delete_object, Bucket=R2_BUCKET, Key=key_from_url(url))
+    except Exception as e:
+        print(f"Failed to delete {url}: {e}")
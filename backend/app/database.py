@@ -1,19 +1,31 @@
 # app/database.py
+import itertools
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import threading
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
+from .core import db_pool, request_context
+from .core.identity_cache import TTLCache
+
 Base = declarative_base()
 
 # === Get DATABASE_URL from cloud (Render/Railway/Fly.io) ===
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-if DATABASE_URL:
+def _psycopg_url(url: str) -> str:
     # Cloud: Render/Railway gives "postgresql://"
     # Convert to psycopg driver + handle SSL correctly
-    if DATABASE_URL.startswith("postgresql://"):
-        DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return url
+
+if DATABASE_URL:
+    DATABASE_URL = _psycopg_url(DATABASE_URL)
     print("Connected to cloud PostgreSQL")
 else:
     # Local development fallback
@@ -26,22 +38,189 @@ else:
     DATABASE_URL = f"postgresql+psycopg://{user}:{password}@{host}:{port}/{db}?sslmode=disable"
     print(f"Local DB: postgresql+psycopg://{user}:***@{host}:{port}/{db}")
 
-# === Create engine with safe settings ===
+# These options make SSL work everywhere without errors
+CONNECT_ARGS = {"sslmode": "prefer"} if "render.com" in DATABASE_URL or "railway.app" in DATABASE_URL else {}
+
+# === Async engine pool: its share of this worker's connection budget ===
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "3"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "5"))
+
+# === Create engine: sized from the threadpool and DB_MAX_CONNECTIONS (see app/core/db_pool.py) ===
+DB_POOL_SIZE, DB_MAX_OVERFLOW = db_pool.pool_sizes(reserved=ASYNC_DB_POOL_SIZE + ASYNC_DB_MAX_OVERFLOW)
+
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
     future=True,
-    # These options make SSL work everywhere without errors
-    connect_args={"sslmode": "prefer"} if "render.com" in DATABASE_URL or "railway.app" in DATABASE_URL else {}
+    **db_pool.engine_options("primary", DB_POOL_SIZE, DB_MAX_OVERFLOW, CONNECT_ARGS),
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# === Async engine for `async def` routes ===
+# Same URL: the psycopg dialect runs on psycopg's AsyncConnection under create_async_engine.
+# Used by the upload handlers, which await R2 and file reads, so a sync Session there
+# would block the event loop on every query. Everything else stays on the sync engine.
+async_engine = create_async_engine(
+    DATABASE_URL,
+    **db_pool.engine_options("async", ASYNC_DB_POOL_SIZE, ASYNC_DB_MAX_OVERFLOW, CONNECT_ARGS, asynchronous=True),
+)
+
+# expire_on_commit=False: attributes stay readable after commit without an implicit (await-less) refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# === Read replicas ===
+# GET routes that only read take get_read_db instead of get_db. Their sessions go
+# to the replicas in DATABASE_REPLICA_URLS (comma-separated, round robin), except:
+#   * for REPLICA_STICKY_SECONDS after a request commits a write, the same bearer
+#     token reads from the primary, so users see their own changes
+#   * a replica lagging more than REPLICA_MAX_LAG_SECONDS (checked at most every
+#     REPLICA_CHECK_SECONDS per process), or not answering, is skipped
+# Stickiness is per worker process, like the identity cache. A write on one worker
+# followed by a read on another sees data at most REPLICA_MAX_LAG_SECONDS old.
+# With no replicas configured, get_read_db is a read-only session on the primary.
+# Replica pools are sized like the primary's unless REPLICA_POOL_SIZE /
+# REPLICA_MAX_OVERFLOW are set; DB_MAX_CONNECTIONS applies to each replica.
+REPLICA_URLS = [_psycopg_url(url.strip()) for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+_replica_pool_size, _replica_max_overflow = db_pool.pool_sizes()
+REPLICA_POOL_SIZE = int(os.getenv("REPLICA_POOL_SIZE", str(_replica_pool_size)))
+REPLICA_MAX_OVERFLOW = int(os.getenv("REPLICA_MAX_OVERFLOW", str(_replica_max_overflow)))
+
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+replica_engines = [
+    create_engine(url, **db_pool.engine_options("replica", REPLICA_POOL_SIZE, REPLICA_MAX_OVERFLOW, CONNECT_ARGS))
+    for url in REPLICA_URLS
+]
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, info={"read_only": True})
+
+
+class ReplicaHealth:
+    """Replication lag of one replica, re-measured at most every REPLICA_CHECK_SECONDS"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.lag = None  # seconds; None = unreachable or never checked
+        self.checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def usable(self) -> bool:
+        if time.monotonic() - self.checked_at >= REPLICA_CHECK_SECONDS and self._lock.acquire(blocking=False):
+            try:
+                self.check()
+            finally:
+                self._lock.release()
+        return self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    def check(self):
+        was_usable = self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+        try:
+            with self.engine.connect() as conn:
+                self.lag = float(conn.execute(REPLICA_LAG_SQL).scalar())
+        except Exception as e:
+            self.lag = None
+            print(f"❌ Replica {self.engine.url.host}:{self.engine.url.port} unreachable: {e}")
+        self.checked_at = time.monotonic()
+        usable = self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+        if usable != was_usable:
+            state = "in rotation" if usable else f"out of rotation (lag {self.lag}s)"
+            print(f"🔀 Replica {self.engine.url.host}:{self.engine.url.port} {state}")
+
+
+_replica_health = [ReplicaHealth(replica) for replica in replica_engines]
+_next_replica = itertools.count()
+_sticky = TTLCache(maxsize=10000)  # bearer token -> True while reads must see the primary
+
+
+def _bearer_token(authorization: str) -> str:
+    scheme, _, token = (authorization or "").partition(" ")
+    return token if scheme.lower() == "bearer" and token else None
+
+
+def _scope_bearer_token(scope: dict) -> str:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            return _bearer_token(value.decode("latin-1"))
+    return None
+
+
+def mark_wrote(token: str):
+    """Send this token's reads to the primary for the next REPLICA_STICKY_SECONDS"""
+    if token and replica_engines:
+        _sticky.set(token, True, REPLICA_STICKY_SECONDS)
+
+
+def read_engine(token: str = None):
+    """Engine for a read-only session: a fresh replica, or the primary"""
+    if not replica_engines or (token and _sticky.get(token)):
+        return engine
+    start = next(_next_replica)
+    for offset in range(len(_replica_health)):
+        health = _replica_health[(start + offset) % len(_replica_health)]
+        if health.usable():
+            return health.engine
+    return engine
+
+
+def replica_status() -> list:
+    return [
+        {"replica": f"{h.engine.url.host}:{h.engine.url.port}", "lag_seconds": h.lag,
+         "usable": h.lag is not None and h.lag <= REPLICA_MAX_LAG_SECONDS}
+        for h in _replica_health
+    ]
+
+
+def get_read_db(request: Request):
+    db = ReadSessionLocal(bind=read_engine(_bearer_token(request.headers.get("authorization"))))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Any session that commits a write inside a request makes that requester sticky
+def _flag_flush(session, flush_context):
+    session.info["wrote"] = True
+
+def _flag_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+def _after_commit(session):
+    if session.info.pop("wrote", False) and replica_engines:
+        stats = request_context.current()
+        if stats is not None and stats.scope is not None:
+            mark_wrote(_scope_bearer_token(stats.scope))
+
+def _after_rollback(session):
+    session.info.pop("wrote", None)
+
+def _refuse_writes(session, flush_context, instances):
+    if session.info.get("read_only") and (session.new or session.dirty or session.deleted):
+        raise RuntimeError("Write attempted on a get_read_db session; use get_db for routes that write")
+
+event.listen(Session, "after_flush", _flag_flush)
+event.listen(Session, "do_orm_execute", _flag_orm_execute)
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_rollback", _after_rollback)
+event.listen(Session, "before_flush", _refuse_writes)
\ No newline at end of file
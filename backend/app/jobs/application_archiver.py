@@ -0,0 +1,80 @@
+# app/jobs/application_archiver.py - Move applications from old intakes to applications_archive
+#
+# Runs daily via the in-process scheduler, or by hand (from backend/):
+#   python -m app.jobs.application_archiver
+#   python -m app.jobs.application_archiver --dry-run
+#
+# Keeps the last APPLICATION_KEEP_INTAKES intakes (app.core.intake) in
+# applications, so the table the routes and their indexes work on only holds
+# one or two years of rows. Each batch is one statement, DELETE ... RETURNING
+# feeding an INSERT into the archive, committed on its own: a row is always in
+# exactly one of the two tables, and no batch holds locks for long. Rows another
+# transaction has locked are skipped and picked up next run. Old intakes aren't
+# in the demand counters, so nothing else needs adjusting.
+import argparse
+
+from sqlalchemy import func, select, text
+
+from .. import models
+from ..database import SessionLocal
+from ..core import scheduler
+from ..core.intake import oldest_kept_intake
+
+BATCH_SIZE = 1000
+
+COLUMNS = "id, student_id, property_id, intake_year, status, applied_at, notes, funding_approved"
+
+MOVE_BATCH_SQL = text(f"""
+    WITH moved AS (
+        DELETE FROM applications
+        WHERE id IN (
+            SELECT id FROM applications
+            WHERE intake_year < :before
+            ORDER BY id
+            LIMIT :limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {COLUMNS}
+    )
+    INSERT INTO applications_archive ({COLUMNS})
+    SELECT {COLUMNS} FROM moved
+""")
+
+
+@scheduler.every(24 * 3600, "application-archiver")
+def archive_old_intakes(dry_run: bool = False) -> dict:
+    before = oldest_kept_intake()
+    db = SessionLocal()
+    try:
+        if dry_run:
+            due = db.execute(
+                select(models.Application.intake_year, func.count())
+                .where(models.Application.intake_year < before)
+                .group_by(models.Application.intake_year)
+            ).all()
+            return {"before": before, "due": dict(due)}
+
+        archived = 0
+        while True:
+            moved = db.execute(MOVE_BATCH_SQL, {"before": before, "limit": BATCH_SIZE}).rowcount
+            db.commit()
+            archived += moved
+            if moved < BATCH_SIZE:
+                break
+    finally:
+        db.close()
+
+    if archived:
+        print(f"🗄️ Archived {archived} applications from intakes before {before}")
+    return {"before": before, "archived": archived}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move applications from old intakes to applications_archive")
+    parser.add_argument("--dry-run", action="store_true", help="count what would be moved")
+    args = parser.parse_args()
+    print(archive_old_intakes(dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# app/jobs/demand_counters.py - Recompute the per-property application counters
+#
+# Runs every DEMAND_RECONCILE_INTERVAL_SECONDS via the in-process scheduler, or
+# by hand (from backend/):
+#   python -m app.jobs.demand_counters
+#
+# Property.application_count / approved_count count the current intake and
+# pending_count every kept intake (app.models); they are maintained
+# incrementally by the Application events there. This catches whatever
+# bypassed them, and resets them when a new intake starts. One GROUP BY over
+# the kept intakes' applications, and only properties whose counters differ
+# are written.
+#
+# Runs at REPEATABLE READ: every application change also updates its property's
+# row, so if one commits after our snapshot, writing that property fails with a
+# serialization error instead of overwriting the newer count with an older
+# total. That run is abandoned; the next one picks it up.
+import os
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from ..database import SessionLocal
+from ..core import scheduler
+from ..core.intake import current_intake_year, oldest_kept_intake
+
+DEMAND_RECONCILE_INTERVAL_SECONDS = int(os.getenv("DEMAND_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+RECONCILE_SQL = text("""
+    UPDATE properties AS p
+    SET application_count = c.applications, pending_count = c.pending, approved_count = c.approved
+    FROM (
+        SELECT properties.id,
+               count(a.id) FILTER (WHERE a.intake_year = :intake_year) AS applications,
+               count(a.id) FILTER (WHERE a.status = 0) AS pending,
+               count(a.id) FILTER (WHERE a.status = 1 AND a.intake_year = :intake_year) AS approved
+        FROM properties
+        LEFT JOIN applications a ON a.property_id = properties.id AND a.intake_year >= :oldest_kept
+        GROUP BY properties.id
+    ) AS c
+    WHERE p.id = c.id
+      AND (p.application_count, p.pending_count, p.approved_count)
+          IS DISTINCT FROM (c.applications, c.pending, c.approved)
+    RETURNING p.id
+""")
+
+
+@scheduler.every(DEMAND_RECONCILE_INTERVAL_SECONDS, "demand-counters")
+def reconcile_demand_counters() -> dict:
+    db = SessionLocal()
+    try:
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        corrected = db.execute(
+            RECONCILE_SQL, {"intake_year": current_intake_year(), "oldest_kept": oldest_kept_intake()}
+        ).scalars().all()
+        db.commit()
+    except OperationalError as e:
+        db.rollback()
+        if getattr(e.orig, "sqlstate", None) != "40001":  # serialization_failure
+            raise
+        print(f"⚠️ Demand counters changed during reconcile, retrying next run: {e.orig}")
+        return {"corrected": None}
+    finally:
+        db.close()
+
+    if corrected:
+        print(f"🔢 Demand counters corrected for {len(corrected)} properties: {corrected[:20]}")
+    return {"corrected": len(corrected)}
+
+
+if __name__ == "__main__":
+    print(reconcile_demand_counters())
@@ -0,0 +1,106 @@
+# app/jobs/document_reminders.py - Remind students with pending applications to upload documents
+#
+# Runs every DOCUMENT_REMINDER_INTERVAL_SECONDS via the in-process scheduler, or
+# by hand (from backend/):
+#   python -m app.jobs.document_reminders
+#   python -m app.jobs.document_reminders --dry-run
+#
+# One keyset-paginated query per batch finds students who have a pending
+# application for the current intake (ix_applications_pending_student), are
+# missing either document, and are outside their cooldown. It is grouped by
+# student, so someone with three pending applications gets one email listing
+# all three. Each batch queues its emails as one bulk send and stamps
+# document_reminder_sent_at in the same transaction.
+import argparse
+import os
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import func, or_, select, update
+
+from .. import models
+from ..database import SessionLocal
+from ..core import outbox, scheduler
+from ..core.intake import current_intake_year
+
+DOCUMENT_REMINDER_INTERVAL_SECONDS = int(os.getenv("DOCUMENT_REMINDER_INTERVAL_SECONDS", str(6 * 3600)))
+DOCUMENT_REMINDER_COOLDOWN_HOURS = int(os.getenv("DOCUMENT_REMINDER_COOLDOWN_HOURS", "72"))
+BATCH_SIZE = 500
+
+
+def _missing(column):
+    return or_(column.is_(None), column == "")
+
+
+def _due_students(db, cutoff, after_id: int, limit: int) -> list:
+    """(id, email, full_name, property titles) for the next batch of students to remind"""
+    Student, Application, Property = models.Student, models.Application, models.Property
+    return db.execute(
+        select(
+            Student.id,
+            Student.email,
+            Student.full_name,
+            func.string_agg(Property.title.distinct(), ", "),
+        )
+        .join(Application, Application.student_id == Student.id)
+        .join(Property, Property.id == Application.property_id)
+        .where(
+            models.application_status_is("pending"),  # ix_applications_pending_student
+            Application.intake_year == current_intake_year(),
+            or_(_missing(Student.id_document_url), _missing(Student.proof_of_registration_url)),
+            or_(Student.document_reminder_sent_at.is_(None), Student.document_reminder_sent_at < cutoff),
+            Student.id > after_id,
+        )
+        .group_by(Student.id)
+        .order_by(Student.id)
+        .limit(limit)
+    ).all()
+
+
+@scheduler.every(DOCUMENT_REMINDER_INTERVAL_SECONDS, "document-reminders")
+def send_document_reminders(dry_run: bool = False) -> dict:
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(hours=DOCUMENT_REMINDER_COOLDOWN_HOURS)
+    bulk_id = uuid4().hex
+    queued, last_id = 0, 0
+
+    db = SessionLocal()
+    try:
+        while True:
+            rows = _due_students(db, cutoff, last_id, BATCH_SIZE)
+            if not rows:
+                break
+            last_id = rows[-1].id
+            if dry_run:
+                queued += len(rows)
+                continue
+
+            outbox.enqueue_bulk(
+                db, "document_reminder",
+                ((email, {"student_name": name, "property_title": titles}) for _, email, name, titles in rows),
+                bulk_id=bulk_id,
+            )
+            db.execute(
+                update(models.Student)
+                .where(models.Student.id.in_([row.id for row in rows]))
+                .values(document_reminder_sent_at=now)
+            )
+            db.commit()
+            queued += len(rows)
+    finally:
+        db.close()
+
+    if queued and not dry_run:
+        print(f"⏰ Queued {queued} document reminders (bulk {bulk_id})")
+    return {"queued": queued, "bulk_id": bulk_id if queued and not dry_run else None, "dry_run": dry_run}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue document upload reminders")
+    parser.add_argument("--dry-run", action="store_true", help="Count students who would be reminded")
+    args = parser.parse_args()
+    print(send_document_reminders(dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
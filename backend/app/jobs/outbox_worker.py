@@ -0,0 +1,61 @@
+# app/jobs/outbox_worker.py - Standalone email outbox worker and outbox housekeeping
+#
+# The web app runs a worker in every process by default. To move delivery to a
+# dedicated Render background worker instead, set OUTBOX_WORKERS_IN_APP=false on
+# the web service, set EMAIL_SENDER_PROCESSES on the worker to its instance
+# count (the Resend rate limit is shared between them), and run (from backend/):
+#   python -m app.jobs.outbox_worker
+#   python -m app.jobs.outbox_worker --requeue-dead   # retry dead-lettered emails
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from .. import models
+from ..database import SessionLocal
+from ..core import outbox, scheduler
+
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "14"))
+PURGE_BATCH_SIZE = 5000
+
+
+@scheduler.every(6 * 3600, "outbox-purge")
+def purge_sent() -> int:
+    """Delete delivered rows older than OUTBOX_RETENTION_DAYS in batches"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=OUTBOX_RETENTION_DAYS)
+    deleted = 0
+    db = SessionLocal()
+    try:
+        while True:
+            ids = db.execute(
+                select(models.EmailOutbox.id)
+                .where(models.EmailOutbox.status == "sent", models.EmailOutbox.sent_at < cutoff)
+                .limit(PURGE_BATCH_SIZE)
+            ).scalars().all()
+            if not ids:
+                break
+            db.execute(delete(models.EmailOutbox).where(models.EmailOutbox.id.in_(ids)))
+            db.commit()
+            deleted += len(ids)
+    finally:
+        db.close()
+    if deleted:
+        print(f"🧹 Purged {deleted} delivered outbox rows")
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued emails from the outbox")
+    parser.add_argument("--requeue-dead", action="store_true", help="Reset dead-lettered emails and exit")
+    args = parser.parse_args()
+
+    if args.requeue_dead:
+        print(f"♻️ Requeued {outbox.requeue_dead()} dead-lettered emails")
+        return
+    asyncio.run(outbox.run_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# app/jobs/r2_gc.py - Garbage-collect R2 objects that no database row references
+#
+# Usage (from backend/):
+#   python -m app.jobs.r2_gc                 # dry run - report only
+#   python -m app.jobs.r2_gc --delete        # delete orphans
+#
+# Both sides are streamed in byte order and merge-joined, so memory stays bounded
+# by one listing page, one DB fetch batch and one delete batch regardless of how
+# many millions of keys the bucket holds.
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from ..database import engine
+from ..core.storage import s3_client, R2_BUCKET, R2_PUBLIC_URL, PROPERTY_PREFIX, DOCUMENT_PREFIX
+
+LIST_PAGE_SIZE = 1000
+DB_FETCH_SIZE = 5000
+DELETE_BATCH_SIZE = 1000  # S3 DeleteObjects limit
+DEFAULT_GRACE_HOURS = 24  # never touch objects younger than this (upload may not be committed yet)
+SAMPLE_SIZE = 20
+
+# Every URL column that points into the bucket. COLLATE "C" gives byte order,
+# which is the order list_objects_v2 returns keys in.
+REFERENCED_KEYS_SQL = text("""
+    SELECT substr(url, :strip) AS key FROM (
+        SELECT image_url AS url FROM property_images
+        UNION ALL
+        SELECT id_document_url FROM students WHERE id_document_url IS NOT NULL
+        UNION ALL
+        SELECT proof_of_registration_url FROM students WHERE proof_of_registration_url IS NOT NULL
+    ) refs
+    WHERE left(url, :prefix_len) = :url_prefix
+    ORDER BY key COLLATE "C"
+""")
+
+
+def iter_bucket_objects(prefix: str):
+    """Yield (key, size, last_modified) for every object under prefix, in key order"""
+    paginator = s3_client.get_paginator("list_objects_v2")
+    pages = paginator.paginate(
+        Bucket=R2_BUCKET,
+        Prefix=prefix,
+        PaginationConfig={"PageSize": LIST_PAGE_SIZE},
+    )
+    for page in pages:
+        for obj in page.get("Contents", []):
+            yield obj["Key"], obj["Size"], obj["LastModified"]
+
+
+def iter_referenced_keys(conn, prefix: str):
+    """Yield every object key referenced by a DB row under prefix, in key order"""
+    url_prefix = f"{R2_PUBLIC_URL}/{prefix}"
+    result = conn.execution_options(stream_results=True, max_row_buffer=DB_FETCH_SIZE).execute(
+        REFERENCED_KEYS_SQL,
+        {
+            "strip": len(R2_PUBLIC_URL) + 2,  # substr is 1-based, skip the "/" too
+            "prefix_len": len(url_prefix),
+            "url_prefix": url_prefix,
+        },
+    )
+    for (key,) in result:
+        yield key
+
+
+def find_orphans(bucket_objects, referenced_keys):
+    """Sorted merge: yield bucket objects whose key is not in referenced_keys"""
+    ref = next(referenced_keys, None)
+    for key, size, modified in bucket_objects:
+        while ref is not None and ref < key:
+            ref = next(referenced_keys, None)
+        if ref != key:
+            yield key, size, modified
+
+
+def delete_batch(keys: list) -> int:
+    """Delete up to DELETE_BATCH_SIZE keys, returning how many failed"""
+    response = s3_client.delete_objects(
+        Bucket=R2_BUCKET,
+        Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+    )
+    errors = response.get("Errors", [])
+    for err in errors[:SAMPLE_SIZE]:
+        print(f"   ❌ {err.get('Key')}: {err.get('Code')} {err.get('Message')}")
+    return len(errors)
+
+
+def collect_prefix(conn, prefix: str, delete: bool, cutoff: datetime) -> dict:
+    report = {
+        "prefix": prefix,
+        "orphans": 0,
+        "orphan_bytes": 0,
+        "skipped_recent": 0,
+        "deleted": 0,
+        "failed": 0,
+        "sample": [],
+    }
+    batch = []
+
+    for key, size, modified in find_orphans(iter_bucket_objects(prefix), iter_referenced_keys(conn, prefix)):
+        if modified > cutoff:
+            report["skipped_recent"] += 1
+            continue
+
+        report["orphans"] += 1
+        report["orphan_bytes"] += size
+        if len(report["sample"]) < SAMPLE_SIZE:
+            report["sample"].append(key)
+
+        if delete:
+            batch.append(key)
+            if len(batch) >= DELETE_BATCH_SIZE:
+                report["failed"] += delete_batch(batch)
+                report["deleted"] += len(batch)
+                batch = []
+
+    if batch:
+        report["failed"] += delete_batch(batch)
+        report["deleted"] += len(batch)
+    report["deleted"] -= report["failed"]
+    return report
+
+
+def run(delete: bool = False, grace_hours: int = DEFAULT_GRACE_HOURS, prefixes=None) -> list:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    reports = []
+    with engine.connect() as conn:
+        for prefix in prefixes or [PROPERTY_PREFIX, DOCUMENT_PREFIX]:
+            reports.append(collect_prefix(conn, prefix, delete, cutoff))
+    return reports
+
+
+def print_report(reports: list, delete: bool):
+    print("\n" + "=" * 60)
+    print(f"🧹 R2 ORPHAN GC ({'DELETE' if delete else 'DRY RUN'}) - bucket {R2_BUCKET}")
+    print("=" * 60)
+    for r in reports:
+        print(f"{r['prefix']}")
+        print(f"   Orphans:        {r['orphans']} ({r['orphan_bytes'] / 1024 / 1024:.1f} MB)")
+        print(f"   Too recent:     {r['skipped_recent']}")
+        if delete:
+            print(f"   Deleted:        {r['deleted']}")
+            print(f"   Failed:         {r['failed']}")
+        for key in r["sample"]:
+            print(f"     - {key}")
+    print("=" * 60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete R2 objects that no database row references")
+    parser.add_argument("--delete", action="store_true", help="Actually delete orphans (default is a dry run)")
+    parser.add_argument("--grace-hours", type=int, default=DEFAULT_GRACE_HOURS,
+                        help="Ignore objects modified more recently than this")
+    parser.add_argument("--prefix", action="append", choices=[PROPERTY_PREFIX, DOCUMENT_PREFIX],
+                        help="Limit to one prefix (repeatable)")
+    args = parser.parse_args()
+
+    reports = run(delete=args.delete, grace_hours=args.grace_hours, prefixes=args.prefix)
+    print_report(reports, args.delete)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# app/jobs/token_sweeper.py - Clear expired verification/reset tokens, refresh tokens and
+# the link tokens still held in email_outbox
+#
+# Runs hourly via the in-process scheduler, or by hand (from backend/):
+#   python -m app.jobs.token_sweeper
+#
+# Works in small committed batches so it never holds long row locks on students.
+from datetime import datetime, timezone
+
+from sqlalchemy import case, delete, null, select, update
+
+from .. import models
+from ..database import SessionLocal
+from ..core import scheduler
+
+BATCH_SIZE = 1000
+
+# (token column, expiry column) pairs on Student
+STUDENT_TOKENS = [
+    (models.Student.verification_token, models.Student.verification_token_expires),
+    (models.Student.password_reset_token, models.Student.password_reset_token_expires),
+]
+
+
+def _clear_student_tokens(db, token_col, expires_col, now) -> int:
+    cleared = 0
+    while True:
+        ids = db.execute(
+            select(models.Student.id)
+            .where(token_col.is_not(None), expires_col < now)
+            .limit(BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            return cleared
+        db.execute(
+            update(models.Student)
+            .where(models.Student.id.in_(ids))
+            .values({token_col.key: None, expires_col.key: None})
+        )
+        db.commit()
+        cleared += len(ids)
+
+
+def _delete_expired_refresh_tokens(db, now) -> int:
+    deleted = 0
+    while True:
+        ids = db.execute(
+            select(models.RefreshToken.id)
+            .where(models.RefreshToken.expires_at < now)
+            .limit(BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.execute(delete(models.RefreshToken).where(models.RefreshToken.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+
+
+def _purge_expired_outbox_links(db, now) -> int:
+    """Clear the payload of outbox rows whose link has expired, whatever their status;
+    ones not sent yet are dead-lettered, there is no point sending a dead link"""
+    Outbox = models.EmailOutbox
+    purged = 0
+    while True:
+        ids = db.execute(
+            select(Outbox.id)
+            .where(Outbox.expires_at < now, Outbox.payload.is_not(None))
+            .limit(BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            return purged
+        db.execute(
+            update(Outbox)
+            .where(Outbox.id.in_(ids))
+            .values(
+                payload=null(),
+                status=case((Outbox.status.in_(["pending", "sending"]), "dead"), else_=Outbox.status),
+                last_error=case(
+                    (Outbox.status.in_(["pending", "sending"]), "Link expired before it could be sent"),
+                    else_=Outbox.last_error,
+                ),
+                locked_until=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        purged += len(ids)
+
+
+@scheduler.every(3600, "token-sweeper")
+def sweep_expired_tokens() -> dict:
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        result = {
+            token_col.key: _clear_student_tokens(db, token_col, expires_col, now)
+            for token_col, expires_col in STUDENT_TOKENS
+        }
+        result["refresh_tokens"] = _delete_expired_refresh_tokens(db, now)
+        result["outbox_links"] = _purge_expired_outbox_links(db, now)
+    finally:
+        db.close()
+
+    if any(result.values()):
+        print(f"🧹 Token sweeper cleared: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    print(sweep_expired_tokens())
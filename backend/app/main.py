@@ -1,10 +1,8 @@
 # backend/app/main.py - FIXED VERSION
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
 from starlette.responses import Response
 
 # ── 1. FastAPI app ─────────────────────────────────────────────
@@ -29,54 +27,66 @@ app.add_middleware(
     expose_headers=["*"],  # Important for file downloads
 )
 
-# ── 3. Debug Logging Middleware ─────────────
-class DebugLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Log every request
-        print(f"\n{'='*60}")
-        print(f"📨 INCOMING REQUEST")
-        print(f"{'='*60}")
-        print(f"Method: {request.method}")
-        print(f"URL: {request.url}")
-        print(f"Path: {request.url.path}")
-        print(f"Query Params: {dict(request.query_params)}")
-        print(f"Headers:")
-        for key, value in request.headers.items():
-            if key.lower() in ['authorization', 'origin', 'referer', 'x-forwarded-proto']:
-                print(f"  {key}: {value}")
-        print(f"{'='*60}\n")
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Log response
-        print(f"\n{'='*60}")
-        print(f"📤 OUTGOING RESPONSE")
-        print(f"{'='*60}")
-        print(f"Status: {response.status_code}")
-        print(f"{'='*60}\n")
-        
-        # Add security headers
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        
-        return response
-
-app.add_middleware(DebugLoggingMiddleware)
-
-# ── 4. Startup – create tables ───────────────────────────────
+# ── 3. Access log (structured JSON, pure ASGI; also sets HSTS) ─────────────
+from .core.access_log import AccessLogMiddleware
+from .core import profiler
+
+# Admin-only "X-Profile: 1" sampling; not installed at all unless PROFILING_ENABLED
+if profiler.PROFILING_ENABLED:
+    app.add_middleware(profiler.ProfilerMiddleware)
+app.add_middleware(AccessLogMiddleware)
+
+# ── 4. Startup (schema changes are migrations: `alembic upgrade head`) ─────
 @app.on_event("startup")
 async def startup_event():
-    from . import models
-    from .database import engine
-    models.Base.metadata.create_all(bind=engine)
+    from .database import engine, async_engine, replica_engines
+
+    from .core import access_log, db_pool, loop_monitor, metrics, request_context, slow_queries
+    db_pool.configure_threadpool()
+    request_context.instrument(engine)
+    request_context.instrument(async_engine.sync_engine)  # async routes count towards the request too
+    for replica in replica_engines:
+        request_context.instrument(replica)
+    metrics.instrument_pool(engine)
+    access_log.start()
+    slow_queries.start(engine)
+    loop_monitor.start()
+    db_pool.start([engine, *replica_engines], [async_engine])
+
+    # Periodic jobs register themselves on import
+    from .core import scheduler, outbox
+    from .jobs import token_sweeper, outbox_worker, document_reminders, demand_counters, application_archiver  # noqa: F401
+    scheduler.start()
+    outbox.start()
+
     print("\n" + "="*60)
-    print("✅ DATABASE TABLES CREATED/VERIFIED")
+    print("✅ CAMPUSSTAY API STARTED")
     print("="*60)
     print(f"Backend URL: {os.getenv('BACKEND_URL', 'Not set')}")
     print(f"Frontend URL: {os.getenv('FRONTEND_URL', 'Not set')}")
+    print(f"DB pools per worker: primary {db_pool.describe(engine)}, async {db_pool.describe(async_engine.sync_engine)}"
+          f"{', replicas ' + db_pool.describe(replica_engines[0]) if replica_engines else ''} "
+          f"({db_pool.THREADPOOL_SIZE} threads, {db_pool.WEB_CONCURRENCY} workers"
+          f"{', PgBouncer' if db_pool.DB_PGBOUNCER else ''})")
     print("="*60 + "\n")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    from .core import scheduler, outbox
+    await scheduler.stop()
+    await outbox.stop()
+
+    from .core import access_log, db_pool, loop_monitor, slow_queries
+    await db_pool.stop()
+    await loop_monitor.stop()
+    access_log.stop()
+    slow_queries.stop()
+
+    from .database import async_engine
+    await async_engine.dispose()
+
+
 # ── 5. Include Routers ───────────────────────────────
 from .routers import auth, admin, students, property, applications
 
@@ -119,6 +129,15 @@ def health():
 def health_head():
     return Response(status_code=200)
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(authorization: str = Header(None)):
+    """Prometheus scrape endpoint (all gunicorn workers combined)"""
+    from .core import metrics
+    if metrics.METRICS_TOKEN and authorization != f"Bearer {metrics.METRICS_TOKEN}":
+        raise HTTPException(401, "Invalid metrics token")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/debug/cors")
 def debug_cors():
     """Debug endpoint to check CORS configuration"""
@@ -1,8 +1,14 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Text
+from sqlalchemy import (
+    Column, Integer, SmallInteger, String, Boolean, Float, DateTime, ForeignKey, Text,
+    CheckConstraint, Index, UniqueConstraint, event, inspect, literal, text, update,
+)
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
+from .core.intake import current_intake_year, oldest_kept_intake
 from datetime import datetime
 
 
@@ -30,18 +36,19 @@ class Student(Base):
     campus = Column(String(50), nullable=False)
     hashed_password = Column(Text, nullable=False)
     
-    # Email verification fields
+    # Email verification fields (tokens are stored as sha256 hex, never raw)
     email_verified = Column(Boolean, default=False, nullable=False)
-    verification_token = Column(String(255), nullable=True, unique=True)
+    verification_token = Column(String(64), nullable=True, unique=True)
     verification_token_expires = Column(DateTime(timezone=True), nullable=True)
     
     # Password reset fields
-    password_reset_token = Column(String(255), nullable=True, unique=True)
+    password_reset_token = Column(String(64), nullable=True, unique=True)
     password_reset_token_expires = Column(DateTime(timezone=True), nullable=True)
     
     # Document URLs from R2
     id_document_url = Column(Text, nullable=True)
     proof_of_registration_url = Column(Text, nullable=True)
+    document_reminder_sent_at = Column(DateTime(timezone=True), nullable=True)  # reminder cooldown
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -60,8 +67,12 @@ class Property(Base):
     total_flats = Column(Integer, nullable=False)
     space_per_student = Column(Float, nullable=False)
     campus_intake = Column(String(255), nullable=False)
-    admin_id = Column(Integer, ForeignKey("admins.id", ondelete="CASCADE"), nullable=False)
+    admin_id = Column(Integer, ForeignKey("admins.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Demand counters, kept current by the Application events below
+    application_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    pending_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    approved_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     admin = relationship("Admin", back_populates="properties")
     images = relationship("PropertyImage", back_populates="property", cascade="all, delete-orphan")
@@ -72,23 +83,203 @@ class PropertyImage(Base):
     __tablename__ = "property_images"
 
     id = Column(Integer, primary_key=True, index=True)
-    property_id = Column(Integer, ForeignKey("properties.id", ondelete="CASCADE"), nullable=False)
+    property_id = Column(Integer, ForeignKey("properties.id", ondelete="CASCADE"), nullable=False, index=True)
     image_url = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     property = relationship("Property", back_populates="images")
 
 
+# Application.status is stored as a SMALLINT code and read/written as the strings
+# the API uses, so "pending" comparisons in Python and in queries stay as they are.
+# Codes are permanent: add new statuses at the end, never renumber.
+APPLICATION_STATUSES = {"pending": 0, "approved": 1, "rejected": 2}
+_APPLICATION_STATUS_NAMES = {code: name for name, code in APPLICATION_STATUSES.items()}
+
+
+class ApplicationStatus(TypeDecorator):
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value not in APPLICATION_STATUSES:
+            raise ValueError(f"Unknown application status {value!r}")
+        return APPLICATION_STATUSES[value]
+
+    def process_literal_param(self, value, dialect):
+        return self.process_bind_param(value, dialect)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else _APPLICATION_STATUS_NAMES[value]
+
+
 class Application(Base):
     __tablename__ = "applications"
 
     id = Column(Integer, primary_key=True, index=True)
+    # student_id lookups use uq_applications_student_property (student_id is its leading column)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    # property_id lookups use ix_applications_property_intake (property_id is its leading column)
     property_id = Column(Integer, ForeignKey("properties.id", ondelete="CASCADE"), nullable=False)
-    status = Column(String(20), default="pending")
+    # Academic intake (app.core.intake); older intakes are moved to applications_archive.
+    # The column's SQL default (migration 0005) applies the same rule for writers outside the app.
+    intake_year = Column(SmallInteger, nullable=False, default=current_intake_year)
+    # Only the pending partial indexes below; approved/rejected rows are reached through property_id
+    status = Column(ApplicationStatus(), nullable=False, default="pending", server_default=text("0"))
     applied_at = Column(DateTime(timezone=True), server_default=func.now())
     notes = Column(Text, nullable=True)
     funding_approved = Column(Boolean, default=False)
 
     student = relationship("Student", back_populates="applications")
-    property = relationship("Property", back_populates="applications")
\ No newline at end of file
+    property = relationship("Property", back_populates="applications")
+
+    __table_args__ = (
+        # One application per student per property per intake
+        UniqueConstraint("student_id", "property_id", "intake_year", name="uq_applications_student_property_intake"),
+        CheckConstraint("status IN (0, 1, 2)", name="ck_applications_status"),
+        # Admin views: one property's applications for one intake
+        Index("ix_applications_property_intake", "property_id", "intake_year"),
+        # Document reminder sweep: students with a pending application
+        Index("ix_applications_pending_student", "student_id", postgresql_where=text("status = 0")),
+        # Admin pending queue and counts, per property
+        Index("ix_applications_pending_property", "property_id", postgresql_where=text("status = 0")),
+    )
+
+
+class ApplicationArchive(Base):
+    """Applications from intakes before intake.oldest_kept_intake(), moved here by
+    app.jobs.application_archiver. No foreign keys: history outlives the student or property."""
+    __tablename__ = "applications_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # the id it had in applications
+    student_id = Column(Integer, nullable=False, index=True)
+    property_id = Column(Integer, nullable=False)
+    intake_year = Column(SmallInteger, nullable=False)
+    status = Column(ApplicationStatus(), nullable=False)
+    applied_at = Column(DateTime(timezone=True))
+    notes = Column(Text, nullable=True)
+    funding_approved = Column(Boolean)
+    archived_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_applications_archive_property_intake", "property_id", "intake_year"),
+    )
+
+
+def application_status_is(status: str):
+    """Application.status = <code> with the code inlined, not bound, so the planner
+    matches the partial indexes' predicate even in a cached generic plan"""
+    return Application.status == literal(status, ApplicationStatus(), literal_execute=True)
+
+
+# ── Per-property demand counters ─────
+# application_count / approved_count are for the current intake; pending_count
+# also counts applications still pending from earlier kept intakes, so the
+# queue doesn't empty at INTAKE_ROLLOVER_MONTH while they are undecided. Every
+# ORM insert, status change and delete moves its property's counters in the same flush,
+# as relative UPDATEs, so they commit or roll back with the application and
+# concurrent requests can't lose an increment. Changes that bypass the ORM
+# (ON DELETE CASCADE from students, bulk deletes, hand-written SQL) and the
+# switch to a new intake are corrected by app.jobs.demand_counters.
+_STATUS_COUNTERS = {"pending": "pending_count", "approved": "approved_count"}
+
+
+def _adjust_counts(connection, target, deltas: dict):
+    if target.property_id is None or target.intake_year is None:
+        return
+    current = target.intake_year == current_intake_year()
+    kept = target.intake_year >= oldest_kept_intake()
+    deltas = {
+        name: delta for name, delta in deltas.items()
+        if delta and (current or (kept and name == "pending_count"))
+    }
+    if not deltas:
+        return
+    table = Property.__table__
+    connection.execute(
+        update(table)
+        .where(table.c.id == target.property_id)
+        .values({table.c[name]: table.c[name] + delta for name, delta in deltas.items()})
+    )
+
+
+def _status_deltas(old_status: str, new_status: str) -> dict:
+    deltas = {}
+    if old_status in _STATUS_COUNTERS:
+        deltas[_STATUS_COUNTERS[old_status]] = -1
+    if new_status in _STATUS_COUNTERS:
+        deltas[_STATUS_COUNTERS[new_status]] = deltas.get(_STATUS_COUNTERS[new_status], 0) + 1
+    return deltas
+
+
+@event.listens_for(Application, "after_insert")
+def _count_new_application(mapper, connection, target):
+    _adjust_counts(connection, target, {"application_count": 1, **_status_deltas(None, target.status)})
+
+
+@event.listens_for(Application, "after_update")
+def _count_status_change(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if history.added:
+        old_status = history.deleted[0] if history.deleted else None
+        _adjust_counts(connection, target, _status_deltas(old_status, history.added[0]))
+
+
+@event.listens_for(Application, "after_delete")
+def _count_deleted_application(mapper, connection, target):
+    history = inspect(target).attrs.status.history  # doesn't load: the row is already gone
+    status = (history.unchanged or history.deleted or [None])[0]
+    _adjust_counts(connection, target, {"application_count": -1, **_status_deltas(status, None)})
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sha256 hex of the opaque token - the raw value is only ever held by the client
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    # Every rotation of one login shares a family; reuse of a rotated token revokes the family
+    family_id = Column(String(32), nullable=False, index=True)
+    subject = Column(String(255), nullable=False, index=True)  # user email
+    role = Column(String(20), nullable=False)
+    student_id = Column(Integer, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class EmailOutbox(Base):
+    """Emails written in the same transaction as the change that triggers them,
+    delivered later by app.core.outbox workers"""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)  # key into email_utils.EMAIL_BUILDERS
+    to_email = Column(String(255), nullable=False)
+    payload = Column(JSONB, nullable=True)  # builder kwargs; cleared once delivered
+    status = Column(String(20), nullable=False, default="pending")  # pending | sending | sent | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    provider_id = Column(String(100), nullable=True)
+    bulk_id = Column(String(32), nullable=True, index=True)  # set for rows of one bulk notification
+    admin_id = Column(Integer, nullable=True)  # admin who sent the bulk notification; only they see its status
+    expires_at = Column(DateTime(timezone=True), nullable=True)  # when a link in the payload stops working
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Workers only ever scan undelivered rows
+        Index("ix_email_outbox_due", "next_attempt_at", postgresql_where=text("status IN ('pending', 'sending')")),
+    )
+
+
+class ScheduledJob(Base):
+    """Last run of each app.core.scheduler job, shared by every worker"""
+    __tablename__ = "scheduled_jobs"
+
+    name = Column(String(100), primary_key=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=False)
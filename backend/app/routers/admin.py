@@ -1,42 +1,20 @@
 # app/routers/admin.py - UPDATED WITH OUTCOME EMAILS
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from typing import List
-from sqlalchemy.orm import Session
-from .. import models, database
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from .. import models, database, schemas
 from .auth import get_current_admin
-from ..core.email_utils import send_application_approved_email, send_application_rejected_email
-import boto3
+from ..core import email_templates, intake, outbox, profiler, security, slow_queries, storage
+from ..core.storage import s3_client, R2_BUCKET, key_from_url
+import asyncio
 import os
 from uuid import uuid4
-from botocore.client import Config
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
-# CLOUDFLARE R2
-R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
-R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
-R2_ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
-R2_BUCKET = os.getenv("R2_BUCKET")
-R2_PUBLIC_URL = os.getenv("R2_PUBLIC_URL")
-
-if not all([R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_ACCOUNT_ID, R2_BUCKET, R2_PUBLIC_URL]):
-    raise RuntimeError("Missing R2 config")
-
-R2_ENDPOINT = f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
-
-s3_client = boto3.client(
-    "s3",
-    endpoint_url=R2_ENDPOINT,
-    aws_access_key_id=R2_ACCESS_KEY_ID,
-    aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-    region_name="auto",
-    config=Config(signature_version='s3v4')
-)
-
-def get_public_url(key: str) -> str:
-    """Generate public URL for R2 object"""
-    return f"{R2_PUBLIC_URL}/{key}"
-
 ALLOWED_EXT = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
 
 @router.post("/properties")
@@ -48,12 +26,17 @@ async def create_property(
     space_per_student: float = Form(...),
     campus_intake: str = Form(...),
     images: List[UploadFile] = File(...),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     admin: models.Admin = Depends(get_current_admin),
 ):
     if not (1 <= len(images) <= 5):
         raise HTTPException(400, "1-5 images required")
 
+    # Validate every image up front so a bad file can't leave orphaned uploads in R2
+    for img in images:
+        if os.path.splitext(img.filename)[1].lower() not in ALLOWED_EXT:
+            raise HTTPException(400, "Invalid image type")
+
     prop = models.Property(
         title=title, address=address, is_bachelor=is_bachelor,
         available_flats=available_flats, total_flats=available_flats,
@@ -61,28 +44,18 @@ async def create_property(
         admin_id=admin.id
     )
     db.add(prop)
-    db.commit()
-    db.refresh(prop)
+    await db.commit()
 
-    for img in images:
-        ext = os.path.splitext(img.filename)[1].lower()
-        if ext not in ALLOWED_EXT:
-            raise HTTPException(400, "Invalid image type")
-
-        key = f"properties/{prop.id}/{uuid4().hex}{ext}"
-        
-        s3_client.put_object(
-            Bucket=R2_BUCKET,
-            Key=key,
-            Body=await img.read(),
-            ContentType=img.content_type or "image/jpeg",
-            ACL="public-read"
+    # Uploads run side by side in the threadpool; the loop keeps serving meanwhile
+    urls = await asyncio.gather(*(
+        storage.upload(
+            f"{storage.PROPERTY_PREFIX}{prop.id}/{uuid4().hex}{os.path.splitext(img.filename)[1].lower()}",
+            img.file, img.content_type or "image/jpeg",
         )
-
-        url = get_public_url(key)
-        db.add(models.PropertyImage(property_id=prop.id, image_url=url))
-
-    db.commit()
+        for img in images
+    ))
+    db.add_all(models.PropertyImage(property_id=prop.id, image_url=url) for url in urls)
+    await db.commit()
     return {"message": "Property created successfully", "property_id": prop.id}
 
 
@@ -97,16 +70,20 @@ async def update_property(
     campus_intake: str = Form(None),
     new_images: List[UploadFile] = File(default=[]),
     remove_images: List[str] = Form(default=[]),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     admin: models.Admin = Depends(get_current_admin),
 ):
-    prop = db.query(models.Property).filter(
+    prop = await db.scalar(select(models.Property).where(
         models.Property.id == property_id, 
         models.Property.admin_id == admin.id
-    ).first()
+    ))
     if not prop:
         raise HTTPException(404, "Property not found")
 
+    for img in new_images:
+        if os.path.splitext(img.filename)[1].lower() not in ALLOWED_EXT:
+            raise HTTPException(400, "Invalid image type")
+
     if title: prop.title = title
     if address: prop.address = address
     if is_bachelor is not None: prop.is_bachelor = is_bachelor
@@ -117,39 +94,33 @@ async def update_property(
     if space_per_student: prop.space_per_student = space_per_student
     if campus_intake: prop.campus_intake = campus_intake
 
-    for url in remove_images:
-        try:
-            key = url.replace(f"{R2_PUBLIC_URL}/", "")
-            s3_client.delete_object(Bucket=R2_BUCKET, Key=key)
-        except Exception as e:
-            print(f"Failed to delete image: {e}")
-        db.query(models.PropertyImage).filter(
-            models.PropertyImage.image_url == url
-        ).delete()
-
-    current = db.query(models.PropertyImage).filter(
-        models.PropertyImage.property_id == property_id
-    ).count()
-    if current - len(remove_images) + len(new_images) > 5:
+    removed = []
+    if remove_images:
+        removed = (await db.scalars(
+            delete(models.PropertyImage)
+            .where(models.PropertyImage.property_id == property_id, models.PropertyImage.image_url.in_(remove_images))
+            .returning(models.PropertyImage.image_url)
+        )).all()
+
+    current = await db.scalar(
+        select(func.count()).select_from(models.PropertyImage)
+        .where(models.PropertyImage.property_id == property_id)
+    )
+    if current + len(new_images) > 5:
         raise HTTPException(400, "Max 5 images allowed")
 
-    for img in new_images:
-        ext = os.path.splitext(img.filename)[1].lower()
-        if ext not in ALLOWED_EXT:
-            raise HTTPException(400, "Invalid image type")
-        
-        key = f"properties/{property_id}/{uuid4().hex}{ext}"
-        s3_client.put_object(
-            Bucket=R2_BUCKET, 
-            Key=key, 
-            Body=await img.read(),
-            ContentType=img.content_type or "image/jpeg",
-            ACL="public-read"
+    urls = await asyncio.gather(*(
+        storage.upload(
+            f"{storage.PROPERTY_PREFIX}{property_id}/{uuid4().hex}{os.path.splitext(img.filename)[1].lower()}",
+            img.file, img.content_type or "image/jpeg",
         )
-        url = get_public_url(key)
-        db.add(models.PropertyImage(property_id=property_id, image_url=url))
+        for img in new_images
+    ))
+    db.add_all(models.PropertyImage(property_id=property_id, image_url=url) for url in urls)
+    await db.commit()
 
-    db.commit()
+    # Only drop objects from R2 once the rows pointing at them are gone for good
+    await asyncio.gather(*(storage.delete_url(url) for url in removed))
     return {"message": "Property updated successfully"}
 
 
@@ -168,7 +139,7 @@ def delete_property(
 
     for img in prop.images:
         try:
-            key = img.image_url.replace(f"{R2_PUBLIC_URL}/", "")
+            key = key_from_url(img.image_url)
             s3_client.delete_object(Bucket=R2_BUCKET, Key=key)
         except Exception as e:
             print(f"Failed to delete image: {e}")
@@ -186,12 +157,18 @@ def delete_property(
 
 @router.get("/properties")
 def get_properties(
-    db: Session = Depends(database.get_db), 
+    sort: Optional[str] = Query(None, pattern="^(demand|pending)$"),
+    db: Session = Depends(database.get_read_db), 
     admin: models.Admin = Depends(get_current_admin)
 ):
-    props = db.query(models.Property).filter(
+    """This admin's properties; ?sort=demand (most applications) or ?sort=pending (biggest queue) first"""
+    query = db.query(models.Property).options(selectinload(models.Property.images)).filter(
         models.Property.admin_id == admin.id
-    ).all()
+    )
+    if sort:
+        counter = models.Property.application_count if sort == "demand" else models.Property.pending_count
+        query = query.order_by(counter.desc(), models.Property.id)
+    props = query.all()
     return [{
         "id": p.id, 
         "title": p.title, 
@@ -201,21 +178,37 @@ def get_properties(
         "total_flats": p.total_flats,
         "space_per_student": p.space_per_student, 
         "campus_intake": p.campus_intake,
+        "application_count": p.application_count,
+        "pending_count": p.pending_count,
+        "approved_count": p.approved_count,
         "image_urls": [i.image_url for i in p.images]
     } for p in props]
 
 
 @router.get("/applications")
 def get_applications(
-    db: Session = Depends(database.get_db),
+    intake_year: Optional[int] = Query(None),
+    db: Session = Depends(database.get_read_db),
     current_admin: models.Admin = Depends(get_current_admin),
 ):
-    """Get minimal application details for list view"""
+    """Get minimal application details for list view: the current intake plus anything
+    still pending from earlier kept intakes, or exactly one ?intake_year="""
+    if intake_year is None:
+        source = models.Application
+        in_view = or_(
+            source.intake_year == intake.current_intake_year(),
+            # Undecided from a previous intake: stays in the queue until approved or rejected
+            and_(models.application_status_is("pending"), source.intake_year >= intake.oldest_kept_intake()),
+        )
+    else:
+        # Intakes past the kept window live in applications_archive
+        source = models.Application if intake_year >= intake.oldest_kept_intake() else models.ApplicationArchive
+        in_view = source.intake_year == intake_year
     applications = (
-        db.query(models.Application, models.Student, models.Property)
-        .join(models.Student, models.Application.student_id == models.Student.id)
-        .join(models.Property, models.Application.property_id == models.Property.id)
-        .filter(models.Property.admin_id == current_admin.id)
+        db.query(source, models.Student, models.Property)
+        .join(models.Student, source.student_id == models.Student.id)
+        .join(models.Property, source.property_id == models.Property.id)
+        .filter(models.Property.admin_id == current_admin.id, in_view)
         .all()
     )
     result = []
@@ -227,6 +220,7 @@ def get_applications(
             "property_id": prop.id,
             "property_title": prop.title,
             "status": app.status,
+            "intake_year": app.intake_year,
             "applied_at": app.applied_at.isoformat(),
             "funding_approved": app.funding_approved,
         })
@@ -236,7 +230,7 @@ def get_applications(
 @router.get("/applications/{app_id}")
 def get_application_details(
     app_id: int,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_admin: models.Admin = Depends(get_current_admin),
 ):
     """Get full application details including documents"""
@@ -306,24 +300,18 @@ def delete_application(
 
 @router.get("/stats")
 def get_stats(
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_admin: models.Admin = Depends(get_current_admin),
 ):
     properties = db.query(models.Property).filter(
         models.Property.admin_id == current_admin.id
     ).all()
     total_properties = len(properties)
-    total_applications = db.query(models.Application).join(models.Property).filter(
-        models.Property.admin_id == current_admin.id
-    ).count()
-    pending = db.query(models.Application).join(models.Property).filter(
-        models.Property.admin_id == current_admin.id, 
-        models.Application.status == "pending"
-    ).count()
-    approved = db.query(models.Application).join(models.Property).filter(
-        models.Property.admin_id == current_admin.id, 
-        models.Application.status == "approved"
-    ).count()
+    # Per-property counters instead of counting applications: the current intake,
+    # except pending, which includes applications still undecided from earlier kept intakes
+    total_applications = sum(p.application_count for p in properties)
+    pending = sum(p.pending_count for p in properties)
+    approved = sum(p.approved_count for p in properties)
 
     total_spaces = sum(p.total_flats for p in properties)
     occupied = sum(p.total_flats - p.available_flats for p in properties)
@@ -335,6 +323,7 @@ def get_stats(
         "pending_applications": pending,
         "approved_applications": approved,
         "occupancy_rate": occupancy_rate,
+        "intake_year": intake.current_intake_year(),
     }
 
 
@@ -369,21 +358,14 @@ def approve_application(
     app.status = "approved"
     if prop.available_flats > 0:
         prop.available_flats -= 1
+    outbox.enqueue(
+        db, "application_approved", student.email,
+        student_name=student.full_name,
+        property_title=prop.title,
+        property_address=prop.address,
+    )
     db.commit()
     
-    # Send approval email to student
-    try:
-        send_application_approved_email(
-            student_email=student.email,
-            student_name=student.full_name,
-            property_title=prop.title,
-            property_address=prop.address
-        )
-        print(f"✅ Approval email sent to {student.email}")
-    except Exception as e:
-        print(f"⚠️ Failed to send approval email: {str(e)}")
-        # Don't fail the approval if email fails
-    
     return {
         "message": "Application approved successfully! Student has been notified via email.",
         "student_email": student.email
@@ -419,22 +401,140 @@ def reject_application(
     
     # Reject application
     app.status = "rejected"
+    outbox.enqueue(
+        db, "application_rejected", student.email,
+        student_name=student.full_name,
+        property_title=prop.title,
+        property_address=prop.address,
+    )
     db.commit()
     
-    # Send rejection email to student
-    try:
-        send_application_rejected_email(
-            student_email=student.email,
-            student_name=student.full_name,
-            property_title=prop.title,
-            property_address=prop.address
-        )
-        print(f"✅ Rejection email sent to {student.email}")
-    except Exception as e:
-        print(f"⚠️ Failed to send rejection email: {str(e)}")
-        # Don't fail the rejection if email fails
-    
     return {
         "message": "Application rejected. Student has been notified via email.",
         "student_email": student.email
-    }
\ No newline at end of file
+    }
+
+
+# ── Bulk notifications ─────
+@router.post("/notifications")
+def send_bulk_notification(
+    body: schemas.BulkNotificationCreate,
+    db: Session = Depends(database.get_db),
+    admin: models.Admin = Depends(get_current_admin),
+):
+    """Queue an announcement to every student who applied to this admin's properties this intake"""
+    query = (
+        db.query(models.Student.email, models.Student.full_name)
+        .join(models.Application, models.Application.student_id == models.Student.id)
+        .join(models.Property, models.Application.property_id == models.Property.id)
+        .filter(models.Property.admin_id == admin.id, models.Application.intake_year == intake.current_intake_year())
+    )
+    if body.property_id is not None:
+        query = query.filter(models.Application.property_id == body.property_id)
+    if body.status is not None:
+        query = query.filter(models.application_status_is(body.status))
+    recipients = query.distinct().all()
+
+    if not recipients:
+        raise HTTPException(400, "No students match these filters")
+
+    bulk_id, count = outbox.enqueue_bulk(
+        db, "announcement",
+        ((email, {"student_name": name, "subject": body.subject, "message": body.message})
+         for email, name in recipients),
+        admin_id=admin.id,
+    )
+    db.commit()
+
+    return {
+        "message": f"Announcement queued for {count} students",
+        "bulk_id": bulk_id,
+        "recipients": count,
+    }
+
+
+@router.get("/notifications/{bulk_id}")
+def get_bulk_notification_status(
+    bulk_id: str,
+    db: Session = Depends(database.get_db),
+    admin: models.Admin = Depends(get_current_admin),
+):
+    """Delivery progress of a bulk notification, including failed recipients"""
+    status = outbox.bulk_status(db, bulk_id, admin.id)
+    if status["total"] == 0:  # unknown, or another admin's
+        raise HTTPException(404, "Notification not found")
+    return status
+
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    limit: int = 50,
+    plans: bool = False,
+    admin: models.Admin = Depends(get_current_admin),
+):
+    """Statements over SLOW_QUERY_MS seen by this worker, by total time, with EXPLAIN summaries"""
+    return slow_queries.report(limit=limit, include_plans=plans)
+
+
+@router.delete("/slow-queries")
+def reset_slow_queries(admin: models.Admin = Depends(get_current_admin)):
+    slow_queries.reset()
+    return {"message": "Slow query stats cleared"}
+
+
+@router.get("/hashing")
+def get_hashing_stats(admin: models.Admin = Depends(get_current_admin)):
+    """Password hashing pool latency and queue depth on this worker"""
+    return security.hashing_pool.stats()
+
+
+@router.get("/email-outbox")
+def get_email_outbox_stats(admin: models.Admin = Depends(get_current_admin)):
+    """Email outbox delivery counters and queue depth, and template render stats"""
+    return {**outbox.stats(), "templates": email_templates.stats()}
+
+
+# ── Profiling (PROFILING_ENABLED only) ─────
+def require_profiling(admin: models.Admin = Depends(get_current_admin)):
+    if not profiler.PROFILING_ENABLED:
+        raise HTTPException(404, "Not found")
+    return admin
+
+
+@router.get("/profiles")
+def get_profiles(admin: models.Admin = Depends(require_profiling)):
+    """Requests profiled with "X-Profile: 1", newest first"""
+    return profiler.list_profiles()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, admin: models.Admin = Depends(require_profiling)):
+    """Collapsed stacks, ready for flamegraph.pl or speedscope"""
+    collapsed = profiler.load_profile(profile_id)
+    if collapsed is None:
+        raise HTTPException(404, "Profile not found")
+    return collapsed
+
+
+@router.post("/memory/start")
+def start_memory_tracing(admin: models.Admin = Depends(require_profiling)):
+    return profiler.start_tracemalloc()
+
+
+@router.post("/memory/stop")
+def stop_memory_tracing(admin: models.Admin = Depends(require_profiling)):
+    return profiler.stop_tracemalloc()
+
+
+@router.get("/memory")
+def get_memory_snapshot(
+    limit: int = 25,
+    group_by: str = "lineno",
+    admin: models.Admin = Depends(require_profiling),
+):
+    """Top allocation sites on this worker and growth since the last snapshot"""
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(400, "group_by must be lineno, filename or traceback")
+    if not profiler.memory_status()["tracing"]:
+        raise HTTPException(409, "tracemalloc is not running; POST /admin/memory/start first")
+    return profiler.memory_snapshot(limit=limit, group_by=group_by)
@@ -1,43 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 from .. import models, database
 from .auth import get_current_user
-from ..core.email_utils import send_application_confirmation_email
+from ..core import identity_cache, outbox, storage
+from ..core.intake import current_intake_year
 from pydantic import BaseModel
-import boto3
-import os
+import asyncio
 from uuid import uuid4
-from botocore.client import Config
 
 router = APIRouter(prefix="/applications", tags=["Applications"])
 
-# Cloudflare R2 Configuration
-R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
-R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
-R2_ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
-R2_BUCKET = os.getenv("R2_BUCKET")
-R2_PUBLIC_URL = os.getenv("R2_PUBLIC_URL")
-
-if not all([R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_ACCOUNT_ID, R2_BUCKET, R2_PUBLIC_URL]):
-    raise RuntimeError("Missing R2 configuration. Please check environment variables.")
-
-R2_ENDPOINT = f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
-
-s3_client = boto3.client(
-    "s3",
-    endpoint_url=R2_ENDPOINT,
-    aws_access_key_id=R2_ACCESS_KEY_ID,
-    aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-    region_name="auto",
-    config=Config(signature_version='s3v4')
-)
-
-def get_public_url(key: str) -> str:
-    """Generate public URL for R2 object"""
-    return f"{R2_PUBLIC_URL}/{key}"
-
-
 class ApplicationCreate(BaseModel):
     property_id: int
     notes: str = ""
@@ -45,17 +21,20 @@ class ApplicationCreate(BaseModel):
 
 @router.get("/my-applications")
 def my_applications(
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user=Depends(get_current_user)
 ):
     """Get all applications for current student - documents come from Student table"""
-    applications = db.query(models.Application).filter(
-        models.Application.student_id == current_user.id
-    ).all()
+    # One query: each application together with its property
+    applications = (
+        db.query(models.Application, models.Property)
+        .outerjoin(models.Property, models.Property.id == models.Application.property_id)
+        .filter(models.Application.student_id == current_user.id)
+        .all()
+    )
     
     result = []
-    for app in applications:
-        prop = db.query(models.Property).filter(models.Property.id == app.property_id).first()
+    for app, prop in applications:
         
         # ✅ Documents are stored on the Student model, NOT Application model
         result.append({
@@ -64,6 +43,7 @@ def my_applications(
             "property_title": prop.title if prop else "Unknown",
             "property_address": prop.address if prop else "Unknown",
             "status": app.status,
+            "intake_year": app.intake_year,
             "applied_at": app.applied_at.isoformat(),
             "notes": app.notes,
             "funding_approved": app.funding_approved,
@@ -89,10 +69,12 @@ def create_application(
             detail="You must verify your email before applying. Please check your inbox."
         )
     
-    # Check if student already applied
+    # Check if student already applied for this intake
+    intake_year = current_intake_year()
     existing = db.query(models.Application).filter(
         models.Application.student_id == current_user.id,
-        models.Application.property_id == payload.property_id
+        models.Application.property_id == payload.property_id,
+        models.Application.intake_year == intake_year,
     ).first()
     if existing:
         raise HTTPException(status_code=400, detail="You have already applied to this property")
@@ -111,25 +93,25 @@ def create_application(
     new_app = models.Application(
         student_id=current_user.id,
         property_id=payload.property_id,
+        intake_year=intake_year,
         status="pending",
         notes=payload.notes,
         funding_approved=False
     )
     db.add(new_app)
-    db.commit()
-    db.refresh(new_app)
-    
-    # Send confirmation email
+    outbox.enqueue(
+        db, "application_confirmation", current_user.email,
+        student_name=current_user.full_name,
+        property_title=prop.title,
+        property_address=prop.address,
+    )
     try:
-        send_application_confirmation_email(
-            student_email=current_user.email,
-            student_name=current_user.full_name,
-            property_title=prop.title,
-            property_address=prop.address
-        )
-        print(f"✅ Confirmation email sent to {current_user.email}")
-    except Exception as e:
-        print(f"⚠️ Failed to send confirmation email: {str(e)}")
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a second submit: uq_applications_student_property_intake
+        db.rollback()
+        raise HTTPException(status_code=400, detail="You have already applied to this property")
+    db.refresh(new_app)
     
     return {
         "message": "Application submitted successfully! Check your email for next steps.",
@@ -143,81 +125,59 @@ async def update_application(
     proof_of_registration: Optional[UploadFile] = File(None),
     id_copy: Optional[UploadFile] = File(None),
     funding_approved: bool = Form(False),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     current_user=Depends(get_current_user)
 ):
     """Update application - stores documents on STUDENT table"""
-    # Find application
-    app = db.query(models.Application).filter(
-        models.Application.id == app_id,
-        models.Application.student_id == current_user.id
-    ).first()
+    # Find application (and the student row the documents live on)
+    row = (await db.execute(
+        select(models.Application, models.Student)
+        .join(models.Student, models.Application.student_id == models.Student.id)
+        .where(
+            models.Application.id == app_id,
+            models.Application.student_id == current_user.id
+        )
+    )).first()
     
-    if not app:
+    if not row:
         raise HTTPException(status_code=404, detail="Application not found")
+    app, student = row
     
     if app.status != "pending":
         raise HTTPException(status_code=400, detail="Cannot edit application that is not pending")
     
-    documents_uploaded = False
-    
-    # ✅ Upload proof of registration to R2 - store on STUDENT table
+    # column -> (R2 key, upload); both files are checked before anything is uploaded
+    uploads = {}
     if proof_of_registration and proof_of_registration.filename:
         if proof_of_registration.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="Proof of registration must be PDF")
-        
-        # Delete old file if exists
-        if hasattr(current_user, 'proof_of_registration_url') and current_user.proof_of_registration_url:
-            try:
-                old_key = current_user.proof_of_registration_url.replace(f"{R2_PUBLIC_URL}/", "")
-                s3_client.delete_object(Bucket=R2_BUCKET, Key=old_key)
-            except Exception as e:
-                print(f"Failed to delete old proof of registration: {e}")
-        
-        key = f"documents/{current_user.id}/por_{uuid4().hex}.pdf"
-        s3_client.put_object(
-            Bucket=R2_BUCKET,
-            Key=key,
-            Body=await proof_of_registration.read(),
-            ContentType="application/pdf",
-            ACL="public-read"
-        )
-        current_user.proof_of_registration_url = get_public_url(key)
-        documents_uploaded = True
-    
-    # ✅ Upload ID copy to R2 - store on STUDENT table
+        uploads["proof_of_registration_url"] = (f"documents/{student.id}/por_{uuid4().hex}.pdf", proof_of_registration)
     if id_copy and id_copy.filename:
         if id_copy.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="ID copy must be PDF")
-        
-        # Delete old file if exists
-        if hasattr(current_user, 'id_document_url') and current_user.id_document_url:
-            try:
-                old_key = current_user.id_document_url.replace(f"{R2_PUBLIC_URL}/", "")
-                s3_client.delete_object(Bucket=R2_BUCKET, Key=old_key)
-            except Exception as e:
-                print(f"Failed to delete old ID copy: {e}")
-        
-        key = f"documents/{current_user.id}/id_{uuid4().hex}.pdf"
-        s3_client.put_object(
-            Bucket=R2_BUCKET,
-            Key=key,
-            Body=await id_copy.read(),
-            ContentType="application/pdf",
-            ACL="public-read"
-        )
-        current_user.id_document_url = get_public_url(key)
-        documents_uploaded = True
+        uploads["id_document_url"] = (f"documents/{student.id}/id_{uuid4().hex}.pdf", id_copy)
+    
+    # ✅ Upload to R2 off the event loop - store on STUDENT table
+    urls = await asyncio.gather(*(
+        storage.upload(key, upload.file, "application/pdf") for key, upload in uploads.values()
+    ))
+    replaced = [getattr(student, column) for column in uploads if getattr(student, column)]
+    for column, url in zip(uploads, urls):
+        setattr(student, column, url)
     
     # Update funding status on Application table
     app.funding_approved = funding_approved
     
-    db.commit()
+    await db.commit()
+    if uploads:
+        identity_cache.invalidate_user(student.email)
+        # Old files go only once the new URLs are committed
+        await asyncio.gather(*(storage.delete_url(url) for url in replaced))
     
     return {
         "message": "Application updated successfully! Your documents will be reviewed shortly.",
-        "proof_of_registration": getattr(current_user, 'proof_of_registration_url', None),
-        "id_copy": getattr(current_user, 'id_document_url', None),
+        "proof_of_registration": student.proof_of_registration_url,
+        "id_copy": student.id_document_url,
         "funding_approved": app.funding_approved
     }
 
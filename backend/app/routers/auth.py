@@ -3,14 +3,18 @@ import os
 import secrets
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from datetime import timedelta, datetime, timezone
 from pydantic import BaseModel
 
 from .. import models, schemas, database
-from ..core.security import create_access_token, verify_password, hash_password
-from ..core.email_utils import send_verification_email, send_password_reset_email
+from ..core.security import (
+    create_access_token, verify_password, hash_password,
+    generate_opaque_token, hash_token, REFRESH_TOKEN_EXPIRE_DAYS, REFRESH_REUSE_GRACE_SECONDS,
+)
+from ..core import identity_cache, rate_limit, outbox
 
 # ── Config ─────────────────────────────────────
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -33,13 +37,41 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 
+# ── Refresh token helpers ─────
+def _issue_refresh_token(db: Session, email: str, role: str, student_id: int = None, family_id: str = None) -> str:
+    """Store a hashed refresh token and return the raw value for the client (caller commits)"""
+    raw_token = generate_opaque_token()
+    db.add(models.RefreshToken(
+        token_hash=hash_token(raw_token),
+        family_id=family_id or secrets.token_hex(16),
+        subject=email,
+        role=role,
+        student_id=student_id,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return raw_token
+
+
+def _stored_token_matches(column, token: str):
+    """Filter for a stored link token. Links issued before tokens were hashed
+    carried a JWT; migration 0001b replaced those with their digest too."""
+    return column == hash_token(token)
+
+
+def _revoke_refresh_tokens(db: Session, *criteria):
+    """Revoke every live refresh token matching criteria (caller commits)"""
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.revoked_at.is_(None), *criteria
+    ).update({"revoked_at": datetime.now(timezone.utc)}, synchronize_session=False)
+
+
 @router.get("/test")
 def test_auth():
     return {"message": "Auth router is working! Secure login active."}
 
 
 # ==================== REGISTER STUDENT ====================
-@router.post("/register", response_model=dict)
+@router.post("/register", response_model=dict, dependencies=[Depends(rate_limit.limit_by_ip("register:ip"))])
 def register_student(
     student_in: schemas.StudentCreate,
     db: Session = Depends(database.get_db),
@@ -55,16 +87,8 @@ def register_student(
     # Hash password
     hashed = hash_password(student_in.password)
 
-    # CREATE JWT VERIFICATION TOKEN
-    verification_token = jwt.encode(
-        {
-            "sub": student_in.email,
-            "type": "email_verification",
-            "exp": datetime.now(timezone.utc) + timedelta(hours=24)
-        },
-        SECRET_KEY,
-        algorithm=ALGORITHM
-    )
+    # Opaque verification token - the email gets the raw value, the DB only its hash
+    verification_token = generate_opaque_token()
 
     # Create new student
     db_student = models.Student(
@@ -75,26 +99,19 @@ def register_student(
         campus=student_in.campus,
         hashed_password=hashed,
         email_verified=False,
-        verification_token=verification_token,
+        verification_token=hash_token(verification_token),
         verification_token_expires=datetime.now(timezone.utc) + timedelta(hours=24)
     )
     db.add(db_student)
+
+    # Queue the verification email in the same commit that creates the account
+    outbox.enqueue(
+        db, "verification", db_student.email,
+        secret={"verification_token": verification_token},
+        expires_at=db_student.verification_token_expires,
+        student_name=db_student.full_name,
+    )
     db.commit()
-    db.refresh(db_student)
-
-    # SEND VERIFICATION EMAIL
-    try:
-        email_sent = send_verification_email(
-            student_email=db_student.email,
-            student_name=db_student.full_name,
-            verification_token=verification_token
-        )
-        if email_sent:
-            print(f"✅ Verification email sent to {db_student.email}")
-        else:
-            print(f"⚠️ Email not sent (check email configuration)")
-    except Exception as e:
-        print(f"❌ Email failed: {e}")
 
     return {"message": "Registered! Check your email to verify your account."}
 
@@ -107,96 +124,46 @@ def verify_email(
 ):
     """Verify student email address using the token sent via email"""
     
-    print(f"\n{'='*60}")
-    print(f"📧 EMAIL VERIFICATION REQUEST")
-    print(f"{'='*60}")
-    print(f"Token received: {token[:50]}..." if len(token) > 50 else f"Token received: {token}")
-    
     if not token:
-        print("❌ No token provided")
         raise HTTPException(status_code=400, detail="No token provided")
 
-    try:
-        # Decode and verify token
-        print("🔓 Decoding token...")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        email: str = payload.get("sub")
-        token_type: str = payload.get("type")
-        exp: int = payload.get("exp")
-        
-        print(f"📧 Email from token: {email}")
-        print(f"🔖 Token type: {token_type}")
-        print(f"⏰ Token expiry: {datetime.fromtimestamp(exp, tz=timezone.utc)}")
-
-        # Must be email verification token
-        if token_type != "email_verification":
-            print(f"❌ Invalid token type: {token_type}")
-            raise HTTPException(status_code=400, detail="Invalid token type")
-
-        # Find student
-        print(f"🔍 Looking up student with email: {email}")
-        student = db.query(models.Student).filter(models.Student.email == email).first()
-        
-        if not student:
-            print(f"❌ Student not found: {email}")
-            raise HTTPException(status_code=404, detail="Student not found")
-        
-        print(f"✅ Student found: {student.full_name} (ID: {student.id})")
-
-        # Already verified?
-        if student.email_verified:
-            print(f"ℹ️ Email already verified for: {email}")
-            return {
-                "message": "Email already verified. You can log in.",
-                "status": "already_verified"
-            }
-
-        # Check token expiration
-        current_time = datetime.now(timezone.utc)
-        token_expiry = datetime.fromtimestamp(exp, tz=timezone.utc)
-        
-        if current_time > token_expiry:
-            print(f"❌ Token expired. Current: {current_time}, Expiry: {token_expiry}")
-            raise HTTPException(
-                status_code=400, 
-                detail="Verification link has expired. Please request a new verification email."
-            )
-
-        # Verify token matches stored token
-        if student.verification_token != token:
-            print(f"❌ Token mismatch!")
-            raise HTTPException(status_code=400, detail="Invalid verification token")
+    # Single unique-index lookup on the stored hash
+    student = db.query(models.Student).filter(
+        _stored_token_matches(models.Student.verification_token, token)
+    ).first()
 
-        # SUCCESS – Verify email
-        print(f"✅ Verifying email for: {email}")
-        student.email_verified = True
-        student.verification_token = None
-        student.verification_token_expires = None
-        db.commit()
-        
-        print(f"{'='*60}")
-        print(f"🎉 EMAIL SUCCESSFULLY VERIFIED!")
-        print(f"{'='*60}\n")
+    if not student:
+        print("❌ Verification token not found")
+        raise HTTPException(status_code=400, detail="Invalid or expired verification link")
 
+    # Already verified? (the hash is kept until it expires so repeat clicks land here)
+    if student.email_verified:
         return {
-            "message": "Email verified successfully! You can now log in and apply for accommodation.",
-            "status": "success",
-            "email": email
+            "message": "Email already verified. You can log in.",
+            "status": "already_verified"
         }
 
-    except JWTError as e:
-        print(f"❌ JWT Error: {str(e)}")
-        raise HTTPException(status_code=400, detail=f"Invalid or corrupted verification token")
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ Unexpected error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
+    if student.verification_token_expires and student.verification_token_expires < datetime.now(timezone.utc):
+        raise HTTPException(
+            status_code=400, 
+            detail="Verification link has expired. Please request a new verification email."
+        )
+
+    # SUCCESS – Verify email
+    student.email_verified = True
+    db.commit()
+    
+    print(f"🎉 Email verified for: {student.email}")
+
+    return {
+        "message": "Email verified successfully! You can now log in and apply for accommodation.",
+        "status": "success",
+        "email": student.email
+    }
 
 
 # ==================== FORGOT PASSWORD - FIXED ====================
-@router.post("/forgot-password")
+@router.post("/forgot-password", dependencies=[Depends(rate_limit.limit_by_ip("forgot-password:ip"))])
 def forgot_password(
     request: ForgotPasswordRequest,
     db: Session = Depends(database.get_db),
@@ -208,6 +175,8 @@ def forgot_password(
     if not email:
         raise HTTPException(status_code=400, detail="Email is required")
     
+    rate_limit.check("forgot-password:account", email.lower())
+    
     print(f"\n📧 Password reset requested for: {email}")
     
     # Find student by email
@@ -218,36 +187,18 @@ def forgot_password(
         print(f"⚠️ No student found with email: {email}")
         return {"message": "If an account with that email exists, a password reset link has been sent."}
     
-    # Generate password reset token (valid for 1 hour)
-    reset_token = jwt.encode(
-        {
-            "sub": student.email,
-            "type": "password_reset",
-            "exp": datetime.now(timezone.utc) + timedelta(hours=1)
-        },
-        SECRET_KEY,
-        algorithm=ALGORITHM
-    )
-    
-    # Store token in database
-    student.password_reset_token = reset_token
+    # Generate password reset token (valid for 1 hour) - only its hash is stored
+    reset_token = generate_opaque_token()
+    student.password_reset_token = hash_token(reset_token)
     student.password_reset_token_expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    outbox.enqueue(
+        db, "password_reset", student.email,
+        secret={"reset_token": reset_token},
+        expires_at=student.password_reset_token_expires,
+        student_name=student.full_name,
+    )
     db.commit()
     
-    # Send password reset email
-    try:
-        email_sent = send_password_reset_email(
-            student_email=student.email,
-            student_name=student.full_name,
-            reset_token=reset_token
-        )
-        if email_sent:
-            print(f"✅ Password reset email sent to {student.email}")
-        else:
-            print(f"⚠️ Password reset email not sent")
-    except Exception as e:
-        print(f"❌ Password reset email failed: {e}")
-    
     return {"message": "If an account with that email exists, a password reset link has been sent."}
 
 
@@ -268,46 +219,30 @@ def reset_password(
     if len(new_password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
     
-    try:
-        # Decode token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        token_type = payload.get("type")
-        
-        # Must be password reset token
-        if token_type != "password_reset":
-            raise HTTPException(status_code=400, detail="Invalid token type")
-        
-        # Find student
-        student = db.query(models.Student).filter(models.Student.email == email).first()
-        if not student:
-            raise HTTPException(status_code=404, detail="Student not found")
-        
-        # Check if token matches the one in database
-        if student.password_reset_token != token:
-            raise HTTPException(status_code=400, detail="Invalid or expired token")
-        
-        # Token expired?
-        expires = payload.get("exp")
-        if datetime.now(timezone.utc) > datetime.fromtimestamp(expires, tz=timezone.utc):
-            raise HTTPException(status_code=400, detail="Password reset link has expired")
-        
-        # SUCCESS – Reset password
-        student.hashed_password = hash_password(new_password)
-        student.password_reset_token = None
-        student.password_reset_token_expires = None
-        db.commit()
-        
-        print(f"✅ Password reset successful for: {email}")
-        
-        return {"message": "Password has been reset successfully! You can now log in with your new password."}
-        
-    except JWTError:
-        raise HTTPException(status_code=400, detail="Invalid or corrupted token")
+    student = db.query(models.Student).filter(
+        _stored_token_matches(models.Student.password_reset_token, token)
+    ).first()
+    if not student:
+        raise HTTPException(status_code=400, detail="Invalid or expired token")
+    
+    if student.password_reset_token_expires and student.password_reset_token_expires < datetime.now(timezone.utc):
+        raise HTTPException(status_code=400, detail="Password reset link has expired")
+    
+    # SUCCESS – Reset password
+    student.hashed_password = hash_password(new_password)
+    student.password_reset_token = None
+    student.password_reset_token_expires = None
+    _revoke_refresh_tokens(db, models.RefreshToken.subject == student.email)
+    db.commit()
+    identity_cache.invalidate_user(student.email)
+    
+    print(f"✅ Password reset successful for: {student.email}")
+    
+    return {"message": "Password has been reset successfully! You can now log in with your new password."}
 
 
 # ==================== UNIFIED LOGIN ====================
-@router.post("/login", response_model=schemas.Token)
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(rate_limit.limit_by_ip("login:ip"))])
 def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(database.get_db),
@@ -315,6 +250,9 @@ def login(
     email = form_data.username
     password = form_data.password
 
+    # Checked before any bcrypt work so guessing one account can't burn CPU
+    rate_limit.check("login:account", email.lower())
+
     # === TRY ADMIN LOGIN FIRST ===
     admin = db.query(models.Admin).filter(models.Admin.email == email).first()
     if admin:
@@ -331,12 +269,15 @@ def login(
             data={"sub": admin.email, "role": "admin"},
             expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         )
+        refresh_token = _issue_refresh_token(db, admin.email, "admin")
+        db.commit()
         return {
             "access_token": access_token,
             "token_type": "bearer",
             "role": "admin",
             "email": admin.email,
-            "full_name": admin.full_name or "Admin"
+            "full_name": admin.full_name or "Admin",
+            "refresh_token": refresh_token,
         }
 
     # === TRY STUDENT LOGIN ===
@@ -361,6 +302,8 @@ def login(
             data={"sub": student.email, "role": "student", "student_id": student.id},
             expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         )
+        refresh_token = _issue_refresh_token(db, student.email, "student", student.id)
+        db.commit()
         return {
             "access_token": access_token,
             "token_type": "bearer",
@@ -368,12 +311,108 @@ def login(
             "email": student.email,
             "full_name": student.full_name,
             "student_id": student.id,
-            "email_verified": student.email_verified
+            "email_verified": student.email_verified,
+            "refresh_token": refresh_token,
         }
 
     raise HTTPException(status_code=401, detail="Incorrect email or password")
 
 
+def _within_reuse_grace(db: Session, token: models.RefreshToken, now: datetime) -> bool:
+    """Rotated within REFRESH_REUSE_GRACE_SECONDS and its family still has a live
+    token. Logout and password reset revoke the whole family, so a token they
+    revoked never qualifies."""
+    if token.revoked_at is None or now - token.revoked_at > timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+        return False
+    return db.query(models.RefreshToken.id).filter(
+        models.RefreshToken.family_id == token.family_id,
+        models.RefreshToken.revoked_at.is_(None),
+        models.RefreshToken.expires_at > now,
+    ).first() is not None
+
+
+# ==================== REFRESH ACCESS TOKEN ====================
+@router.post("/refresh", response_model=schemas.Token, dependencies=[Depends(rate_limit.limit_by_ip("refresh:ip"))])
+def refresh_access_token(
+    request: schemas.RefreshRequest,
+    db: Session = Depends(database.get_db),
+):
+    """Swap a refresh token for a new access token + rotated refresh token (no bcrypt)"""
+    token_hash = hash_token(request.refresh_token)
+    now = datetime.now(timezone.utc)
+
+    # Claim the token in one indexed UPDATE so two concurrent refreshes can't both win
+    claimed = db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_hash == token_hash,
+            models.RefreshToken.revoked_at.is_(None),
+            models.RefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now)
+        .returning(
+            models.RefreshToken.family_id,
+            models.RefreshToken.subject,
+            models.RefreshToken.role,
+            models.RefreshToken.student_id,
+        )
+    ).first()
+
+    if claimed is None:
+        stale = db.query(models.RefreshToken).filter(models.RefreshToken.token_hash == token_hash).first()
+        if stale and _within_reuse_grace(db, stale, now):
+            # Another tab rotated it moments ago: hand out a sibling in the same family
+            claimed = stale
+        elif stale and stale.revoked_at is not None:
+            # A token that was already rotated is being replayed - assume it leaked
+            # and kill every token descended from the same login
+            print(f"⚠️ Refresh token reuse detected for {stale.subject} - revoking session family")
+            _revoke_refresh_tokens(db, models.RefreshToken.family_id == stale.family_id)
+            db.commit()
+    if claimed is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Session expired. Please log in again.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    claims = {"sub": claimed.subject, "role": claimed.role}
+    if claimed.role == "student":
+        claims["student_id"] = claimed.student_id
+
+    refresh_token = _issue_refresh_token(
+        db, claimed.subject, claimed.role, claimed.student_id, family_id=claimed.family_id
+    )
+    db.commit()
+
+    return {
+        "access_token": create_access_token(
+            data=claims,
+            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        "token_type": "bearer",
+        "role": claimed.role,
+        "email": claimed.subject,
+        "refresh_token": refresh_token,
+    }
+
+
+# ==================== LOGOUT ====================
+@router.post("/logout")
+def logout(
+    request: schemas.RefreshRequest,
+    db: Session = Depends(database.get_db),
+):
+    """Revoke the refresh token family this token belongs to"""
+    token = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == hash_token(request.refresh_token)
+    ).first()
+    if token:
+        _revoke_refresh_tokens(db, models.RefreshToken.family_id == token.family_id)
+        db.commit()
+    return {"message": "Logged out"}
+
+
 # ── GET CURRENT USER ─────
 def get_current_user(
     token: str = Depends(oauth2_scheme),
@@ -384,15 +423,24 @@ def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        role: str = payload.get("role")
-        if not email or not role:
+    payload = identity_cache.get_claims(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise credentials_exception
-    except JWTError:
+        identity_cache.cache_claims(token, payload)
+
+    email: str = payload.get("sub")
+    role: str = payload.get("role")
+    if not email or not role:
         raise credentials_exception
 
+    # Hot path: reuse the row we loaded for this token a few seconds ago
+    user = identity_cache.get_identity(token, db)
+    if user is not None:
+        return user
+
     if role == "admin":
         user = db.query(models.Admin).filter(models.Admin.email == email).first()
     else:
@@ -401,6 +449,7 @@ def get_current_user(
     if not user:
         raise credentials_exception
 
+    identity_cache.cache_identity(token, user)
     return user
 
 
@@ -456,9 +505,11 @@ def update_profile(
             raise HTTPException(status_code=400, detail="Current password is incorrect")
         
         student.hashed_password = hash_password(data["new_password"])
+        _revoke_refresh_tokens(db, models.RefreshToken.subject == student.email)
     
     db.commit()
     db.refresh(student)
+    identity_cache.invalidate_user(student.email)
     
     return {
         "message": "Profile updated successfully",
@@ -486,6 +537,7 @@ def create_admin(
     admin = models.Admin(email=email, full_name=full_name, hashed_password=hashed)
     db.add(admin)
     db.commit()
+    identity_cache.invalidate_user(email)
     return {"message": f"✅ Admin created! Login with {email} / {password}"}
 
 
@@ -499,6 +551,7 @@ def fix_admin(db: Session = Depends(database.get_db)):
     admin.hashed_password = hash_password("admin123")
     admin.password = None
     db.commit()
+    identity_cache.invalidate_user(admin.email)
     
     return {"message": "✅ Admin fixed! Login with admin@tut.ac.za / admin123"}
 
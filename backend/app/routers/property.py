@@ -1,7 +1,9 @@
 # app/routers/property.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, selectinload
 from .. import models, database
 
 # ✅ IMPORTANT: Set redirect_slashes=False to prevent 307 redirects
@@ -10,10 +12,17 @@ router = APIRouter(prefix="/properties", tags=["Properties"], redirect_slashes=F
 
 # ✅ GET ALL PROPERTIES (Public - No auth required)
 @router.get("")  # This matches /properties exactly (no trailing slash)
-def get_properties(db: Session = Depends(database.get_db)):
-    """Get all properties (public endpoint)"""
+def get_properties(
+    sort: Optional[str] = Query(None, pattern="^demand$"),
+    db: Session = Depends(database.get_read_db),
+):
+    """Get all properties (public endpoint); ?sort=demand puts the most applied-to first"""
     try:
-        properties = db.query(models.Property).all()
+        # Images for every property in one extra query instead of one per property
+        query = db.query(models.Property).options(selectinload(models.Property.images))
+        if sort == "demand":
+            query = query.order_by(models.Property.application_count.desc(), models.Property.id)
+        properties = query.all()
         
         result = []
         for prop in properties:
@@ -29,6 +38,7 @@ def get_properties(db: Session = Depends(database.get_db)):
                 "total_flats": prop.total_flats,
                 "space_per_student": prop.space_per_student,
                 "campus_intake": prop.campus_intake,
+                "application_count": prop.application_count,
                 "image_urls": image_urls,
             })
         
@@ -42,7 +52,7 @@ def get_properties(db: Session = Depends(database.get_db)):
 
 # ✅ GET SINGLE PROPERTY (Public)
 @router.get("/{property_id}")
-def get_property(property_id: int, db: Session = Depends(database.get_db)):
+def get_property(property_id: int, db: Session = Depends(database.get_read_db)):
     """Get a single property by ID"""
     prop = db.query(models.Property).filter(models.Property.id == property_id).first()
     
@@ -61,5 +71,6 @@ def get_property(property_id: int, db: Session = Depends(database.get_db)):
         "total_flats": prop.total_flats,
         "space_per_student": prop.space_per_student,
         "campus_intake": prop.campus_intake,
+        "application_count": prop.application_count,
         "image_urls": image_urls,
     }
\ No newline at end of file
@@ -1,43 +1,19 @@
 # app/routers/students.py - UPDATED WITH EMAIL VERIFICATION CHECK
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from .. import models, database
 from .auth import get_current_user
-from ..core.email_utils import send_application_confirmation_email, send_document_reminder_email
-import boto3
-import os
+from ..core import identity_cache, rate_limit, outbox, storage
+from ..core.intake import current_intake_year
+import asyncio
 from uuid import uuid4
-from botocore.client import Config
 
 router = APIRouter(prefix="/applications", tags=["Students"])
 
 
-# Cloudflare R2 Configuration
-R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
-R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
-R2_ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
-R2_BUCKET = os.getenv("R2_BUCKET")
-R2_PUBLIC_URL = os.getenv("R2_PUBLIC_URL")
-
-if not all([R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_ACCOUNT_ID, R2_BUCKET, R2_PUBLIC_URL]):
-    raise RuntimeError("Missing R2 configuration. Please check environment variables.")
-
-R2_ENDPOINT = f"https://{R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
-
-s3_client = boto3.client(
-    "s3",
-    endpoint_url=R2_ENDPOINT,
-    aws_access_key_id=R2_ACCESS_KEY_ID,
-    aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-    region_name="auto",
-    config=Config(signature_version='s3v4')
-)
-
-def get_public_url(key: str) -> str:
-    """Generate public URL for R2 object"""
-    return f"{R2_PUBLIC_URL}/{key}"
-
-
 def get_current_student(user=Depends(get_current_user)):
     """Verify the current user is a student"""
     if not hasattr(user, "campus"):
@@ -47,11 +23,11 @@ def get_current_student(user=Depends(get_current_user)):
 
 @router.get("/my-applications")
 def get_my_applications(
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     student: models.Student = Depends(get_current_student)
 ):
     """Get all applications for the current student"""
-    apps = db.query(models.Application).filter(
+    apps = db.query(models.Application).options(joinedload(models.Application.property)).filter(
         models.Application.student_id == student.id
     ).all()
     
@@ -63,6 +39,7 @@ def get_my_applications(
             "property_title": app.property.title,
             "property_address": app.property.address,
             "status": app.status,
+            "intake_year": app.intake_year,
             "applied_at": app.applied_at.isoformat(),
             "notes": app.notes,
             "funding_approved": app.funding_approved,
@@ -97,10 +74,12 @@ def create_application(
     if not prop:
         raise HTTPException(404, "Property not found")
     
-    # Check if student already applied
+    # Check if student already applied for this intake
+    intake_year = current_intake_year()
     existing = db.query(models.Application).filter(
         models.Application.student_id == student.id,
-        models.Application.property_id == property_id
+        models.Application.property_id == property_id,
+        models.Application.intake_year == intake_year,
     ).first()
     if existing:
         raise HTTPException(400, "You have already applied to this property")
@@ -113,25 +92,24 @@ def create_application(
     app = models.Application(
         student_id=student.id,
         property_id=property_id,
+        intake_year=intake_year,
         notes=notes,
         status="pending"
     )
     db.add(app)
-    db.commit()
-    db.refresh(app)
-    
-    # Send confirmation email with document upload reminder
+    outbox.enqueue(
+        db, "application_confirmation", student.email,
+        student_name=student.full_name,
+        property_title=prop.title,
+        property_address=prop.address,
+    )
     try:
-        send_application_confirmation_email(
-            student_email=student.email,
-            student_name=student.full_name,
-            property_title=prop.title,
-            property_address=prop.address
-        )
-        print(f"✅ Confirmation email sent to {student.email}")
-    except Exception as e:
-        print(f"⚠️ Failed to send confirmation email: {str(e)}")
-        # Don't fail the application if email fails
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a second submit: uq_applications_student_property_intake
+        db.rollback()
+        raise HTTPException(400, "You have already applied to this property")
+    db.refresh(app)
     
     return {
         "message": "Application submitted successfully! Check your email for next steps.",
@@ -145,88 +123,60 @@ async def update_application(
     proof_of_registration: UploadFile = File(None),
     id_copy: UploadFile = File(None),
     funding_approved: bool = Form(False),
-    db: Session = Depends(database.get_db),
-    student: models.Student = Depends(get_current_student),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_student: models.Student = Depends(get_current_student),
 ):
     """Update application with documents and funding status"""
-    # Verify application belongs to student
-    app = db.query(models.Application).filter(
-        models.Application.id == app_id,
-        models.Application.student_id == student.id
-    ).first()
+    # Verify application belongs to student (the student row is updated below)
+    row = (await db.execute(
+        select(models.Application, models.Student)
+        .join(models.Student, models.Application.student_id == models.Student.id)
+        .where(
+            models.Application.id == app_id,
+            models.Application.student_id == current_student.id
+        )
+    )).first()
     
-    if not app:
+    if not row:
         raise HTTPException(404, "Application not found")
+    app, student = row
     
     if app.status != "pending":
         raise HTTPException(400, "Can only update pending applications")
 
-    documents_uploaded = False
-
-    # Upload proof of registration to R2
+    # column -> (R2 key, upload); both files are checked before anything is uploaded
+    uploads = {}
     if proof_of_registration:
         if proof_of_registration.content_type != "application/pdf":
             raise HTTPException(400, "Proof of registration must be a PDF file")
-        
-        # Delete old file if exists
-        if hasattr(student, 'proof_of_registration_url') and student.proof_of_registration_url:
-            try:
-                old_key = student.proof_of_registration_url.replace(f"{R2_PUBLIC_URL}/", "")
-                s3_client.delete_object(Bucket=R2_BUCKET, Key=old_key)
-            except Exception as e:
-                print(f"Failed to delete old proof of registration: {e}")
-        
-        key = f"documents/{student.id}/por_{uuid4().hex}.pdf"
-        s3_client.put_object(
-            Bucket=R2_BUCKET,
-            Key=key,
-            Body=await proof_of_registration.read(),
-            ContentType="application/pdf",
-            ACL="public-read"
-        )
-        student.proof_of_registration_url = get_public_url(key)
-        documents_uploaded = True
-
-    # Upload ID copy to R2
+        uploads["proof_of_registration_url"] = (f"documents/{student.id}/por_{uuid4().hex}.pdf", proof_of_registration)
     if id_copy:
         if id_copy.content_type != "application/pdf":
             raise HTTPException(400, "ID copy must be a PDF file")
-        
-        # Delete old file if exists
-        if hasattr(student, 'id_document_url') and student.id_document_url:
-            try:
-                old_key = student.id_document_url.replace(f"{R2_PUBLIC_URL}/", "")
-                s3_client.delete_object(Bucket=R2_BUCKET, Key=old_key)
-            except Exception as e:
-                print(f"Failed to delete old ID copy: {e}")
-        
-        key = f"documents/{student.id}/id_{uuid4().hex}.pdf"
-        s3_client.put_object(
-            Bucket=R2_BUCKET,
-            Key=key,
-            Body=await id_copy.read(),
-            ContentType="application/pdf",
-            ACL="public-read"
-        )
-        student.id_document_url = get_public_url(key)
-        documents_uploaded = True
+        uploads["id_document_url"] = (f"documents/{student.id}/id_{uuid4().hex}.pdf", id_copy)
+
+    # Upload to R2 off the event loop
+    urls = await asyncio.gather(*(
+        storage.upload(key, upload.file, "application/pdf") for key, upload in uploads.values()
+    ))
+    replaced = [getattr(student, column) for column in uploads if getattr(student, column)]
+    for column, url in zip(uploads, urls):
+        setattr(student, column, url)
 
     # Update funding status
     app.funding_approved = funding_approved
     
-    db.commit()
-    
-    # Send thank you email if documents were uploaded
-    if documents_uploaded:
-        try:
-            print(f"✅ Documents uploaded successfully for {student.email}")
-        except Exception as e:
-            print(f"⚠️ Error after document upload: {str(e)}")
+    await db.commit()
+    if uploads:
+        identity_cache.invalidate_user(student.email)
+        # Old files go only once the new URLs are committed
+        await asyncio.gather(*(storage.delete_url(url) for url in replaced))
+        print(f"✅ Documents uploaded successfully for {student.email}")
     
     return {
         "message": "Application updated successfully! Your documents will be reviewed shortly.",
-        "proof_of_registration": getattr(student, 'proof_of_registration_url', None),
-        "id_copy": getattr(student, 'id_document_url', None),
+        "proof_of_registration": student.proof_of_registration_url,
+        "id_copy": student.id_document_url,
         "funding_approved": app.funding_approved
     }
 
@@ -258,13 +208,14 @@ def delete_my_application(
     return {"message": "Application deleted successfully"}
 
 
-@router.post("/applications/{app_id}/send-reminder")
+@router.post("/applications/{app_id}/send-reminder", dependencies=[Depends(rate_limit.limit_by_ip("reminder:ip"))])
 def send_reminder(
     app_id: int,
     db: Session = Depends(database.get_db),
     student: models.Student = Depends(get_current_student)
 ):
     """Send reminder email to student to upload documents"""
+    rate_limit.check("reminder:account", student.id)
     app = db.query(models.Application).filter(
         models.Application.id == app_id,
         models.Application.student_id == student.id
@@ -277,12 +228,14 @@ def send_reminder(
         models.Property.id == app.property_id
     ).first()
     
-    try:
-        send_document_reminder_email(
-            student_email=student.email,
-            student_name=student.full_name,
-            property_title=property_obj.title
-        )
-        return {"message": "Reminder email sent successfully"}
-    except Exception as e:
-        raise HTTPException(500, f"Failed to send reminder: {str(e)}")
\ No newline at end of file
+    outbox.enqueue(
+        db, "document_reminder", student.email,
+        student_name=student.full_name,
+        property_title=property_obj.title,
+    )
+    # Starts the cooldown so the scheduled sweep doesn't remind them again straight away
+    db.query(models.Student).filter(models.Student.id == student.id).update(
+        {models.Student.document_reminder_sent_at: func.now()}, synchronize_session=False
+    )
+    db.commit()
+    return {"message": "Reminder email queued"}
\ No newline at end of file
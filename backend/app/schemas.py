@@ -3,6 +3,12 @@ from pydantic import BaseModel, EmailStr, validator
 from typing import Optional, List
 from datetime import datetime
 
+# Campuses a student can register for (StudentCreate.validate_campus)
+CAMPUSES = (
+    "Soshanguve North", "Soshanguve South", "Garankuwa Campus",
+    "Arts Campus", "Arcadia Campus", "Pretoria Campus",
+)
+
 # ==================== AUTH & TOKEN ====================
 class Token(BaseModel):
     access_token: str
@@ -10,6 +16,11 @@ class Token(BaseModel):
     role: str
     email: str
     full_name: Optional[str] = None
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 # ==================== STUDENT ====================
@@ -32,12 +43,8 @@ class StudentCreate(BaseModel):
 
     @validator("campus")
     def validate_campus(cls, v):
-        allowed = [
-            "Soshanguve North", "Soshanguve South", "Garankuwa Campus",
-            "Arts Campus", "Arcadia Campus", "Pretoria Campus"
-        ]
-        if v not in allowed:
-            raise ValueError(f"Campus must be one of: {', '.join(allowed)}")
+        if v not in CAMPUSES:
+            raise ValueError(f"Campus must be one of: {', '.join(CAMPUSES)}")
         return v
 
     @validator("password")
@@ -118,6 +125,26 @@ class ApplicationOut(BaseModel):
         from_attributes = True
 
 
+# ==================== BULK NOTIFICATIONS ====================
+class BulkNotificationCreate(BaseModel):
+    subject: str
+    message: str
+    property_id: Optional[int] = None   # only applicants of this property
+    status: Optional[str] = None        # only applications in this status
+
+    @validator("subject", "message")
+    def not_blank(cls, v):
+        if not v.strip():
+            raise ValueError("Must not be empty")
+        return v.strip()
+
+    @validator("status")
+    def validate_status(cls, v):
+        if v is not None and v not in ("pending", "approved", "rejected"):
+            raise ValueError("Status must be pending, approved or rejected")
+        return v
+
+
 # ==================== ADMIN (minimal) ====================
 class AdminOut(BaseModel):
     id: int
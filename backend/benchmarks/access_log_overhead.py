@@ -0,0 +1,143 @@
+# benchmarks/access_log_overhead.py - Per-request cost of request logging middleware
+#
+# Usage (from backend/):
+#   python -m benchmarks.access_log_overhead
+#   python -m benchmarks.access_log_overhead --requests 50000
+#
+# Calls a one-route FastAPI app directly over ASGI (no sockets) with:
+#   bare        no logging middleware
+#   old-debug   the previous BaseHTTPMiddleware that printed ~15 lines per request
+#   access-log  app.core.access_log.AccessLogMiddleware, every request logged
+#   sampled     the same with ACCESS_LOG_SAMPLE_RATE=0.05
+# Output goes to /dev/null so terminal speed doesn't skew the numbers; the
+# difference from "bare" is the middleware's overhead per request.
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core import access_log
+
+DEVNULL = open(os.devnull, "w")
+
+
+class OldDebugLoggingMiddleware(BaseHTTPMiddleware):
+    """The middleware this replaced, minus nothing"""
+
+    async def dispatch(self, request, call_next):
+        print(f"\n{'='*60}")
+        print(f"📨 INCOMING REQUEST")
+        print(f"{'='*60}")
+        print(f"Method: {request.method}")
+        print(f"URL: {request.url}")
+        print(f"Path: {request.url.path}")
+        print(f"Query Params: {dict(request.query_params)}")
+        print(f"Headers:")
+        for key, value in request.headers.items():
+            if key.lower() in ['authorization', 'origin', 'referer', 'x-forwarded-proto']:
+                print(f"  {key}: {value}")
+        print(f"{'='*60}\n")
+        response = await call_next(request)
+        print(f"\n{'='*60}")
+        print(f"📤 OUTGOING RESPONSE")
+        print(f"{'='*60}")
+        print(f"Status: {response.status_code}")
+        print(f"{'='*60}\n")
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        return response
+
+
+def make_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/students/properties/{property_id}")
+    async def get_property(property_id: int):
+        return {"id": property_id, "title": "Soshanguve Gardens", "available_flats": 4}
+
+    if middleware:
+        app.add_middleware(middleware)
+    return app
+
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "https",
+    "path": "/students/properties/42",
+    "raw_path": b"/students/properties/42",
+    "root_path": "",
+    "query_string": b"token=secret&page=2",
+    "headers": [
+        (b"host", b"api.campusstay.co.za"),
+        (b"authorization", b"Bearer eyJhbGciOiJIUzI1NiJ9.payload.signature"),
+        (b"origin", b"https://campusstay.co.za"),
+    ],
+    "client": ("127.0.0.1", 50000),
+    "server": ("127.0.0.1", 8000),
+}
+
+
+async def call(app):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(dict(SCOPE), receive, send)
+
+
+async def run(app, requests: int) -> list:
+    for _ in range(200):  # warm up
+        await call(app)
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await call(app)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request logging middleware overhead")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    access_log._stream.setStream(DEVNULL)
+    access_log.start()
+
+    variants = [
+        ("bare", make_app(), 1.0),
+        ("old-debug", make_app(OldDebugLoggingMiddleware), 1.0),
+        ("access-log", make_app(access_log.AccessLogMiddleware), 1.0),
+        ("sampled", make_app(access_log.AccessLogMiddleware), 0.05),
+    ]
+    results = {}
+    for name, app, sample_rate in variants:
+        access_log.ACCESS_LOG_SAMPLE_RATE = sample_rate
+        with contextlib.redirect_stdout(DEVNULL):
+            timings = asyncio.run(run(app, args.requests))
+        results[name] = timings
+
+    access_log.stop()
+    baseline = statistics.median(results["bare"])
+    print(f"{args.requests} requests per variant (µs per request)\n")
+    print(f"{'variant':<12}{'p50':>9}{'p99':>9}{'overhead p50':>15}")
+    for name, timings in results.items():
+        timings.sort()
+        p50 = statistics.median(timings)
+        p99 = timings[int(len(timings) * 0.99)]
+        print(f"{name:<12}{p50 * 1e6:>9.1f}{p99 * 1e6:>9.1f}{(p50 - baseline) * 1e6:>+15.1f}")
+    print(f"\naccess log: {access_log.stats()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bulk_email.py - Bulk notification delivery against the fake Resend
+#
+# Usage (from backend/):
+#   python -m benchmarks.bulk_email
+#   python -m benchmarks.bulk_email --recipients 5000 --rate 2 --reject 3 --single
+#
+# Renders --recipients announcement rows and pushes them through
+# app.core.outbox.deliver_bulk with a ResendTransport wired to
+# benchmarks.fake_resend in-process (no network, no database). The fake
+# enforces the same per-second limit as the transport's token bucket, so any
+# 429s mean the pacing is wrong. --reject plants bad addresses to show that one
+# rejected recipient doesn't fail the other 99 in its batch. --single repeats
+# the run one API call per email for comparison.
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+
+import httpx
+
+from app.core import outbox
+from app.core.email_transport import RESEND_BATCH_MAX, ResendTransport
+from benchmarks import fake_resend
+
+
+def make_rows(count: int, reject: int) -> list:
+    now = time.time()
+    rows = []
+    for i in range(count):
+        domain = "reject.test" if i < reject else "example.com"
+        rows.append({
+            "id": i + 1,
+            "kind": "announcement",
+            "to_email": f"student{i}@{domain}",
+            "payload": {
+                "student_name": f"Student {i}",
+                "subject": "Residence allocation results",
+                "message": "Results for the 2026 intake are now available on your dashboard.",
+            },
+            "attempts": 1,
+            "created_at": now,
+        })
+    return rows
+
+
+def make_transport(rate: float) -> ResendTransport:
+    fake_resend.FAKE_RESEND_RATE_PER_SECOND = rate
+    return ResendTransport(
+        base_url="http://fake-resend",
+        api_key="fake",
+        rate_per_second=rate,
+        http_transport=httpx.ASGITransport(app=fake_resend.app),
+    )
+
+
+def summarize(label: str, results: list, elapsed: float):
+    sent = sum(1 for _, _, error, _ in results if error is None)
+    dead = sum(1 for _, _, error, permanent in results if error is not None and permanent)
+    retry = len(results) - sent - dead
+    stats = fake_resend.stats()
+    print(f"{label:>7}: {len(results)} recipients in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.0f}/s) · {stats['requests']} API calls · "
+          f"sent={sent} dead={dead} retry={retry} · 429s={stats['rate_limited']}")
+
+
+async def run(mode: str, rows: list, rate: float):
+    fake_resend.reset()
+    transport = make_transport(rate)
+    started = time.perf_counter()
+    try:
+        if mode == "batch":
+            results = []
+            for start in range(0, len(rows), outbox.OUTBOX_BULK_BATCH_SIZE):
+                results += await outbox.deliver_bulk(rows[start:start + outbox.OUTBOX_BULK_BATCH_SIZE], transport)
+        else:
+            results = await asyncio.gather(*(outbox.deliver(row, transport) for row in rows))
+    finally:
+        await transport.aclose()
+    summarize(mode, results, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk email delivery against a local fake Resend")
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=2.0, help="provider requests per second")
+    parser.add_argument("--reject", type=int, default=2, help="recipients the provider will refuse")
+    parser.add_argument("--single", action="store_true", help="also run one request per email")
+    args = parser.parse_args()
+
+    rows = make_rows(args.recipients, args.reject)
+    calls = -(-args.recipients // RESEND_BATCH_MAX)
+    print(f"{args.recipients} recipients, {args.rate:g} req/s → at least {calls} batch calls "
+          f"(~{calls / args.rate:.1f}s) vs {args.recipients} single calls (~{args.recipients / args.rate:.0f}s)\n")
+
+    asyncio.run(run("batch", rows, args.rate))
+    if args.single:
+        asyncio.run(run("single", rows, args.rate))
+
+
+if __name__ == "__main__":
+    main()
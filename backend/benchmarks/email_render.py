@@ -0,0 +1,74 @@
+# benchmarks/email_render.py - Email template rendering and local sink throughput
+#
+# Usage (from backend/):
+#   python -m benchmarks.email_render
+#   python -m benchmarks.email_render --count 20000 --sink /tmp/email_sink
+#
+# Renders every email kind --count times through app.core.email_templates and
+# reports emails/second, with the announcement body cached across recipients
+# (as in a bulk send) and rendered fresh each time. With --sink the rendered
+# messages are also written through FileTransport to measure the offline sink
+# used for load tests (EMAIL_TRANSPORT=file).
+import argparse
+import asyncio
+import time
+
+from app.core import email_templates
+from app.core.email_transport import FileTransport
+
+PROPERTY = {"property_title": "Soshanguve Gardens Block C", "property_address": "12 Aubrey Matlala Rd, Soshanguve"}
+
+KIND_PARAMS = {
+    "verification": {"link": "https://campusstay.co.za/#/verify-email?token=abc123"},
+    "password_reset": {"link": "https://campusstay.co.za/#/reset-password?token=abc123"},
+    "application_confirmation": PROPERTY,
+    "application_approved": PROPERTY,
+    "application_rejected": PROPERTY,
+    "document_reminder": {"property_title": PROPERTY["property_title"]},
+    "announcement": {
+        "subject": "Residence allocation results",
+        "message": "Results for the 2026 intake are now available.\nLog in to see your outcome.",
+    },
+}
+
+
+def bench(label: str, count: int, fn):
+    started = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<34} {count / elapsed:>10,.0f}/s   {elapsed / count * 1e6:>7.1f} µs each")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Email template render throughput")
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--sink", help="also write messages to this directory via FileTransport")
+    args = parser.parse_args()
+
+    print(f"Rendering {args.count} emails per kind ({email_templates.stats()['templates']} templates precompiled)\n")
+    for kind, params in KIND_PARAMS.items():
+        bench(kind, args.count, lambda i: email_templates.render(kind, f"Student {i}", **params))
+
+    announcement = KIND_PARAMS["announcement"]
+    bench("announcement, body not cached", args.count,
+          lambda i: email_templates.render("announcement", f"Student {i}", subject=announcement["subject"],
+                                           message=f"{announcement['message']} #{i}"))
+    print(f"\n  {email_templates.stats()}")
+
+    if args.sink:
+        from app.core.email_transport import build_message
+        messages = [
+            build_message(f"student{i}@example.com", *email_templates.render("announcement", f"Student {i}", **announcement))
+            for i in range(args.count)
+        ]
+        transport = FileTransport(args.sink)
+        started = time.perf_counter()
+        for start in range(0, len(messages), 100):
+            asyncio.run(transport.send_batch(messages[start:start + 100]))
+        elapsed = time.perf_counter() - started
+        print(f"\n  FileTransport → {args.sink}: {len(messages) / elapsed:,.0f} emails/s")
+
+
+if __name__ == "__main__":
+    main()
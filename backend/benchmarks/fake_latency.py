@@ -0,0 +1,61 @@
+# benchmarks/fake_latency.py - Injected latency for the local stand-ins (fake_s3, fake_resend)
+#
+# A spec is "BASE_MS[~JITTER_MS][,SLOW_MS@PERCENT]":
+#   "0"            no delay (default)
+#   "40"           every call takes 40ms
+#   "40~20"        40ms give or take up to 20ms
+#   "40,1500@2"    40ms, but 2% of calls take 1500ms - a slow tail
+# Set it at start-up (FAKE_S3_LATENCY / FAKE_RESEND_LATENCY) or while running
+# with PUT /_fake/latency {"spec": "..."}; benchmarks/load_test.py does the latter.
+import asyncio
+import random
+import re
+
+from fastapi import APIRouter, Body, HTTPException
+
+SPEC = re.compile(r"^\s*(\d+(?:\.\d+)?)(?:~(\d+(?:\.\d+)?))?(?:,(\d+(?:\.\d+)?)@(\d+(?:\.\d+)?))?\s*$")
+
+
+class Latency:
+    def __init__(self, spec: str = "0"):
+        self.set(spec)
+
+    def set(self, spec: str):
+        match = SPEC.match(spec or "0")
+        if not match:
+            raise ValueError(f"Bad latency spec {spec!r}, expected BASE_MS[~JITTER_MS][,SLOW_MS@PERCENT]")
+        base, jitter, slow, percent = match.groups()
+        self.spec = spec or "0"
+        self.base_ms = float(base)
+        self.jitter_ms = float(jitter or 0)
+        self.slow_ms = float(slow or 0)
+        self.slow_fraction = float(percent or 0) / 100
+
+    def sample_ms(self) -> float:
+        if self.slow_fraction and random.random() < self.slow_fraction:
+            return self.slow_ms
+        return max(0.0, self.base_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+
+    async def delay(self):
+        ms = self.sample_ms()
+        if ms:
+            await asyncio.sleep(ms / 1000)
+
+
+def router(latency: Latency) -> APIRouter:
+    """GET/PUT /_fake/latency for a stand-in's Latency"""
+    api = APIRouter()
+
+    @api.get("/_fake/latency")
+    def get_latency():
+        return {"spec": latency.spec}
+
+    @api.put("/_fake/latency")
+    def put_latency(spec: str = Body(..., embed=True)):
+        try:
+            latency.set(spec)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return {"spec": latency.spec}
+
+    return api
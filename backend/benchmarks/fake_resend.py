@@ -0,0 +1,122 @@
+# benchmarks/fake_resend.py - Local stand-in for the Resend API
+#
+# Implements the two endpoints the outbox uses (POST /emails, POST /emails/batch)
+# closely enough to exercise batching, rate limiting and rejection handling
+# without sending real email. Run it next to the app (from backend/):
+#   uvicorn benchmarks.fake_resend:app --port 8025
+#   RESEND_API_URL=http://localhost:8025 RESEND_API_KEY=fake uvicorn app.main:app
+#
+# or mount it in-process with httpx.ASGITransport (see benchmarks/bulk_email.py).
+#
+#   FAKE_RESEND_RATE_PER_SECOND   requests allowed per second before 429s (default 2, 0 = unlimited)
+#   FAKE_RESEND_LATENCY           injected delay per call, see benchmarks/fake_latency.py (default 0)
+#   Recipients at @reject.test are refused with 422, like an invalid address.
+import os
+import threading
+import time
+from collections import deque
+from uuid import uuid4
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks import fake_latency
+
+FAKE_RESEND_RATE_PER_SECOND = float(os.getenv("FAKE_RESEND_RATE_PER_SECOND", "2"))
+BATCH_MAX = 100
+REJECT_DOMAIN = "@reject.test"
+
+latency = fake_latency.Latency(os.getenv("FAKE_RESEND_LATENCY", "0"))
+
+app = FastAPI(title="Fake Resend")
+app.include_router(fake_latency.router(latency))
+
+_lock = threading.Lock()
+_request_times = deque()
+sent = []  # every accepted message, in order
+counters = {"requests": 0, "batch_requests": 0, "rate_limited": 0, "rejected": 0}
+
+
+def _rate_limited() -> bool:
+    """Sliding one-second window, like Resend's per-team limit"""
+    if FAKE_RESEND_RATE_PER_SECOND <= 0:
+        return False
+    now = time.monotonic()
+    with _lock:
+        while _request_times and now - _request_times[0] >= 1.0:
+            _request_times.popleft()
+        if len(_request_times) >= FAKE_RESEND_RATE_PER_SECOND:
+            counters["rate_limited"] += 1
+            return True
+        _request_times.append(now)
+        return False
+
+
+def _validate(message: dict):
+    for field in ("from", "to", "subject"):
+        if not message.get(field):
+            return f"Missing `{field}` field."
+    if not (message.get("html") or message.get("text")):
+        return "Missing `html` or `text` field."
+    if any(to.endswith(REJECT_DOMAIN) for to in message["to"]):
+        return f"Invalid `to` field: {message['to']}"
+    return None
+
+
+def _error(status_code: int, name: str, message: str) -> JSONResponse:
+    return JSONResponse({"statusCode": status_code, "name": name, "message": message}, status_code=status_code)
+
+
+def _accept(message: dict) -> dict:
+    email_id = str(uuid4())
+    with _lock:
+        sent.append({"id": email_id, **message})
+    return {"id": email_id}
+
+
+@app.post("/emails")
+async def send_email(request: Request):
+    counters["requests"] += 1
+    await latency.delay()
+    if _rate_limited():
+        return _error(429, "rate_limit_exceeded", "Too many requests.")
+    message = await request.json()
+    problem = _validate(message)
+    if problem:
+        counters["rejected"] += 1
+        return _error(422, "validation_error", problem)
+    return _accept(message)
+
+
+@app.post("/emails/batch")
+async def send_batch(request: Request):
+    counters["requests"] += 1
+    counters["batch_requests"] += 1
+    await latency.delay()
+    if _rate_limited():
+        return _error(429, "rate_limit_exceeded", "Too many requests.")
+    messages = await request.json()
+    if not isinstance(messages, list) or not 1 <= len(messages) <= BATCH_MAX:
+        return _error(422, "validation_error", f"Batch must contain 1-{BATCH_MAX} emails.")
+    # All-or-nothing, like the real endpoint
+    for index, message in enumerate(messages):
+        problem = _validate(message)
+        if problem:
+            counters["rejected"] += 1
+            return _error(422, "validation_error", f"emails[{index}]: {problem}")
+    return {"data": [_accept(message) for message in messages]}
+
+
+@app.get("/_fake/stats")
+def stats():
+    return {**counters, "sent": len(sent), "latency": latency.spec}
+
+
+@app.delete("/_fake/sent")
+def reset():
+    with _lock:
+        sent.clear()
+        _request_times.clear()
+        for key in counters:
+            counters[key] = 0
+    return {"ok": True}
@@ -0,0 +1,88 @@
+# benchmarks/fake_s3.py - Local S3-compatible stand-in for R2
+#
+# Handles the object calls the app makes on request paths (PutObject,
+# HeadObject, DeleteObject) with path-style addressing, which is what boto3
+# uses against a custom endpoint. Signatures are not checked and bodies are
+# counted, not kept: the app never reads objects back (clients fetch them
+# from R2_PUBLIC_URL). Run it next to the app (from backend/):
+#   uvicorn benchmarks.fake_s3:app --port 9000
+#   R2_ENDPOINT=http://localhost:9000 uvicorn app.main:app
+#
+#   FAKE_S3_LATENCY   injected delay per call, see benchmarks/fake_latency.py (default 0)
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request, Response
+
+from benchmarks import fake_latency
+
+latency = fake_latency.Latency(os.getenv("FAKE_S3_LATENCY", "0"))
+
+app = FastAPI(title="Fake S3")
+app.include_router(fake_latency.router(latency))
+
+_lock = threading.Lock()
+objects = {}  # (bucket, key) -> {"size", "etag", "content_type", "last_modified"}
+counters = {"put": 0, "head": 0, "delete": 0, "bytes_in": 0}
+
+
+@app.get("/_fake/stats")
+def stats():
+    return {**counters, "objects": len(objects), "latency": latency.spec}
+
+
+@app.delete("/_fake/objects")
+def reset():
+    with _lock:
+        objects.clear()
+        for key in counters:
+            counters[key] = 0
+    return {"ok": True}
+
+
+@app.put("/{bucket}/{key:path}")
+async def put_object(bucket: str, key: str, request: Request):
+    await latency.delay()
+    digest, size = hashlib.md5(), 0
+    async for chunk in request.stream():
+        digest.update(chunk)
+        size += len(chunk)
+    etag = f'"{digest.hexdigest()}"'
+    with _lock:
+        objects[(bucket, key)] = {
+            "size": size,
+            "etag": etag,
+            "content_type": request.headers.get("content-type", "binary/octet-stream"),
+            "last_modified": datetime.now(timezone.utc),
+        }
+        counters["put"] += 1
+        counters["bytes_in"] += size
+    return Response(status_code=200, headers={"ETag": etag})
+
+
+@app.head("/{bucket}/{key:path}")
+async def head_object(bucket: str, key: str):
+    await latency.delay()
+    counters["head"] += 1
+    meta = objects.get((bucket, key))
+    if not meta:
+        return Response(status_code=404)
+    return Response(status_code=200, headers={
+        "ETag": meta["etag"],
+        "Content-Length": str(meta["size"]),
+        "Content-Type": meta["content_type"],
+        "Last-Modified": meta["last_modified"].strftime("%a, %d %b %Y %H:%M:%S GMT"),
+    })
+
+
+@app.delete("/{bucket}/{key:path}")
+async def delete_object(bucket: str, key: str):
+    # S3 answers 204 whether or not the key existed
+    await latency.delay()
+    with _lock:
+        objects.pop((bucket, key), None)
+        counters["delete"] += 1
+    return Response(status_code=204)
+
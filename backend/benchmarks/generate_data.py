@@ -0,0 +1,320 @@
+# benchmarks/generate_data.py - Bulk-load synthetic students, properties and applications
+#
+# Usage (from backend/, against a development database at `alembic upgrade head`):
+#   python -m benchmarks.generate_data --scale small       # 2k students, 100 properties
+#   python -m benchmarks.generate_data --scale production  # 100k students, 2k properties, 300k applications
+#   python -m benchmarks.generate_data --students 5000 --applications 20000 --seed 7
+#   python -m benchmarks.generate_data --scale production --schema bench   # into a scratch schema
+#
+# Rows are generated lazily and streamed through COPY, so production scale
+# loads in well under a minute and memory stays flat. Distributions are meant
+# to look like TUT, not like uniform noise:
+#   * students spread over schemas.CAMPUSES with the big Soshanguve/Pretoria skew
+#   * property popularity is Zipf-like within each campus, so the top listings
+#     get 10-20x the median (at production scale: ~2k vs ~100 applications)
+#   * a student applies to 1-8 properties (about --applications / --students
+#     on average), mostly near their own campus, all in one intake
+#   * current-intake applications are mostly pending; the previous intake's are decided
+#   * most students verified their email; about half uploaded both documents
+# IDs continue from the tables' current maxima and the sequences are moved past
+# them, so this can run on top of existing data. It finishes by recomputing the
+# demand counters and running ANALYZE.
+#
+# Every student and admin gets the password in PASSWORD (hashed once), so
+# login and load tests can sign in as anyone: students are
+# bench.student<N>@tut4life.ac.za, admins bench.admin<N>@tut.ac.za.
+#
+# Other benchmarks load data with dataset(): it creates a scratch schema, loads
+# into it, yields the summary and drops the schema afterwards, like a fixture:
+#   with generate_data.dataset(Volumes.scale("small"), seed=1) as data:
+#       ... point the app at data["schema"] (search_path) and measure ...
+import argparse
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+
+from sqlalchemy import text
+
+from app import database, schemas
+from app.core import intake
+from app.jobs.demand_counters import RECONCILE_SQL
+from app.utils import hash_password
+
+PASSWORD = "benchmark-password"
+TABLES = ("admins", "properties", "property_images", "students", "applications")
+
+# Share of students per campus, same order as schemas.CAMPUSES
+CAMPUS_WEIGHTS = (0.22, 0.28, 0.12, 0.08, 0.10, 0.20)
+HOME_CAMPUS_SHARE = 0.8       # applications to properties serving the student's own campus
+ZIPF_EXPONENT = 0.6           # property popularity within a campus
+CURRENT_INTAKE_SHARE = 0.7    # students applying for the current intake; the rest applied last year
+CURRENT_STATUS_WEIGHTS = {"pending": 0.6, "approved": 0.25, "rejected": 0.15}
+PREVIOUS_STATUS_WEIGHTS = {"approved": 0.55, "rejected": 0.45}
+STATUS_CODES = {"pending": 0, "approved": 1, "rejected": 2}
+
+FIRST_NAMES = ["Thabo", "Lerato", "Sipho", "Naledi", "Kagiso", "Palesa", "Tshepo", "Refilwe", "Mpho", "Zanele",
+               "Lwazi", "Boitumelo", "Karabo", "Nomvula", "Tumelo", "Ayanda", "Katlego", "Dineo", "Bongani", "Lindiwe"]
+LAST_NAMES = ["Mokoena", "Nkosi", "Dlamini", "Mahlangu", "Molefe", "Sithole", "Khumalo", "Ndlovu", "Mabena",
+              "Maluleke", "Baloyi", "Masilela", "Mathebula", "Shabangu", "Tshabalala", "Mthembu", "Zulu", "Ngobeni"]
+STREETS = ["Church St", "Steve Biko Rd", "Nana Sita St", "Madiba St", "Francis Baard St", "Botanical Rd",
+           "Aubrey Matlakala St", "Ruth First St", "Lilian Ngoyi St", "Thabo Sehume St"]
+
+
+@dataclass
+class Volumes:
+    students: int = 2000
+    admins: int = 5
+    properties: int = 100
+    images: int = 500
+    applications: int = 6000
+
+    @classmethod
+    def scale(cls, name: str) -> "Volumes":
+        return {
+            "small": cls(),
+            "medium": cls(students=20_000, admins=20, properties=500, images=2_500, applications=60_000),
+            "production": cls(students=100_000, admins=50, properties=2_000, images=10_000, applications=300_000),
+        }[name]
+
+
+def _next_id(conn, table: str) -> int:
+    return conn.execute(text(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")).scalar()
+
+
+def _copy(conn, table: str, columns: list, rows) -> int:
+    """Stream rows into table with COPY FROM STDIN; returns the row count"""
+    count = 0
+    cursor = conn.connection.dbapi_connection.cursor()
+    with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+            count += 1
+    return count
+
+
+def _zipf_cum_weights(n: int, rng: random.Random) -> list:
+    ranks = list(range(1, n + 1))
+    rng.shuffle(ranks)
+    total, cumulative = 0.0, []
+    for rank in ranks:
+        total += 1 / rank ** ZIPF_EXPONENT
+        cumulative.append(total)
+    return cumulative
+
+
+def _applied_at(intake_year: int, rng: random.Random) -> datetime:
+    """Somewhere in the application window for that intake (rollover month to the next May)"""
+    opens = datetime(intake_year - 1, intake.INTAKE_ROLLOVER_MONTH, 1, tzinfo=timezone.utc)
+    latest = min(datetime.now(timezone.utc), datetime(intake_year, 5, 31, tzinfo=timezone.utc))
+    span = max(60.0, (latest - opens).total_seconds())
+    return opens + timedelta(seconds=rng.random() * span)
+
+
+def generate(conn, volumes: Volumes, seed: int = 0) -> dict:
+    """Load `volumes` rows into the database behind conn (a SQLAlchemy Connection); returns a summary"""
+    rng = random.Random(seed)
+    hashed = hash_password(PASSWORD)
+    now = datetime.now(timezone.utc)
+    current_intake = intake.current_intake_year()
+    timings = {}
+
+    def timed(table, columns, rows):
+        started = time.perf_counter()
+        count = _copy(conn, table, columns, rows)
+        timings[table] = round(time.perf_counter() - started, 2)
+        print(f"   {table}: {count} rows in {timings[table]}s")
+        return count
+
+    # Admins
+    first_admin = _next_id(conn, "admins")
+    admin_ids = range(first_admin, first_admin + volumes.admins)
+    timed("admins", ["id", "full_name", "email", "hashed_password", "is_active"], (
+        (i, f"Bench Admin {i}", f"bench.admin{i}@tut.ac.za", hashed, True) for i in admin_ids
+    ))
+
+    # Properties: each serves one campus, weighted like the students
+    first_property = _next_id(conn, "properties")
+    property_campus = rng.choices(range(len(schemas.CAMPUSES)), CAMPUS_WEIGHTS, k=volumes.properties)
+
+    def property_rows():
+        for offset, campus in enumerate(property_campus):
+            total = rng.choice((4, 6, 8, 10, 12, 16, 20, 30, 40))
+            bachelor = rng.random() < 0.3
+            yield (
+                first_property + offset,
+                f"{rng.choice(LAST_NAMES)} {'Bachelor Flats' if bachelor else 'Student Residence'} {offset}",
+                f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {schemas.CAMPUSES[campus]}",
+                bachelor,
+                rng.randint(0, total),
+                total,
+                rng.choice((9.0, 12.0, 15.0, 18.0, 24.0)),
+                schemas.CAMPUSES[campus],
+                rng.choice(admin_ids),
+                now - timedelta(days=rng.randint(0, 900)),
+            )
+
+    timed("properties", ["id", "title", "address", "is_bachelor", "available_flats", "total_flats",
+                         "space_per_student", "campus_intake", "admin_id", "created_at"], property_rows())
+
+    # Images: scattered at random over the properties
+    first_image = _next_id(conn, "property_images")
+    public_url = os.getenv("R2_PUBLIC_URL", "https://cdn.example.com")
+    image_owners = rng.choices(range(first_property, first_property + volumes.properties), k=volumes.images)
+    timed("property_images", ["id", "property_id", "image_url", "created_at"], (
+        (first_image + i, owner, f"{public_url}/properties/bench-{first_image + i}.jpg", now)
+        for i, owner in enumerate(image_owners)
+    ))
+
+    # Students
+    first_student = _next_id(conn, "students")
+    first_number = 200_000_000 + first_student
+    student_campus = rng.choices(range(len(schemas.CAMPUSES)), CAMPUS_WEIGHTS, k=volumes.students)
+
+    def student_rows():
+        for offset, campus in enumerate(student_campus):
+            sid = first_student + offset
+            has_documents = rng.random() < 0.5
+            yield (
+                sid,
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                f"bench.student{sid}@tut4life.ac.za",
+                f"0{rng.choice((6, 7, 8))}{rng.randint(10_000_000, 99_999_999)}",
+                str(first_number + offset),
+                schemas.CAMPUSES[campus],
+                hashed,
+                rng.random() < 0.85,
+                f"{public_url}/documents/bench-id-{sid}.pdf" if has_documents else None,
+                f"{public_url}/documents/bench-por-{sid}.pdf" if has_documents or rng.random() < 0.3 else None,
+                now - timedelta(days=rng.randint(0, 700)),
+            )
+
+    timed("students", ["id", "full_name", "email", "phone_number", "student_number", "campus", "hashed_password",
+                       "email_verified", "id_document_url", "proof_of_registration_url", "created_at"],
+          student_rows())
+
+    # Applications: how many per student first, so the total is exact
+    per_student = [0] * volumes.students
+    cap = min(8, volumes.properties)
+    placed = 0
+    while placed < volumes.applications and volumes.students and cap:
+        index = rng.randrange(volumes.students)
+        if per_student[index] < cap:
+            per_student[index] += 1
+            placed += 1
+
+    by_campus = [[] for _ in schemas.CAMPUSES]
+    for offset, campus in enumerate(property_campus):
+        by_campus[campus].append(first_property + offset)
+    campus_weights = [_zipf_cum_weights(len(ids), rng) if ids else None for ids in by_campus]
+    all_properties = list(range(first_property, first_property + volumes.properties))
+    all_weights = _zipf_cum_weights(len(all_properties), rng)
+    first_application = _next_id(conn, "applications")
+
+    def application_rows():
+        next_id = first_application
+        for offset, count in enumerate(per_student):
+            if not count:
+                continue
+            home = student_campus[offset]
+            current = rng.random() < CURRENT_INTAKE_SHARE
+            intake_year = current_intake if current else current_intake - 1
+            statuses = CURRENT_STATUS_WEIGHTS if current else PREVIOUS_STATUS_WEIGHTS
+            chosen = set()
+            while len(chosen) < count:
+                if by_campus[home] and rng.random() < HOME_CAMPUS_SHARE:
+                    pick = rng.choices(by_campus[home], cum_weights=campus_weights[home])[0]
+                else:
+                    pick = rng.choices(all_properties, cum_weights=all_weights)[0]
+                chosen.add(pick)
+            for property_id in chosen:
+                status = rng.choices(list(statuses), list(statuses.values()))[0]
+                yield (
+                    next_id, first_student + offset, property_id, intake_year, STATUS_CODES[status],
+                    _applied_at(intake_year, rng), None, rng.random() < 0.4,
+                )
+                next_id += 1
+
+    timed("applications", ["id", "student_id", "property_id", "intake_year", "status", "applied_at",
+                           "notes", "funding_approved"], application_rows())
+
+    # Sequences past the explicit ids, counters, planner statistics
+    for table in TABLES:
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                          f"(SELECT coalesce(max(id), 1) FROM {table}))"))
+    conn.execute(RECONCILE_SQL, {"intake_year": current_intake})
+
+    return {
+        "volumes": asdict(volumes),
+        "seed": seed,
+        "intake_year": current_intake,
+        "admin_ids": [first_admin, first_admin + volumes.admins - 1],
+        "student_ids": [first_student, first_student + volumes.students - 1],
+        "property_ids": [first_property, first_property + volumes.properties - 1],
+        "password": PASSWORD,
+        "copy_seconds": timings,
+    }
+
+
+def analyze(engine, schema: str = "public"):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in TABLES:
+            conn.execute(text(f"ANALYZE {schema}.{table}"))
+
+
+def load(engine, volumes: Volumes, seed: int = 0, schema: str = None) -> dict:
+    """generate() in one transaction (into `schema`, created from the public tables, if given), then ANALYZE"""
+    with engine.begin() as conn:
+        if schema:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+            for table in TABLES:
+                conn.execute(text(f"CREATE TABLE IF NOT EXISTS {schema}.{table} "
+                                  f"(LIKE public.{table} INCLUDING ALL)"))
+            conn.execute(text(f"SET LOCAL search_path TO {schema}, public"))
+        summary = generate(conn, volumes, seed)
+    analyze(engine, schema or "public")
+    summary["schema"] = schema
+    return summary
+
+
+@contextmanager
+def dataset(volumes: Volumes, seed: int = 0, schema: str = "bench_data", engine=None):
+    """Fixture-style: load into a scratch schema, yield the summary, drop the schema"""
+    engine = engine or database.engine
+    try:
+        yield load(engine, volumes, seed, schema)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic CampusStay data with COPY")
+    parser.add_argument("--scale", choices=["small", "medium", "production"], default="small")
+    for field in ("students", "admins", "properties", "images", "applications"):
+        parser.add_argument(f"--{field}", type=int, help=f"override the scale's {field}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--schema", help="load into this scratch schema instead of public")
+    args = parser.parse_args()
+
+    volumes = Volumes.scale(args.scale)
+    for field in ("students", "admins", "properties", "images", "applications"):
+        if getattr(args, field) is not None:
+            setattr(volumes, field, getattr(args, field))
+    if volumes.applications > volumes.students * min(8, volumes.properties):
+        sys.exit("--applications is more than 8 per student (or per property available)")
+
+    print(f"📦 Loading {asdict(volumes)} (seed {args.seed}) into {database.engine.url.host}/"
+          f"{database.engine.url.database}{'.' + args.schema if args.schema else ''}")
+    started = time.perf_counter()
+    summary = load(database.engine, volumes, args.seed, args.schema)
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s: {summary}")
+
+
+if __name__ == "__main__":
+    main()
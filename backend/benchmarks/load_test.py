@@ -0,0 +1,301 @@
+# benchmarks/load_test.py - Intake-rush load test against a running app
+#
+# Setup (from backend/, one terminal each):
+#   uvicorn benchmarks.fake_s3:app --port 9000
+#   uvicorn benchmarks.fake_resend:app --port 8025
+#   python -m benchmarks.generate_data --scale medium
+#   R2_ENDPOINT=http://localhost:9000 RESEND_API_URL=http://localhost:8025 RESEND_API_KEY=fake \
+#     RATE_LIMIT_ENABLED=false gunicorn app.main:app -c gunicorn.conf.py
+#
+# Usage:
+#   python -m benchmarks.load_test
+#   python -m benchmarks.load_test --users 300 --ramp 5 --duration 120
+#   python -m benchmarks.load_test --mix register=1 --users 500 --ramp 2     # registration burst
+#   python -m benchmarks.load_test --s3-latency 40,1500@2 --resend-latency 300~100
+#
+# --users virtual students start over --ramp seconds and loop until --duration
+# is up, each picking a scenario by --mix weight:
+#   register  POST /auth/register with a new identity (queues a verification email)
+#   browse    the catalog, then one to three property pages
+#   apply     log in once, then submit an application to a property
+#   upload    log in once, find or create a pending application, PUT both PDFs
+# Logins use the verified bench.student* accounts from generate_data (shared
+# PASSWORD), read from the app's database. Latency specs are pushed to the
+# stand-ins before the run (see benchmarks/fake_latency.py) and their counters
+# are printed after it. Each request's latency is taken from when it was sent,
+# so it is the closed-loop view: the report's req/s drops when the app is slow.
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+from sqlalchemy import text
+
+from app import database, schemas
+from benchmarks.generate_data import PASSWORD
+
+SCENARIOS = ("register", "browse", "apply", "upload")
+DEFAULT_MIX = "register=2,browse=5,apply=2,upload=1"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def parse_mix(raw: str) -> dict:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def load_accounts(count: int) -> list:
+    with database.engine.connect() as conn:
+        return list(conn.execute(text(
+            "SELECT email FROM students WHERE email_verified AND email LIKE 'bench.student%' "
+            "ORDER BY random() LIMIT :count"
+        ), {"count": count}).scalars())
+
+
+class Recorder:
+    """Latencies and status codes per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, endpoint: str, status: int, seconds: float):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def report(self, elapsed: float) -> list:
+        rows = []
+        for endpoint in sorted(self.latencies):
+            values, statuses = self.latencies[endpoint], self.statuses[endpoint]
+            rows.append({
+                "endpoint": endpoint,
+                "requests": len(values),
+                "per_second": len(values) / elapsed,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": max(values) * 1000,
+                "statuses": dict(sorted(statuses.items())),
+            })
+        return rows
+
+
+class Student:
+    """One virtual user: a login for the authenticated scenarios and a request helper"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, email: str, run_id: int):
+        self.client = client
+        self.recorder = recorder
+        self.email = email
+        self.run_id = run_id
+        self.token = None
+
+    async def request(self, method: str, path: str, endpoint: str = None, **kwargs):
+        if self.token:
+            kwargs.setdefault("headers", {})["Authorization"] = f"Bearer {self.token}"
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            # Timeouts and dropped connections show up as ERR in the report
+            self.recorder.add(f"{method} {endpoint or path}", 0, time.perf_counter() - started)
+            return None
+        self.recorder.add(f"{method} {endpoint or path}", response.status_code, time.perf_counter() - started)
+        return response
+
+    async def login(self) -> bool:
+        if self.token:
+            return True
+        if not self.email:
+            return False
+        response = await self.request("POST", "/auth/login", data={"username": self.email, "password": PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.token = response.json()["access_token"]
+        return self.token is not None
+
+
+class Rush:
+    def __init__(self, property_ids: list, upload_kb: int):
+        self.property_ids = property_ids
+        self.document = b"%PDF-1.4\n" + b"0" * max(0, upload_kb * 1024 - 9)
+        self.registered = 0
+        # 9 digits, above generate_data's 200_000_000 + id range
+        self.student_number_base = random.randint(300, 899) * 1_000_000
+
+    async def register(self, student: Student):
+        self.registered += 1
+        n = self.registered
+        await student.request("POST", "/auth/register", json={
+            "full_name": f"Rush Student {n}",
+            "email": f"bench.rush{student.run_id}-{n}@tut4life.ac.za",
+            "phone_number": f"07{random.randint(10_000_000, 99_999_999)}",
+            "student_number": str(self.student_number_base + n),
+            "campus": random.choice(schemas.CAMPUSES),
+            "password": PASSWORD,
+        })
+
+    async def browse(self, student: Student):
+        params = {"sort": "demand"} if random.random() < 0.5 else None
+        endpoint = "/students/properties?sort=demand" if params else "/students/properties"
+        await student.request("GET", "/students/properties", endpoint, params=params)
+        for property_id in random.sample(self.property_ids, min(len(self.property_ids), random.randint(1, 3))):
+            await student.request("GET", f"/students/properties/{property_id}", "/students/properties/{id}")
+
+    async def apply(self, student: Student):
+        if not await student.login():
+            return None
+        response = await student.request("POST", "/students/applications/my-applications",
+                                         json={"property_id": random.choice(self.property_ids)})
+        if response is not None and response.status_code == 200:
+            return response.json()["application_id"]
+        return None
+
+    async def upload(self, student: Student):
+        if not await student.login():
+            return
+        response = await student.request("GET", "/students/applications/my-applications")
+        if response is None or response.status_code != 200:
+            return
+        pending = [app["id"] for app in response.json() if app["status"] == "pending"]
+        app_id = random.choice(pending) if pending else await self.apply(student)
+        if app_id is None:
+            return
+        await student.request(
+            "PUT", f"/students/applications/my-applications/{app_id}", "/students/applications/my-applications/{id}",
+            files={
+                "proof_of_registration": ("registration.pdf", self.document, "application/pdf"),
+                "id_copy": ("id.pdf", self.document, "application/pdf"),
+            },
+            data={"funding_approved": "true"},
+        )
+
+
+async def virtual_user(rush: Rush, student: Student, mix: dict, start_after: float, deadline: float, think: float):
+    await asyncio.sleep(start_after)
+    scenarios, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await getattr(rush, random.choices(scenarios, weights)[0])(student)
+        if think:
+            await asyncio.sleep(random.uniform(0, 2 * think))
+
+
+async def configure_fake(url: str, spec: str, reset_path: str) -> bool:
+    if not url:
+        return False
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+            await client.delete(reset_path)
+            if spec is not None:
+                (await client.put("/_fake/latency", json={"spec": spec})).raise_for_status()
+        return True
+    except httpx.HTTPError as e:
+        print(f"⚠️ Stand-in at {url} not reachable or refused the latency spec: {e}")
+        return False
+
+
+async def fake_stats(url: str) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+        return (await client.get("/_fake/stats")).json()
+
+
+def print_report(rows: list, elapsed: float):
+    print(f"\n{'endpoint':<52} {'reqs':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  statuses")
+    for row in rows:
+        statuses = " ".join(f"{code or 'ERR'}:{count}" for code, count in row["statuses"].items())
+        print(f"{row['endpoint']:<52} {row['requests']:>7} {row['per_second']:>8.1f} "
+              f"{row['p50_ms']:>6.0f}ms {row['p95_ms']:>6.0f}ms {row['p99_ms']:>6.0f}ms {row['max_ms']:>6.0f}ms  {statuses}")
+    total = sum(row["requests"] for row in rows)
+    print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:.1f}/s)")
+
+
+async def run(args) -> dict:
+    mix = args.mix
+    needs_login = bool({"apply", "upload"} & set(mix))
+    accounts = load_accounts(args.users) if needs_login else []
+    if needs_login and not accounts:
+        raise SystemExit("No verified bench.student* accounts - run python -m benchmarks.generate_data first")
+    if needs_login and len(accounts) < args.users:
+        print(f"⚠️ Only {len(accounts)} accounts for {args.users} users; the rest only register and browse")
+
+    faked = {
+        "s3": await configure_fake(args.s3_url, args.s3_latency, "/_fake/objects"),
+        "resend": await configure_fake(args.resend_url, args.resend_latency, "/_fake/sent"),
+    }
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        catalog = await client.get("/students/properties")
+        catalog.raise_for_status()
+        property_ids = [prop["id"] for prop in catalog.json()]
+        if not property_ids:
+            raise SystemExit("The catalog is empty - run python -m benchmarks.generate_data first")
+
+        recorder = Recorder()
+        rush = Rush(property_ids, args.upload_kb)
+        run_id = int(time.time())
+        print(f"🚀 {args.users} users over {args.ramp:g}s for {args.duration:g}s against {args.base_url} "
+              f"· mix {mix} · {len(property_ids)} properties · {len(accounts)} accounts")
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        users = []
+        for i in range(args.users):
+            student = Student(client, recorder, accounts[i] if i < len(accounts) else None, run_id)
+            user_mix = mix if student.email else {k: w for k, w in mix.items() if k in ("register", "browse")}
+            if not user_mix:
+                continue
+            start_after = args.ramp * i / args.users
+            users.append(virtual_user(rush, student, user_mix, start_after, deadline, args.think))
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - started
+
+    rows = recorder.report(elapsed)
+    print_report(rows, elapsed)
+    report = {"users": args.users, "duration": elapsed, "mix": mix, "endpoints": rows}
+    for name, url in (("s3", args.s3_url), ("resend", args.resend_url)):
+        if faked[name]:
+            report[name] = await fake_stats(url)
+            print(f"{name}: {report[name]}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intake-rush load test against a running app")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--ramp", type=float, default=10, help="seconds over which users start")
+    parser.add_argument("--duration", type=float, default=60, help="seconds, ramp included")
+    parser.add_argument("--think", type=float, default=0.5, help="mean pause between a user's scenarios (s)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"default {DEFAULT_MIX}")
+    parser.add_argument("--upload-kb", type=int, default=300, help="size of each uploaded PDF")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--s3-url", default="http://localhost:9000", help="fake_s3 control API, '' to skip")
+    parser.add_argument("--resend-url", default="http://localhost:8025", help="fake_resend control API, '' to skip")
+    parser.add_argument("--s3-latency", help="latency spec for fake_s3, e.g. 40,1500@2")
+    parser.add_argument("--resend-latency", help="latency spec for fake_resend, e.g. 300~100")
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/login_throughput.py - Login (bcrypt verify) throughput at different cost factors
+#
+# Usage (from backend/):
+#   python -m benchmarks.login_throughput
+#   python -m benchmarks.login_throughput --costs 10 12 --clients 120 --threads 40 --duration 15
+#
+# Simulates a login storm: --clients callers hammer a request threadpool the size
+# of AnyIO's default (40). Each login does one bcrypt verify, either inline in the
+# request thread (old behaviour) or through app.core.security.hashing_pool.
+# A probe measures how long a trivial request waits for a free thread, which is
+# what every other endpoint experiences during the storm.
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+
+from app.core import security
+
+PASSWORD = "correct horse battery staple"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_storm(mode: str, hashed: str, clients: int, threads: int, duration: float) -> dict:
+    request_pool = ThreadPoolExecutor(max_workers=threads)
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies, probe_waits = [], []
+    shed = 0
+
+    def login():
+        if mode == "inline":
+            return security.pwd_context.verify(PASSWORD, hashed)
+        return security.hashing_pool.run(security._verify_in_worker, PASSWORD, hashed)
+
+    def client():
+        nonlocal shed
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                request_pool.submit(login).result()
+            except HTTPException:
+                with lock:
+                    shed += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            request_pool.submit(lambda: None).result()
+            with lock:
+                probe_waits.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    callers = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    callers.append(threading.Thread(target=probe, daemon=True))
+    began = time.perf_counter()
+    for t in callers:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in callers:
+        t.join()
+    elapsed = time.perf_counter() - began
+    request_pool.shutdown()
+
+    return {
+        "logins_per_s": len(latencies) / elapsed,
+        "shed_per_s": shed / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "probe_p50_ms": percentile(probe_waits, 50) * 1000,
+        "probe_p99_ms": percentile(probe_waits, 99) * 1000,
+    }
+
+
+def single_hash_ms(hashed: str, samples: int = 5) -> float:
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        security.pwd_context.verify(PASSWORD, hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput under a bcrypt storm")
+    parser.add_argument("--costs", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=40, help="request threadpool size (AnyIO default is 40)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--modes", nargs="+", default=["inline", "pool"], choices=["inline", "pool"])
+    args = parser.parse_args()
+
+    print(f"\nHash pool: {security.HASH_POOL_WORKERS} workers, queue {security.HASH_POOL_MAX_QUEUE}, "
+          f"{args.clients} clients, {args.threads} request threads, {args.duration:.0f}s per run\n")
+    header = f"{'cost':>4} {'1 hash ms':>9} {'mode':>6} {'login/s':>8} {'shed/s':>7} " \
+             f"{'p50 ms':>8} {'p99 ms':>8} {'probe p50':>10} {'probe p99':>10}"
+    print(header)
+    print("-" * len(header))
+
+    for cost in args.costs:
+        hashed = bcrypt.using(rounds=cost).hash(PASSWORD)
+        one = single_hash_ms(hashed)
+        for mode in args.modes:
+            r = run_storm(mode, hashed, args.clients, args.threads, args.duration)
+            print(f"{cost:>4} {one:>9.1f} {mode:>6} {r['logins_per_s']:>8.1f} {r['shed_per_s']:>7.1f} "
+                  f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['probe_p50_ms']:>10.2f} {r['probe_p99_ms']:>10.2f}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/loop_blocking.py - Fail if the async upload routes block the event loop
+#
+# Usage (from backend/):
+#   python -m benchmarks.loop_blocking --self-check
+#   ADMIN_TOKEN=... STUDENT_TOKEN=... python -m benchmarks.loop_blocking --property-id 1 --application-id 1
+#
+# Runs the app in-process over httpx.ASGITransport with app.core.loop_monitor
+# sampling every 5ms, fires --concurrency copies of each request at once, and
+# exits 1 if the loop was ever late by more than --threshold-ms. Sync DB or
+# boto3 calls inside an `async def` route show up as lag roughly equal to the
+# call's duration; work handed to the threadpool or awaited doesn't.
+#
+# Needs a database and R2 (R2_ENDPOINT can point at a local S3-compatible
+# server). The requests are no-op property updates and, with --documents, a PDF
+# upload for the application, so use a development database.
+# --self-check needs neither: it runs two toy routes (one calls time.sleep in
+# an async def, one hands it to the threadpool) to show what gets caught.
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+
+import httpx
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from app.core import access_log, loop_monitor
+
+PDF = b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Count 0/Kids[]>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n"
+
+
+def self_check_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking():
+        time.sleep(0.1)  # what a sync Session or boto3 call does inside async def
+        return {}
+
+    @app.get("/threadpool")
+    async def threadpool():
+        await run_in_threadpool(time.sleep, 0.1)
+        return {}
+
+    app.add_middleware(access_log.AccessLogMiddleware)
+    return app
+
+
+async def measure(app, requests: list, concurrency: int, threshold_ms: float) -> loop_monitor.LoopLagStats:
+    stats = loop_monitor.LoopLagStats()
+    monitor = asyncio.create_task(monitor_task(stats, threshold_ms / 1000))
+    await asyncio.sleep(0.02)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        for method, path, kwargs in requests:
+            responses = await asyncio.gather(*(
+                client.request(method, path, **kwargs) for _ in range(concurrency)
+            ))
+            codes = sorted({r.status_code for r in responses})
+            print(f"   {method} {path}: {codes}")
+    await asyncio.sleep(0.02)  # let the monitor wake once more: the last block shows up as this timer's lag
+    monitor.cancel()
+    return stats
+
+
+async def monitor_task(stats, warn_after: float):
+    try:
+        await loop_monitor.monitor(0.005, warn_after, stats)
+    except asyncio.CancelledError:
+        pass
+
+
+def report(label: str, stats, threshold_ms: float) -> bool:
+    lag_ms = stats.max_lag * 1000
+    ok = lag_ms <= threshold_ms
+    print(f"{'✅' if ok else '❌'} {label}: max loop lag {lag_ms:.1f}ms over {stats.samples} samples "
+          f"(threshold {threshold_ms:.0f}ms){'' if ok else '; blocked during ' + ', '.join(stats.worst_routes)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect event-loop blocking in async routes")
+    parser.add_argument("--self-check", action="store_true", help="demo on toy routes, no database needed")
+    parser.add_argument("--threshold-ms", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--property-id", type=int)
+    parser.add_argument("--application-id", type=int)
+    parser.add_argument("--documents", action="store_true", help="also upload a PDF on the application")
+    args = parser.parse_args()
+    access_log.ACCESS_LOG_ENABLED = False
+
+    if args.self_check:
+        app = self_check_app()
+        blocked = asyncio.run(measure(app, [("GET", "/blocking", {})], args.concurrency, args.threshold_ms))
+        offloaded = asyncio.run(measure(app, [("GET", "/threadpool", {})], args.concurrency, args.threshold_ms))
+        caught = not report("sync call in async def", blocked, args.threshold_ms)
+        passed = report("threadpool call", offloaded, args.threshold_ms)
+        sys.exit(0 if caught and passed else 1)
+
+    from app.main import app
+    requests = []
+    admin_token, student_token = os.getenv("ADMIN_TOKEN"), os.getenv("STUDENT_TOKEN")
+    if args.property_id and admin_token:
+        requests.append(("PUT", f"/admin/properties/{args.property_id}", {
+            "headers": {"Authorization": f"Bearer {admin_token}"}, "data": {},
+        }))
+    if args.application_id and student_token:
+        kwargs = {"headers": {"Authorization": f"Bearer {student_token}"}, "data": {"funding_approved": "false"}}
+        if args.documents:
+            kwargs["files"] = {"proof_of_registration": ("por.pdf", PDF, "application/pdf")}
+        # applications.update_application and students.update_application
+        requests.append(("PUT", f"/students/applications/my-applications/{args.application_id}", kwargs))
+        requests.append(("PUT", f"/applications/applications/my-applications/{args.application_id}", kwargs))
+    if not requests:
+        parser.error("pass --property-id with ADMIN_TOKEN and/or --application-id with STUDENT_TOKEN")
+
+    stats = asyncio.run(measure(app, requests, args.concurrency, args.threshold_ms))
+    sys.exit(0 if report("async upload routes", stats, args.threshold_ms) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# benchmarks/micro.py - Microbenchmarks for hot helpers, compared against stored baselines
+#
+# Usage (from backend/):
+#   python -m benchmarks.micro                     # run all, compare with micro_baselines.json
+#   python -m benchmarks.micro -k jwt -k email     # only names containing jwt or email
+#   python -m benchmarks.micro --save              # store this run as the new baseline
+#   python -m benchmarks.micro --threshold 0.3 --rounds 9
+#
+# Each benchmark is a setup function registered with @bench; it returns the
+# zero-argument callable to time. A round runs the callable enough times to
+# take --min-time seconds, and the median per-call time over --rounds rounds
+# is what gets compared. Anything slower than baseline * (1 + threshold)
+# fails the run (exit 1), so a regression shows up in review next to the
+# change; re-run with --save when a slowdown is intended and commit the
+# updated baseline with it. Baselines are only comparable on the machine that
+# recorded them - a different machine is reported, and the comparison still runs.
+#
+# The list benchmarks call the route functions on an in-memory SQLite copy of
+# the tables (a fresh session per call, as per request), so they time the ORM
+# loading and dict building, not Postgres.
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, schemas
+from app.core import email_utils, identity_cache, security
+from app.core.intake import current_intake_year
+from app.routers import admin, auth, property
+
+BASELINE_PATH = Path(__file__).with_name("micro_baselines.json")
+DEFAULT_THRESHOLD = float(os.getenv("MICRO_THRESHOLD", "0.2"))
+
+BENCHMARKS = {}  # name -> (setup, threshold override or None)
+
+
+def bench(name: str, threshold: float = None):
+    """Register a setup function returning the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = (setup, threshold)
+        return setup
+    return register
+
+
+# ── Fixture data ─────
+PROPERTIES = 200
+IMAGES_PER_PROPERTY = 5
+APPLICATIONS = 1000
+
+STUDENT = {
+    "full_name": "Lerato Mokoena",
+    "email": "lerato.mokoena@tut4life.ac.za",
+    "phone_number": "0712345678",
+    "student_number": "220123456",
+    "campus": schemas.CAMPUSES[0],
+    "password": "correct horse battery staple",
+}
+
+_db = None
+
+
+def fixture_db():
+    """In-memory SQLite with one admin's properties, images, students and applications"""
+    global _db
+    if _db is not None:
+        return _db
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    tables = models.Base.metadata.tables
+    models.Base.metadata.create_all(engine, tables=[
+        tables[name] for name in ("admins", "students", "properties", "property_images", "applications")
+    ])
+    Session = sessionmaker(bind=engine)
+    now = datetime.now(timezone.utc)
+    with Session() as db:
+        owner = models.Admin(full_name="Bench Admin", email="bench.admin@campusstay.co.za", hashed_password="x")
+        db.add(owner)
+        db.flush()
+        properties = [
+            models.Property(
+                title=f"Bench Residence {i}", address=f"{i} Church St, Pretoria", is_bachelor=i % 3 == 0,
+                available_flats=10, total_flats=20, space_per_student=12.5,
+                campus_intake=schemas.CAMPUSES[i % len(schemas.CAMPUSES)], admin_id=owner.id,
+                images=[models.PropertyImage(image_url=f"https://cdn.example/properties/{i}/{n}.jpg")
+                        for n in range(IMAGES_PER_PROPERTY)],
+            )
+            for i in range(PROPERTIES)
+        ]
+        students = [
+            models.Student(
+                full_name=f"Student {i}", email=f"bench.student{i}@tut4life.ac.za", phone_number="0712345678",
+                student_number=str(220_000_000 + i), campus=schemas.CAMPUSES[0], hashed_password="x",
+                email_verified=True,
+            )
+            for i in range(APPLICATIONS // 4)
+        ]
+        db.add_all(properties + students)
+        db.flush()
+        db.add_all(
+            models.Application(
+                student_id=students[i // 4].id, property_id=properties[(i * 7) % PROPERTIES].id,
+                intake_year=current_intake_year(), status=("pending", "approved", "rejected")[i % 3],
+                applied_at=now - timedelta(minutes=i), funding_approved=i % 2 == 0,
+            )
+            for i in range(APPLICATIONS)
+        )
+        db.commit()
+        _db = (Session, owner.id, students[0].email)
+    return _db
+
+
+# ── Benchmarks ─────
+@bench("security.hash_password", threshold=0.3)
+def hash_password():
+    return lambda: security.hash_password(STUDENT["password"])
+
+
+@bench("security.verify_password", threshold=0.3)
+def verify_password():
+    hashed = security.hash_password(STUDENT["password"])
+    return lambda: security.verify_password(STUDENT["password"], hashed)
+
+
+@bench("security.create_access_token")
+def create_access_token():
+    claims = {"sub": STUDENT["email"], "role": "student", "student_id": 1}
+    return lambda: security.create_access_token(claims, timedelta(minutes=60))
+
+
+@bench("auth.jwt_decode")
+def jwt_decode():
+    # What get_current_user does on a claims-cache miss
+    token = security.create_access_token({"sub": STUDENT["email"], "role": "student"})
+    return lambda: jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+
+
+@bench("auth.get_current_user_cached")
+def get_current_user_cached():
+    # The hot path: claims and identity both cached from an earlier request
+    Session, _, email = fixture_db()
+    token = security.create_access_token({"sub": email, "role": "student"})
+    identity_cache.clear()
+    with Session() as db:
+        auth.get_current_user(token, db)
+
+    def call():
+        with Session() as db:
+            return auth.get_current_user(token, db)
+    return call
+
+
+@bench("routes.property_list")
+def property_list():
+    Session, _, _ = fixture_db()
+
+    def call():
+        with Session() as db:
+            return property.get_properties(sort=None, db=db)
+    return call
+
+
+@bench("routes.admin_application_list")
+def admin_application_list():
+    Session, admin_id, _ = fixture_db()
+
+    def call():
+        with Session() as db:
+            return admin.get_applications(intake_year=None, db=db, current_admin=db.get(models.Admin, admin_id))
+    return call
+
+
+@bench("email.verification")
+def email_verification():
+    return lambda: email_utils.build_verification_email(STUDENT["full_name"], security.generate_opaque_token())
+
+
+@bench("email.application_confirmation")
+def email_application_confirmation():
+    return lambda: email_utils.build_application_confirmation_email(
+        STUDENT["full_name"], "Soshanguve Gardens Block C", "12 Aubrey Matlala Rd, Soshanguve")
+
+
+@bench("email.announcement")
+def email_announcement():
+    message = "Results for the 2026 intake are now available.\nLog in to see your outcome.\n" * 5
+    return lambda: email_utils.build_announcement_email(STUDENT["full_name"], "Residence allocation results", message)
+
+
+@bench("schemas.StudentCreate")
+def student_create():
+    return lambda: schemas.StudentCreate(**STUDENT)
+
+
+# ── Runner ─────
+def measure(fn, rounds: int, min_time: float) -> dict:
+    """Median and min seconds per call; loops per round are calibrated to take min_time"""
+    fn()  # warm-up: imports, caches, pool start-up
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    per_call = [elapsed / loops]
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_call.append((time.perf_counter() - started) / loops)
+    return {"median": statistics.median(per_call), "min": min(per_call), "loops": loops, "rounds": rounds}
+
+
+def machine() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "bcrypt_rounds": security.BCRYPT_ROUNDS,
+        "hash_pool": security.HASH_POOL_ENABLED,
+    }
+
+
+def human(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print each result against its baseline -> names that regressed"""
+    regressed = []
+    print(f"\n{'benchmark':<36} {'median':>11} {'baseline':>11} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<36} {human(result['median']):>11} {'-':>11} {'new':>8}")
+            continue
+        change = result["median"] / base["median"] - 1
+        limit = BENCHMARKS[name][1] or threshold
+        flag = ""
+        if change > limit:
+            flag = f"  ❌ slower than +{limit:.0%}"
+            regressed.append(name)
+        elif change < -limit:
+            flag = "  ⚡ faster - consider --save"
+        print(f"{name:<36} {human(result['median']):>11} {human(base['median']):>11} {change:>+8.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for hot helpers")
+    parser.add_argument("-k", dest="filters", action="append", default=[], help="only names containing this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per round")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline median")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.filters or any(f in name for f in args.filters)]
+    if not names:
+        sys.exit(f"No benchmark matches {args.filters}")
+
+    results = {}
+    for name in names:
+        setup, _ = BENCHMARKS[name]
+        results[name] = measure(setup(), args.rounds, args.min_time)
+        print(f"  {name:<36} {human(results[name]['median']):>11}  (min {human(results[name]['min'])}, "
+              f"{results[name]['loops']} loops x {args.rounds})")
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    if args.save:
+        # Keep baselines for benchmarks that weren't selected this run
+        stored = {**baseline.get("results", {}), **{
+            name: {"median": r["median"], "min": r["min"]} for name, r in results.items()
+        }}
+        args.baseline.write_text(json.dumps({"machine": machine(), "results": stored}, indent=2) + "\n")
+        print(f"\n📝 Baseline for {len(results)} benchmarks written to {args.baseline}")
+        return
+
+    if baseline and baseline.get("machine") != machine():
+        print(f"\n⚠️ Baseline was recorded on {baseline.get('machine')}, this is {machine()} - "
+              "expect differences that aren't regressions")
+    regressed = compare(results, baseline, args.threshold)
+    if regressed:
+        print(f"\n❌ {len(regressed)} regressed: {', '.join(regressed)}")
+        sys.exit(1)
+    print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
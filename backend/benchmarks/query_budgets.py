@@ -0,0 +1,78 @@
+# benchmarks/query_budgets.py - Fail when an endpoint runs more SQL than its budget
+#
+# Usage (from backend/, against a seeded database):
+#   python -m benchmarks.query_budgets                       # in-process app
+#   python -m benchmarks.query_budgets --base-url http://localhost:8000   # started with QUERY_STATS_HEADERS=true
+#   STUDENT_TOKEN=... ADMIN_TOKEN=... python -m benchmarks.query_budgets
+#
+# Each request is checked with request_context.check_response_budget(), which
+# reads the X-Query-Count header added when QUERY_STATS_HEADERS is on. Budgets count the
+# auth lookup (one query on an identity cache miss), so a regression
+# back to a per-row query shows up as soon as there are a few rows. Endpoints
+# needing a token are skipped when it isn't provided. Exits 1 on any failure.
+import argparse
+import os
+import sys
+
+import httpx
+
+# Before the app is imported: the in-process app needs the X-Query-Count header
+os.environ.setdefault("QUERY_STATS_HEADERS", "true")
+
+from app.core.request_context import QueryBudgetExceeded, check_response_budget
+
+# (method, path, max queries, token env var or None)
+BUDGETS = [
+    ("GET", "/students/properties", 2, None),               # properties + images (selectinload)
+    ("GET", "/students/properties/{property_id}", 2, None),
+    ("GET", "/students/applications/my-applications", 2, "STUDENT_TOKEN"),
+    ("GET", "/applications/my-applications", 2, "STUDENT_TOKEN"),
+    ("GET", "/admin/properties", 3, "ADMIN_TOKEN"),
+    ("GET", "/admin/applications", 2, "ADMIN_TOKEN"),
+    ("GET", "/students/properties?sort=demand", 2, None),
+    ("GET", "/admin/stats", 2, "ADMIN_TOKEN"),                  # admin + properties; counts are columns
+]
+
+
+def make_client(base_url: str) -> httpx.Client:
+    if base_url:
+        return httpx.Client(base_url=base_url, timeout=30)
+    from starlette.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check per-endpoint SQL query budgets")
+    parser.add_argument("--base-url", help="running server; default is the app in-process")
+    parser.add_argument("--property-id", type=int, default=1)
+    args = parser.parse_args()
+
+    failures = 0
+    with make_client(args.base_url) as client:
+        for method, path, budget, token_var in BUDGETS:
+            path = path.format(property_id=args.property_id)
+            headers = {}
+            if token_var:
+                token = os.getenv(token_var)
+                if not token:
+                    print(f"⏭️  {method} {path}: set {token_var} to check")
+                    continue
+                headers["Authorization"] = f"Bearer {token}"
+
+            response = client.request(method, path, headers=headers)
+            used = response.headers.get("x-query-count", "?")
+            try:
+                if response.status_code >= 400:
+                    raise QueryBudgetExceeded(f"{method} {path} returned {response.status_code}")
+                check_response_budget(response, budget)
+                print(f"✅ {method} {path}: {used}/{budget} queries")
+            except QueryBudgetExceeded as e:
+                failures += 1
+                print(f"❌ {e}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/replica_routing.py - Check read-replica routing against two local Postgres instances
+#
+# Usage (from backend/), e.g. with two throwaway servers:
+#   docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=pg postgres:16
+#   docker run -d -p 5433:5432 -e POSTGRES_PASSWORD=pg postgres:16
+#   DATABASE_URL=postgresql://postgres:pg@localhost:5432/postgres \
+#   DATABASE_REPLICA_URLS=postgresql://postgres:pg@localhost:5433/postgres \
+#   python -m benchmarks.replica_routing
+#
+# The second server doesn't have to be a real streaming replica: a server not in
+# recovery reports zero lag. Each step opens a get_read_db session the way a
+# request would, runs a query on it and reports which engine it was bound to:
+#   1. an anonymous read goes to the replica
+#   2. a token that just committed a write reads from the primary...
+#   3. ...while other tokens still use the replica
+#   4. once REPLICA_STICKY_SECONDS pass, the writer is back on the replica
+#   5. a replica lagging past REPLICA_MAX_LAG_SECONDS is taken out of rotation
+# Exits 1 if any step lands on the wrong server.
+import os
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+os.environ.setdefault("REPLICA_STICKY_SECONDS", "2")
+
+from sqlalchemy import Column, Integer, MetaData, Table, insert, text
+from starlette.requests import Request
+
+from app import database
+from app.core import request_context
+
+WRITER, OTHER = "writer-token", "other-token"
+
+scratch = Table("replica_routing_check", MetaData(), Column("x", Integer), prefixes=["TEMPORARY"])
+
+
+def request_scope(token: str) -> dict:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return {"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""}
+
+
+def read_target(token: str = None) -> str:
+    """'primary' or 'replica': where a get_read_db session for this token runs its queries"""
+    dependency = database.get_read_db(Request(request_scope(token)))
+    db = next(dependency)
+    try:
+        db.execute(text("SELECT 1"))
+        return "primary" if db.get_bind() is database.engine else "replica"
+    finally:
+        dependency.close()
+
+
+def write_as(token: str):
+    """Commit an INSERT inside a request context, like a POST from this token"""
+    stats, context_token = request_context.begin(request_scope(token))
+    try:
+        with database.SessionLocal() as db:
+            scratch.create(db.connection())
+            db.execute(insert(scratch).values(x=1))
+            db.commit()
+    finally:
+        request_context.end(context_token)
+
+
+def main():
+    if not database.replica_engines:
+        sys.exit("Set DATABASE_REPLICA_URLS to a second Postgres instance")
+
+    primary, replica = database.engine.url, database.replica_engines[0].url
+    print(f"primary {primary.host}:{primary.port}, replica {replica.host}:{replica.port}, "
+          f"sticky for {database.REPLICA_STICKY_SECONDS}s\n")
+
+    failures = 0
+
+    def expect(label: str, target: str, expected: str):
+        nonlocal failures
+        failures += target != expected
+        print(f"{'✅' if target == expected else '❌'} {label}: {target}")
+
+    expect("anonymous read", read_target(), "replica")
+    write_as(WRITER)
+    expect("writer reads right after its write", read_target(WRITER), "primary")
+    expect("another user reads meanwhile", read_target(OTHER), "replica")
+    time.sleep(database.REPLICA_STICKY_SECONDS + 0.1)
+    expect("writer after the sticky window", read_target(WRITER), "replica")
+
+    database.REPLICA_MAX_LAG_SECONDS = -1  # any lag is too much now
+    for health in database._replica_health:
+        health.checked_at = float("-inf")
+    expect("read while the replica is too far behind", read_target(), "primary")
+    print(f"\nreplicas: {database.replica_status()}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# check_fk_indexes.py - Fail if a foreign key the app filters or joins on has no index
+#
+# Usage (from backend/):
+#   python check_fk_indexes.py                # against the models (no database needed)
+#   python check_fk_indexes.py --database     # against the live schema (after `alembic upgrade head`)
+#   python check_fk_indexes.py --all          # every foreign key, not only the ones queried
+#
+# Reads app/routers and app/jobs, collects every models.<Model>.<column> used
+# inside .filter() / .where() / .join() / .outerjoin(), and checks that each
+# foreign-key column among them is the leading column of some full (non-partial)
+# index, unique constraint or primary key. Exits 1 listing the gaps, so it
+# can run in CI next to the migrations.
+import argparse
+import ast
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from sqlalchemy import PrimaryKeyConstraint, UniqueConstraint, inspect
+
+from app import models
+
+SOURCE_DIRS = ["app/routers", "app/jobs"]
+QUERY_METHODS = {"filter", "where", "join", "outerjoin"}
+
+MODELS = {
+    mapper.class_.__name__: mapper.local_table
+    for mapper in models.Base.registry.mappers
+}
+
+
+def _column_ref(node):
+    """(table, column) for models.Model.column or Model.column, else None"""
+    if not isinstance(node, ast.Attribute):
+        return None
+    owner = node.value
+    if isinstance(owner, ast.Attribute) and isinstance(owner.value, ast.Name) and owner.value.id == "models":
+        model = owner.attr
+    elif isinstance(owner, ast.Name):
+        model = owner.id
+    else:
+        return None
+    table = MODELS.get(model)
+    if table is None or node.attr not in table.c:
+        return None
+    return table.name, node.attr
+
+
+def queried_columns(base: Path) -> dict:
+    """{(table, column): {"file:line", ...}} for columns used in query conditions"""
+    found = defaultdict(set)
+    for directory in SOURCE_DIRS:
+        for path in sorted((base / directory).glob("*.py")):
+            tree = ast.parse(path.read_text(), filename=str(path))
+            for call in ast.walk(tree):
+                if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                        and call.func.attr in QUERY_METHODS):
+                    continue
+                for arg in call.args:
+                    for node in ast.walk(arg):
+                        ref = _column_ref(node)
+                        if ref:
+                            found[ref].add(f"{path.relative_to(base)}:{node.lineno}")
+    return found
+
+
+def foreign_keys() -> set:
+    return {
+        (table.name, column.name)
+        for table in models.Base.metadata.sorted_tables
+        for column in table.columns
+        if column.foreign_keys
+    }
+
+
+def leading_columns_from_models() -> set:
+    """(table, first column) for every full index, unique constraint and primary key"""
+    covered = set()
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.dialect_options["postgresql"].get("where") is None and index.columns:
+                covered.add((table.name, list(index.columns)[0].name))
+        for constraint in table.constraints:
+            if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint)) and constraint.columns:
+                covered.add((table.name, list(constraint.columns)[0].name))
+    return covered
+
+
+def leading_columns_from_database() -> set:
+    from app.database import engine
+    inspector = inspect(engine)
+    covered = set()
+    for table in models.Base.metadata.sorted_tables:
+        for index in inspector.get_indexes(table.name):
+            if index.get("dialect_options", {}).get("postgresql_where") is None and index["column_names"]:
+                covered.add((table.name, index["column_names"][0]))
+        for constraint in inspector.get_unique_constraints(table.name):
+            covered.add((table.name, constraint["column_names"][0]))
+        primary_key = inspector.get_pk_constraint(table.name)["constrained_columns"]
+        if primary_key:
+            covered.add((table.name, primary_key[0]))
+    return covered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that queried foreign keys are indexed")
+    parser.add_argument("--database", action="store_true", help="inspect the live schema instead of the models")
+    parser.add_argument("--all", action="store_true", help="check every foreign key, queried or not")
+    args = parser.parse_args()
+
+    used = queried_columns(Path(__file__).resolve().parent)
+    covered = leading_columns_from_database() if args.database else leading_columns_from_models()
+    to_check = foreign_keys() if args.all else foreign_keys() & used.keys()
+
+    missing = sorted(to_check - covered)
+    for table, column in sorted(to_check & covered):
+        print(f"✅ {table}.{column}")
+    for table, column in missing:
+        where = ", ".join(sorted(used.get((table, column), ()))[:5]) or "not queried directly"
+        print(f"❌ {table}.{column} has no index ({where})")
+
+    source = "live database" if args.database else "models"
+    print(f"\n{len(to_check)} foreign keys checked against the {source}, {len(missing)} unindexed")
+    sys.exit(1 if missing else 0)
+
+
+if __name__ == "__main__":
+    main()
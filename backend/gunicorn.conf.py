@@ -0,0 +1,27 @@
+# backend/gunicorn.conf.py - Loaded automatically by gunicorn started from backend/
+#
+#   gunicorn app.main:app -k uvicorn.workers.UvicornWorker
+#
+# Sets up prometheus_client multiprocess mode for /metrics: every worker writes
+# its metrics to PROMETHEUS_MULTIPROC_DIR, which must be empty at startup and
+# must forget workers that exit.
+#
+# Also exports the worker count as WEB_CONCURRENCY (gunicorn's own default for
+# -w), so app/core/db_pool.py can split DB_MAX_CONNECTIONS between workers.
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "campusstay-metrics"))
+
+
+def on_starting(server):
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
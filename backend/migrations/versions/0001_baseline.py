@@ -0,0 +1,93 @@
+"""Baseline: the schema create_all built at startup before migrations
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+
+Exactly the tables and indexes the models had before any schema work, so a
+database from that time can be stamped here. Everything added while
+create_all still ran at startup is in 0001b_create_all_catchup.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "admins",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("full_name", sa.String(255), nullable=False),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("password", sa.Text(), nullable=True),
+        sa.Column("hashed_password", sa.Text(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_admins_id", "admins", ["id"])
+    op.create_index("ix_admins_email", "admins", ["email"], unique=True)
+
+    op.create_table(
+        "students",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("full_name", sa.String(255), nullable=False),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("phone_number", sa.String(20), nullable=False),
+        sa.Column("student_number", sa.String(9), nullable=False, unique=True),
+        sa.Column("campus", sa.String(50), nullable=False),
+        sa.Column("hashed_password", sa.Text(), nullable=False),
+        sa.Column("email_verified", sa.Boolean(), nullable=False),
+        sa.Column("verification_token", sa.String(255), nullable=True, unique=True),
+        sa.Column("verification_token_expires", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("password_reset_token", sa.String(255), nullable=True, unique=True),
+        sa.Column("password_reset_token_expires", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("id_document_url", sa.Text(), nullable=True),
+        sa.Column("proof_of_registration_url", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_students_id", "students", ["id"])
+    op.create_index("ix_students_email", "students", ["email"], unique=True)
+
+    op.create_table(
+        "properties",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("address", sa.Text(), nullable=False),
+        sa.Column("is_bachelor", sa.Boolean(), nullable=True),
+        sa.Column("available_flats", sa.Integer(), nullable=False),
+        sa.Column("total_flats", sa.Integer(), nullable=False),
+        sa.Column("space_per_student", sa.Float(), nullable=False),
+        sa.Column("campus_intake", sa.String(255), nullable=False),
+        sa.Column("admin_id", sa.Integer(), sa.ForeignKey("admins.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_properties_id", "properties", ["id"])
+
+    op.create_table(
+        "property_images",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("property_id", sa.Integer(), sa.ForeignKey("properties.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("image_url", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_property_images_id", "property_images", ["id"])
+
+    op.create_table(
+        "applications",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("property_id", sa.Integer(), sa.ForeignKey("properties.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=True),
+        sa.Column("applied_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("funding_approved", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_applications_id", "applications", ["id"])
+
+
+def downgrade():
+    for table in ("applications", "property_images", "properties", "students", "admins"):
+        op.drop_table(table)
@@ -0,0 +1,130 @@
+"""Changes to existing tables made while create_all still managed the schema
+
+Revision ID: 0001b_create_all_catchup
+Revises: 0001_baseline
+Create Date: 2026-10-19
+
+create_all only creates missing tables; it never alters one that exists, so
+a database that predates migrations never got these. Every step is
+idempotent, for databases that did get some of them (e.g. a fresh
+create_all after the change shipped):
+
+- verification_token / password_reset_token hold a sha256 hex digest
+  (app.core.security.hash_token) in VARCHAR(64). Raw tokens from before
+  (JWTs stored verbatim) are replaced by their digest first, so links
+  already sent keep working and the narrower type fits. Shrinking a
+  VARCHAR rewrites students under an exclusive lock; it is a small table.
+- refresh_tokens and email_outbox, created if missing; columns added to
+  them after their first release are added if missing
+- students.document_reminder_sent_at and ix_applications_pending_student,
+  for the document reminder sweep (app.jobs.document_reminders)
+
+A database that ran every startup create_all up to this point passes
+through unchanged apart from the token digests.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0001b_create_all_catchup"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+TOKEN_COLUMNS = ["verification_token", "password_reset_token"]
+
+CREATE_REFRESH_TOKENS_SQL = """
+    CREATE TABLE IF NOT EXISTS refresh_tokens (
+        id SERIAL PRIMARY KEY,
+        token_hash VARCHAR(64) NOT NULL,
+        family_id VARCHAR(32) NOT NULL,
+        subject VARCHAR(255) NOT NULL,
+        role VARCHAR(20) NOT NULL,
+        student_id INTEGER,
+        expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        revoked_at TIMESTAMP WITH TIME ZONE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+    )
+"""
+
+CREATE_EMAIL_OUTBOX_SQL = """
+    CREATE TABLE IF NOT EXISTS email_outbox (
+        id SERIAL PRIMARY KEY,
+        kind VARCHAR(50) NOT NULL,
+        to_email VARCHAR(255) NOT NULL,
+        payload JSONB,
+        status VARCHAR(20) NOT NULL,
+        attempts INTEGER NOT NULL,
+        next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        locked_until TIMESTAMP WITH TIME ZONE,
+        last_error TEXT,
+        provider_id VARCHAR(100),
+        bulk_id VARCHAR(32),
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        sent_at TIMESTAMP WITH TIME ZONE
+    )
+"""
+
+# Added to email_outbox after it first shipped (bulk notifications)
+LATER_COLUMNS = [("email_outbox", "bulk_id", "VARCHAR(32)")]
+
+# (name, table, columns, unique, where)
+INDEXES = [
+    ("ix_refresh_tokens_id", "refresh_tokens", "id", False, None),
+    ("ix_refresh_tokens_token_hash", "refresh_tokens", "token_hash", True, None),
+    ("ix_refresh_tokens_family_id", "refresh_tokens", "family_id", False, None),
+    ("ix_refresh_tokens_subject", "refresh_tokens", "subject", False, None),
+    ("ix_email_outbox_id", "email_outbox", "id", False, None),
+    ("ix_email_outbox_bulk_id", "email_outbox", "bulk_id", False, None),
+    ("ix_email_outbox_due", "email_outbox", "next_attempt_at", False, "status IN ('pending', 'sending')"),
+    ("ix_applications_pending_student", "applications", "student_id", False, "status = 'pending'"),
+]
+
+
+def _index_valid(name: str):
+    """True/False for an existing index, None if there isn't one"""
+    if context.is_offline_mode():
+        return None
+    return op.get_bind().execute(
+        sa.text("SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+
+
+def _create_index_concurrently(name: str, table: str, columns: str, unique: bool = False, where: str = None):
+    valid = _index_valid(name)
+    if valid:
+        return
+    if valid is False:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"
+               + (f" WHERE {where}" if where else ""))
+
+
+def upgrade():
+    for column in TOKEN_COLUMNS:
+        op.execute(f"UPDATE students SET {column} = encode(sha256(convert_to({column}, 'UTF8')), 'hex') "
+                   f"WHERE length({column}) <> 64")
+        op.execute(f"ALTER TABLE students ALTER COLUMN {column} TYPE VARCHAR(64)")
+
+    op.execute(CREATE_REFRESH_TOKENS_SQL)
+    op.execute(CREATE_EMAIL_OUTBOX_SQL)
+    for table, column, type_ in LATER_COLUMNS:
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {type_}")
+
+    # Nullable without a default: a catalog-only change
+    op.execute("ALTER TABLE students ADD COLUMN IF NOT EXISTS document_reminder_sent_at TIMESTAMP WITH TIME ZONE")
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique, where in INDEXES:
+            _create_index_concurrently(name, table, columns, unique, where)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_applications_pending_student")
+    op.drop_column("students", "document_reminder_sent_at")
+    op.drop_table("email_outbox")
+    op.drop_table("refresh_tokens")
+    # Digests stay digests: the raw tokens are gone
+    for column in TOKEN_COLUMNS:
+        op.alter_column("students", column, type_=sa.String(255))
@@ -0,0 +1,106 @@
+"""Index the foreign keys and status the routers filter on; one application per student per property
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001b_create_all_catchup
+Create Date: 2026-10-19
+
+Every index is built with CREATE INDEX CONCURRENTLY, outside a transaction,
+so writes to applications/properties keep flowing while it runs. A failed
+concurrent build leaves an INVALID index behind; re-running the migration
+drops and rebuilds it. The unique constraint is attached to its
+concurrently-built index, so the table is only locked for a catalog update.
+
+applications.student_id gets no index of its own: it is the leading column
+of uq_applications_student_property.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002_hot_path_indexes"
+down_revision = "0001b_create_all_catchup"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    ("ix_properties_admin_id", "properties", "admin_id", False),
+    ("ix_property_images_property_id", "property_images", "property_id", False),
+    ("ix_applications_property_id", "applications", "property_id", False),
+    ("ix_applications_status", "applications", "status", False),
+    ("uq_applications_student_property", "applications", "student_id, property_id", True),
+]
+
+# Same columns, created under other names by the old init_db.sql
+LEGACY_INDEXES = [
+    "idx_properties_admin",
+    "idx_applications_student",
+    "idx_applications_property",
+    "idx_applications_status",
+    "idx_students_email",  # duplicate of the unique index on students.email
+]
+
+DUPLICATES_SQL = """
+    SELECT student_id, property_id, count(*) AS applications
+    FROM applications GROUP BY student_id, property_id HAVING count(*) > 1
+"""
+
+
+def _index_valid(name: str):
+    """True/False for an existing index, None if there isn't one"""
+    if context.is_offline_mode():
+        return None
+    return op.get_bind().execute(
+        sa.text("SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+
+
+def _constraint_exists(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name}
+    ).first() is not None
+
+
+def _create_index_concurrently(name: str, table: str, columns: str, unique: bool):
+    valid = _index_valid(name)
+    if valid:
+        return
+    if valid is False:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"
+    )
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        duplicates = op.get_bind().execute(sa.text(DUPLICATES_SQL)).fetchall()
+        if duplicates:
+            raise RuntimeError(
+                f"{len(duplicates)} (student_id, property_id) pairs have more than one application; "
+                f"resolve them before adding uq_applications_student_property:\n{DUPLICATES_SQL}"
+            )
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            _create_index_concurrently(name, table, columns, unique)
+
+    if not _constraint_exists("uq_applications_student_property"):
+        op.execute(
+            "ALTER TABLE applications ADD CONSTRAINT uq_applications_student_property "
+            "UNIQUE USING INDEX uq_applications_student_property"
+        )
+
+    with op.get_context().autocommit_block():
+        for name in LEGACY_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade():
+    op.drop_constraint("uq_applications_student_property", "applications", type_="unique")
+    with op.get_context().autocommit_block():
+        for name, _, _, unique in INDEXES:
+            if not unique:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
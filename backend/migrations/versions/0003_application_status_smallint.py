@@ -0,0 +1,147 @@
+"""Store applications.status as a SMALLINT code with a CHECK; partial indexes on pending rows
+
+Revision ID: 0003_application_status_smallint
+Revises: 0002_hot_path_indexes
+Create Date: 2026-10-19
+
+pending/approved/rejected become 0/1/2 (app.models.APPLICATION_STATUSES);
+NULL (the old column was nullable) becomes pending. The table stays
+writable until the final swap:
+
+1. add status_code, plus a trigger that fills it on every insert/update
+   from code that still writes the old string column
+2. backfill status_code in batches of MIGRATION_BATCH_SIZE ids, each its
+   own transaction, so no long row locks and WAL is spread out
+3. build the CHECK (NOT VALID, then VALIDATE: no exclusive lock for the
+   scan) and the pending partial indexes concurrently on status_code
+4. swap in one short transaction: drop the trigger and the old column
+   (taking ix_applications_status and the old pending index with it),
+   rename status_code to status. SET NOT NULL skips its table scan because
+   the validated CHECK already proves it.
+
+Deploy the new app code right after: between the swap and the deploy,
+old code writing status strings fails. The updates leave a dead tuple per
+row, so the migration finishes with VACUUM (ANALYZE).
+"""
+import os
+
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0003_application_status_smallint"
+down_revision = "0002_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+
+STATUS_CODE_SQL = """
+    CASE {column} WHEN 'approved' THEN 1 WHEN 'rejected' THEN 2 ELSE 0 END
+"""
+
+UNKNOWN_STATUSES_SQL = """
+    SELECT status, count(*) FROM applications
+    WHERE status IS NOT NULL AND status NOT IN ('pending', 'approved', 'rejected')
+    GROUP BY status
+"""
+
+SYNC_FUNCTION_SQL = f"""
+    CREATE OR REPLACE FUNCTION applications_sync_status_code() RETURNS trigger AS $$
+    BEGIN
+        NEW.status_code := {STATUS_CODE_SQL.format(column="NEW.status").strip()};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+# (name, columns) of the partial indexes; built on status_code under a temporary
+# name, renamed once the old pending index is gone
+PENDING_INDEXES = [
+    ("ix_applications_pending_student", "student_id"),
+    ("ix_applications_pending_property", "property_id"),
+]
+
+
+def _backfill():
+    update = sa.text(
+        f"UPDATE applications SET status_code = {STATUS_CODE_SQL.format(column='status').strip()} "
+        "WHERE id > :low AND id <= :high AND status_code IS NULL"
+    )
+    if context.is_offline_mode():
+        op.execute(f"UPDATE applications SET status_code = {STATUS_CODE_SQL.format(column='status').strip()} "
+                   "WHERE status_code IS NULL")
+        return
+    bind = op.get_bind()
+    low, high = bind.execute(sa.text("SELECT min(id) - 1, max(id) FROM applications")).one()
+    if high is None:
+        return
+    updated = 0
+    for start in range(low, high, BATCH_SIZE):
+        updated += bind.execute(update, {"low": start, "high": start + BATCH_SIZE}).rowcount
+        print(f"   applications.status_code: {updated} rows backfilled (id <= {min(start + BATCH_SIZE, high)})")
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        unknown = op.get_bind().execute(sa.text(UNKNOWN_STATUSES_SQL)).fetchall()
+        if unknown:
+            raise RuntimeError(
+                f"applications has statuses with no code: {dict(unknown)}; fix them first:\n{UNKNOWN_STATUSES_SQL}"
+            )
+
+    # 1. New column, kept in step with the old one while the backfill runs
+    op.execute("ALTER TABLE applications ADD COLUMN IF NOT EXISTS status_code SMALLINT")
+    op.execute(SYNC_FUNCTION_SQL)
+    op.execute("DROP TRIGGER IF EXISTS applications_sync_status_code ON applications")
+    op.execute(
+        "CREATE TRIGGER applications_sync_status_code BEFORE INSERT OR UPDATE OF status ON applications "
+        "FOR EACH ROW EXECUTE FUNCTION applications_sync_status_code()"
+    )
+
+    with op.get_context().autocommit_block():
+        # 2. Backfill, one transaction per batch
+        _backfill()
+
+        # 3. Constraints and indexes without long exclusive locks
+        op.execute("ALTER TABLE applications DROP CONSTRAINT IF EXISTS ck_applications_status")
+        op.execute("ALTER TABLE applications DROP CONSTRAINT IF EXISTS ck_applications_status_not_null")
+        op.execute("ALTER TABLE applications ADD CONSTRAINT ck_applications_status "
+                   "CHECK (status_code IN (0, 1, 2)) NOT VALID")
+        op.execute("ALTER TABLE applications ADD CONSTRAINT ck_applications_status_not_null "
+                   "CHECK (status_code IS NOT NULL) NOT VALID")
+        op.execute("ALTER TABLE applications VALIDATE CONSTRAINT ck_applications_status")
+        op.execute("ALTER TABLE applications VALIDATE CONSTRAINT ck_applications_status_not_null")
+        for name, column in PENDING_INDEXES:
+            # a failed earlier run may have left an INVALID index under the temporary name
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}_new")
+            op.execute(f"CREATE INDEX CONCURRENTLY {name}_new ON applications ({column}) WHERE status_code = 0")
+
+    # 4. Swap (one transaction: ACCESS EXCLUSIVE for a catalog change, no rewrite)
+    op.execute("DROP TRIGGER applications_sync_status_code ON applications")
+    op.execute("DROP FUNCTION applications_sync_status_code()")
+    op.execute("ALTER TABLE applications DROP COLUMN status")
+    op.execute("ALTER TABLE applications RENAME COLUMN status_code TO status")
+    op.execute("ALTER TABLE applications ALTER COLUMN status SET DEFAULT 0")
+    op.execute("ALTER TABLE applications ALTER COLUMN status SET NOT NULL")
+    op.execute("ALTER TABLE applications DROP CONSTRAINT ck_applications_status_not_null")
+    for name, _ in PENDING_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+
+    with op.get_context().autocommit_block():
+        op.execute("VACUUM (ANALYZE) applications")
+
+
+def downgrade():
+    op.add_column("applications", sa.Column("status_text", sa.String(20), nullable=True))
+    op.execute(
+        "UPDATE applications SET status_text = "
+        "CASE status WHEN 0 THEN 'pending' WHEN 1 THEN 'approved' WHEN 2 THEN 'rejected' END"
+    )
+    op.drop_column("applications", "status")  # drops ck_applications_status and the pending indexes
+    op.alter_column("applications", "status_text", new_column_name="status")
+    op.create_index("ix_applications_status", "applications", ["status"])
+    op.create_index(
+        "ix_applications_pending_student", "applications", ["student_id"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
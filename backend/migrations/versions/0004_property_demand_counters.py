@@ -0,0 +1,46 @@
+"""Per-property application counters: application_count, pending_count, approved_count
+
+Revision ID: 0004_property_demand_counters
+Revises: 0003_application_status_smallint
+Create Date: 2026-10-19
+
+The columns are NOT NULL DEFAULT 0, which Postgres 11+ adds without
+rewriting the table. They are then filled by one GROUP BY, a copy of
+the reconcile job's (app.jobs.demand_counters). Deploy the app code that
+maintains them right after: applications created in between are only
+counted once the job runs.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_property_demand_counters"
+down_revision = "0003_application_status_smallint"
+branch_labels = None
+depends_on = None
+
+COUNTERS = ["application_count", "pending_count", "approved_count"]
+
+BACKFILL_SQL = """
+    UPDATE properties AS p
+    SET application_count = c.applications, pending_count = c.pending, approved_count = c.approved
+    FROM (
+        SELECT property_id,
+               count(*) AS applications,
+               count(*) FILTER (WHERE status = 0) AS pending,
+               count(*) FILTER (WHERE status = 1) AS approved
+        FROM applications
+        GROUP BY property_id
+    ) AS c
+    WHERE p.id = c.property_id
+"""
+
+
+def upgrade():
+    for name in COUNTERS:
+        op.add_column("properties", sa.Column(name, sa.Integer(), nullable=False, server_default=sa.text("0")))
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade():
+    for name in COUNTERS:
+        op.drop_column("properties", name)
@@ -0,0 +1,141 @@
+"""applications.intake_year, one application per student/property/intake, applications_archive
+
+Revision ID: 0005_application_intake_archive
+Revises: 0004_property_demand_counters
+Create Date: 2026-10-19
+
+intake_year is derived from applied_at with the app's rule
+(app.core.intake: from INTAKE_ROLLOVER_MONTH, applications count towards
+next year). The column gets that rule, on now(), as its server default
+first, so rows inserted by the old code during the backfill are stamped
+too. The backfill then runs in batches of MIGRATION_BATCH_SIZE ids, one
+transaction each.
+
+uq_applications_student_property becomes
+uq_applications_student_property_intake, so students can apply to the same
+property again in a later intake. ix_applications_property_id is replaced by
+(property_id, intake_year). Both are built concurrently, as in 0002.
+
+applications_archive starts empty; app.jobs.application_archiver fills it.
+"""
+import os
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.core.intake import INTAKE_ROLLOVER_MONTH
+
+revision = "0005_application_intake_archive"
+down_revision = "0004_property_demand_counters"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+
+
+def _intake_sql(timestamp: str) -> str:
+    return (f"(extract(year FROM {timestamp}) "
+            f"+ CASE WHEN extract(month FROM {timestamp}) >= {INTAKE_ROLLOVER_MONTH} THEN 1 ELSE 0 END)::smallint")
+
+
+BACKFILL_SQL = (f"UPDATE applications SET intake_year = {_intake_sql('coalesce(applied_at, now())')} "
+                "WHERE intake_year IS NULL")
+
+ARCHIVE_COLUMNS = "id, student_id, property_id, intake_year, status, applied_at, notes, funding_approved"
+
+
+def _backfill():
+    if context.is_offline_mode():
+        op.execute(BACKFILL_SQL)
+        return
+    bind = op.get_bind()
+    low, high = bind.execute(sa.text("SELECT min(id) - 1, max(id) FROM applications")).one()
+    if high is None:
+        return
+    batch = sa.text(BACKFILL_SQL + " AND id > :low AND id <= :high")
+    updated = 0
+    for start in range(low, high, BATCH_SIZE):
+        updated += bind.execute(batch, {"low": start, "high": start + BATCH_SIZE}).rowcount
+        print(f"   applications.intake_year: {updated} rows backfilled (id <= {min(start + BATCH_SIZE, high)})")
+
+
+def _index_valid(name: str):
+    """True/False for an existing index, None if there isn't one"""
+    if context.is_offline_mode():
+        return None
+    return op.get_bind().execute(
+        sa.text("SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+
+
+def _constraint_exists(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name}
+    ).first() is not None
+
+
+def _create_index_concurrently(name: str, columns: str, unique: bool = False):
+    valid = _index_valid(name)
+    if valid:
+        return
+    if valid is False:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY {name} ON applications ({columns})")
+
+
+def upgrade():
+    op.execute("ALTER TABLE applications ADD COLUMN IF NOT EXISTS intake_year SMALLINT")
+    op.execute(f"ALTER TABLE applications ALTER COLUMN intake_year SET DEFAULT {_intake_sql('now()')}")
+
+    with op.get_context().autocommit_block():
+        _backfill()
+        # NOT NULL without a scan under ACCESS EXCLUSIVE: validate a CHECK first
+        op.execute("ALTER TABLE applications DROP CONSTRAINT IF EXISTS ck_applications_intake_year_not_null")
+        op.execute("ALTER TABLE applications ADD CONSTRAINT ck_applications_intake_year_not_null "
+                   "CHECK (intake_year IS NOT NULL) NOT VALID")
+        op.execute("ALTER TABLE applications VALIDATE CONSTRAINT ck_applications_intake_year_not_null")
+        _create_index_concurrently("uq_applications_student_property_intake",
+                                   "student_id, property_id, intake_year", unique=True)
+        _create_index_concurrently("ix_applications_property_intake", "property_id, intake_year")
+
+    # One transaction: the new uniqueness rule replaces the old one atomically
+    if not _constraint_exists("uq_applications_student_property_intake"):
+        op.execute("ALTER TABLE applications ALTER COLUMN intake_year SET NOT NULL")
+        op.execute("ALTER TABLE applications DROP CONSTRAINT ck_applications_intake_year_not_null")
+        op.execute(
+            "ALTER TABLE applications ADD CONSTRAINT uq_applications_student_property_intake "
+            "UNIQUE USING INDEX uq_applications_student_property_intake"
+        )
+        op.drop_constraint("uq_applications_student_property", "applications", type_="unique")
+
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_applications_property_id")
+
+    op.create_table(
+        "applications_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),  # the id it had in applications
+        sa.Column("student_id", sa.Integer(), nullable=False),
+        sa.Column("property_id", sa.Integer(), nullable=False),
+        sa.Column("intake_year", sa.SmallInteger(), nullable=False),
+        sa.Column("status", sa.SmallInteger(), nullable=False),
+        sa.Column("applied_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("funding_approved", sa.Boolean(), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_applications_archive_student_id", "applications_archive", ["student_id"])
+    op.create_index("ix_applications_archive_property_intake", "applications_archive", ["property_id", "intake_year"])
+
+
+def downgrade():
+    # Archived rows go back first; their students/properties must still exist
+    op.execute(f"INSERT INTO applications ({ARCHIVE_COLUMNS}) SELECT {ARCHIVE_COLUMNS} FROM applications_archive")
+    op.drop_table("applications_archive")
+    op.create_index("ix_applications_property_id", "applications", ["property_id"])
+    op.drop_constraint("uq_applications_student_property_intake", "applications", type_="unique")
+    op.create_unique_constraint("uq_applications_student_property", "applications", ["student_id", "property_id"])
+    op.drop_index("ix_applications_property_intake", "applications")
+    op.drop_column("applications", "intake_year")
@@ -0,0 +1,36 @@
+"""email_outbox.expires_at, and no raw link tokens left in old rows
+
+Revision ID: 0006_email_outbox_link_expiry
+Revises: 0005_application_intake_archive
+Create Date: 2026-10-19
+
+expires_at is nullable without a default, a catalog-only change. New
+verification/password_reset rows store their token encrypted with the
+link's expiry (app.core.outbox.enqueue). Rows queued before this carry the
+raw token: they get the expiry the link was issued with (24h / 1h after
+created_at), and the payload of the ones that are dead or already expired
+is cleared here. The rest are cleared when they are sent, or by
+app.jobs.token_sweeper once they expire.
+"""
+from alembic import op
+
+revision = "0006_email_outbox_link_expiry"
+down_revision = "0005_application_intake_archive"
+branch_labels = None
+depends_on = None
+
+# email kind -> how long its link was valid for (app.routers.auth)
+LINK_LIFETIMES = {"verification": "24 hours", "password_reset": "1 hour"}
+
+
+def upgrade():
+    op.execute("ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITH TIME ZONE")
+    for kind, lifetime in LINK_LIFETIMES.items():
+        op.execute(f"UPDATE email_outbox SET expires_at = created_at + interval '{lifetime}' "
+                   f"WHERE kind = '{kind}' AND expires_at IS NULL AND payload IS NOT NULL")
+    op.execute("UPDATE email_outbox SET payload = NULL "
+               "WHERE expires_at IS NOT NULL AND payload IS NOT NULL AND (status = 'dead' OR expires_at < now())")
+
+
+def downgrade():
+    op.drop_column("email_outbox", "expires_at")
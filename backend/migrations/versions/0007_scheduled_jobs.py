@@ -0,0 +1,29 @@
+"""scheduled_jobs: when each in-process scheduler job last ran
+
+Revision ID: 0007_scheduled_jobs
+Revises: 0006_email_outbox_link_expiry
+Create Date: 2026-10-19
+
+app.core.scheduler claims a job's row before running it, so a job runs once
+per interval across every worker and instance. Starts empty: each job runs
+on its first tick after the deploy.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_scheduled_jobs"
+down_revision = "0006_email_outbox_link_expiry"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scheduled_jobs",
+        sa.Column("name", sa.String(100), primary_key=True),
+        sa.Column("last_run_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("scheduled_jobs")
@@ -0,0 +1,25 @@
+"""email_outbox.admin_id: who sent a bulk notification
+
+Revision ID: 0008_email_outbox_admin_id
+Revises: 0007_scheduled_jobs
+Create Date: 2026-10-19
+
+Nullable without a default, a catalog-only change. GET
+/admin/notifications/{bulk_id} only answers the admin stored here; bulk
+notifications queued before this have none, so their status is no longer
+served (they are still delivered).
+"""
+from alembic import op
+
+revision = "0008_email_outbox_admin_id"
+down_revision = "0007_scheduled_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS admin_id INTEGER")
+
+
+def downgrade():
+    op.drop_column("email_outbox", "admin_id")
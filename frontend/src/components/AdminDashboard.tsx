@@ -1,4 +1,5 @@
 import { useState, useEffect, type FormEvent } from 'react';
+import { authFetch, revokeSession } from '../utils/api';
 import {
   Home,
   Shield,
@@ -147,9 +148,9 @@ export default function AdminDashboard() {
   };
 
   const fetchWithAuth = async (input: string, init?: RequestInit) => {
-    const headers: Record<string, string> = { Authorization: `Bearer ${token}` };
+    const headers: Record<string, string> = {};
     if (!(init?.body instanceof FormData)) headers['Content-Type'] = 'application/json';
-    return fetch(input, { ...init, headers });
+    return authFetch(input, { ...init, headers });
   };
 
   const loadData = async () => {
@@ -327,6 +328,7 @@ export default function AdminDashboard() {
   };
 
   const logout = () => {
+    revokeSession();
     localStorage.removeItem('access_token');
     localStorage.removeItem('user');
     window.location.href = '/';
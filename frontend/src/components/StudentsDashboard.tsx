@@ -1,4 +1,5 @@
 import { useState, useEffect, type FormEvent } from 'react';
+import { authFetch, revokeSession } from '../utils/api';
 import {
   Home,
   Search,
@@ -135,10 +136,10 @@ export default function StudentsDashboard() {
   };
 
   const fetchWithAuth = async (input: string, init?: RequestInit) => {
-    const headers: Record<string, string> = { Authorization: `Bearer ${token}` };
+    const headers: Record<string, string> = {};
     if (!(init?.body instanceof FormData)) headers['Content-Type'] = 'application/json';
     
-    return fetch(input, { ...init, headers });
+    return authFetch(input, { ...init, headers });
 };
 
   const loadData = async () => {
@@ -321,11 +322,10 @@ export default function StudentsDashboard() {
 
     setSubmitting(true);
     try {
-      const res = await fetch(
+      const res = await fetchWithAuth(
         `${API}/applications/my-applications/${editingApplication.id}`,
         {
           method: 'PUT',
-          headers: { Authorization: `Bearer ${token}` },
           body: formData,
         }
       );
@@ -396,6 +396,7 @@ export default function StudentsDashboard() {
   };
 
   const logout = () => {
+    revokeSession();
     localStorage.removeItem('access_token');
     localStorage.removeItem('user');
     window.location.href = '/';
@@ -2,16 +2,104 @@
 export const API_BASE = import.meta.env.DEV 
   ? '/api'  // Use proxy in dev
   : 'https://campusstay-backend.onrender.com';  // Direct in prod
+
+// One refresh at a time - parallel 401s all wait on the same rotation. Tabs
+// share localStorage, so the rotation itself runs under a Web Lock: a tab that
+// waited finds the token already rotated and uses the new one instead of
+// replaying the old one (which the server would treat as theft).
+const REFRESH_LOCK = 'campusstay-token-refresh';
+let refreshing: Promise<string | null> | null = null;
+
+async function rotateRefreshToken(staleToken: string): Promise<string | null> {
+  const current = localStorage.getItem('refresh_token');
+  if (!current) return null;
+  if (current !== staleToken) return localStorage.getItem('access_token');
+
+  try {
+    const res = await fetch(`${API_BASE}/auth/refresh`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: current }),
+    });
+    if (!res.ok) {
+      localStorage.removeItem('refresh_token');
+      return null;
+    }
+    const data = await res.json();
+    localStorage.setItem('access_token', data.access_token);
+    localStorage.setItem('refresh_token', data.refresh_token);
+    return data.access_token as string;
+  } catch {
+    return null;
+  }
+}
+
+export function refreshAccessToken(): Promise<string | null> {
+  if (!refreshing) {
+    const staleToken = localStorage.getItem('refresh_token');
+    refreshing = (async () => {
+      if (!staleToken) return null;
+      try {
+        if (navigator.locks) {
+          return await navigator.locks.request(REFRESH_LOCK, () => rotateRefreshToken(staleToken));
+        }
+        return await rotateRefreshToken(staleToken);
+      } finally {
+        refreshing = null;
+      }
+    })();
+  }
+  return refreshing;
+}
+
+// Where a 401 means wrong credentials or a bad link, not an expired access token
+const CREDENTIAL_ENDPOINTS = /\/auth\/(login|register|refresh|logout|forgot-password|reset-password|verify-email)(\?|$)/;
+
+// fetch() with the stored bearer token; on 401 rotates the refresh token once and retries -
+// only when the request carried an access token that could have expired
+export async function authFetch(input: string, init: RequestInit = {}) {
+  const send = (token: string | null) => {
+    const headers = new Headers(init.headers);
+    if (token) headers.set('Authorization', `Bearer ${token}`);
+    return fetch(input, { ...init, headers });
+  };
+
+  const accessToken = localStorage.getItem('access_token');
+  const response = await send(accessToken);
+  if (
+    response.status !== 401 ||
+    !accessToken ||
+    CREDENTIAL_ENDPOINTS.test(input) ||
+    !localStorage.getItem('refresh_token')
+  ) {
+    return response;
+  }
+
+  const newToken = await refreshAccessToken();
+  return newToken ? send(newToken) : response;
+}
+
+// Revoke the refresh token server-side and forget it locally
+export function revokeSession() {
+  const refreshToken = localStorage.getItem('refresh_token');
+  localStorage.removeItem('refresh_token');
+  if (refreshToken) {
+    fetch(`${API_BASE}/auth/logout`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    }).catch(() => {});
+  }
+}
+
 export async function fetcher(endpoint: string, options: RequestInit = {}) {
-  const token = localStorage.getItem('access_token');
   const headers = new Headers(options.headers);
 
-  if (token) headers.set('Authorization', `Bearer ${token}`);
   if (!headers.has('Content-Type') && !(options.body instanceof FormData)) {
   headers.set('Content-Type', 'application/json');
 }
 
-  const response = await fetch(`${API_BASE}${endpoint}`, { ...options, headers });
+  const response = await authFetch(`${API_BASE}${endpoint}`, { ...options, headers });
 
   if (!response.ok) {
     let msg = 'Something went wrong';
@@ -1,5 +1,5 @@
 // src/utils/auth.ts - FIXED for HashRouter
-import { fetcher } from './api';
+import { fetcher, revokeSession } from './api';
 
 export interface LoginData {
   email: string;
@@ -26,6 +26,7 @@ export async function login(data: LoginData) {
 
   // Store auth data
   localStorage.setItem('access_token', res.access_token);
+  if (res.refresh_token) localStorage.setItem('refresh_token', res.refresh_token);
   
   const userInfo = {
     email: res.email || data.email,
@@ -56,6 +57,7 @@ export async function registerStudent(data: StudentData) {
 }
 
 export function logout() {
+  revokeSession();
   localStorage.removeItem('access_token');
   localStorage.removeItem('user');
   window.dispatchEvent(new Event('auth-change'));